@@ -1,22 +1,40 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import itertools
 import logging
+import os
 import random
+import re
 import string
-
-from irods.models import UserGroup
-from irods.session import iRODSSession
+import threading
+import time
 
 from config import settings
 
 
 PROJECT_ROOT = settings.TASKFLOW_IRODS_PROJECT_ROOT
 PERMANENT_USERS = settings.TASKFLOW_TEST_PERMANENT_USERS
+POOL_SIZE = settings.TASKFLOW_IRODS_POOL_SIZE
+POOL_IDLE_TIMEOUT = settings.TASKFLOW_IRODS_POOL_IDLE_TIMEOUT
+MD5_SUFFIX = '.md5'
+# Max number of values in a single GenQuery IN condition
+QUERY_IN_SIZE = 100
+
+md5_re = re.compile(r'([^\w.])')
 
 
 logger = logging.getLogger('sodar_taskflow')
 
 
-def init_irods(test_mode=False):
-    """Initialize iRODS session, return an iRODSSession object"""
+class ChecksumFileReadException(Exception):
+    """Exception for failing to read a checksum file"""
+
+    def __init__(self, path):
+        super().__init__('Unable to read checksum file "{}"'.format(path))
+        self.path = path
+
+
+def get_irods_kwargs(test_mode=False):
+    """Return keyword arguments for creating an iRODSSession object"""
 
     # iRODS environment
     irods_env = dict(settings.TASKFLOW_IRODS_ENV)
@@ -52,11 +70,28 @@ def init_irods(test_mode=False):
         }
 
     irods_kwargs.update(irods_env)
-    irods = iRODSSession(**irods_kwargs)
+    return irods_kwargs
 
-    # Ensure we have a connection
+
+def check_irods(irods):
+    """Ensure we have a working connection, raise exception if not"""
     irods.collections.exists('/{}/home/{}'.format(irods.zone, irods.username))
 
+
+def init_irods(test_mode=False, irods_kwargs=None):
+    """
+    Initialize iRODS session, return an iRODSSession object
+
+    :param test_mode: Connect to the TEST server (boolean)
+    :param irods_kwargs: Session arguments, taken from settings if not set
+    """
+    from irods.session import iRODSSession
+
+    irods = iRODSSession(**(irods_kwargs or get_irods_kwargs(test_mode)))
+
+    # Ensure we have a connection
+    check_irods(irods)
+
     logger.debug(
         'Connected to {} server on {}:{}'.format(
             'TEST' if test_mode else 'DEFAULT', irods.host, irods.port
@@ -72,8 +107,262 @@ def close_irods(irods):
         irods.cleanup()
 
 
+class IrodsSessionPool:
+    """
+    Process-local pool of iRODS sessions. Sessions are borrowed with get() or
+    get_clone() and returned with release(). Idle sessions are checked for a
+    working connection before reuse and closed after being idle for longer than
+    TASKFLOW_IRODS_POOL_IDLE_TIMEOUT seconds.
+    """
+
+    def __init__(self, size=POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT):
+        """
+        :param size: Maximum number of idle sessions kept per configuration
+        :param idle_timeout: Seconds after which idle sessions are closed
+        """
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._orphans = []
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = {}  # Config key: list of (session, release time)
+        self.hits = 0
+        self.misses = 0
+
+    def _check_fork(self):
+        """Drop sessions inherited from a parent process after fork"""
+        if self._pid != os.getpid():
+            # NOTE: Sessions are not closed, as the parent process still uses
+            #       the connections. Keep references to avoid cleanup on GC.
+            self._orphans += [s for v in self._idle.values() for s, _ in v]
+            self._reset()
+
+    @classmethod
+    def _get_key(cls, irods_kwargs):
+        return tuple(sorted((k, repr(v)) for k, v in irods_kwargs.items()))
+
+    def _evict(self):
+        """Close sessions which have been idle for too long"""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                evicted += [s for s, t in idle if now - t > self.idle_timeout]
+                self._idle[key] = [
+                    (s, t) for s, t in idle if now - t <= self.idle_timeout
+                ]
+        for irods in evicted:
+            close_irods(irods)
+
+    def _get(self, irods_kwargs, test_mode=False):
+        self._check_fork()
+        self._evict()
+        key = self._get_key(irods_kwargs)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                irods = idle.pop()[0] if idle else None
+            if not irods:
+                break
+            try:
+                check_irods(irods)
+                with self._lock:
+                    self.hits += 1
+                return irods
+            except Exception as ex:
+                logger.debug('Discarding pooled iRODS session: {}'.format(ex))
+                close_irods(irods)
+        irods = init_irods(test_mode=test_mode, irods_kwargs=irods_kwargs)
+        with self._lock:
+            self.misses += 1
+        return irods
+
+    def get(self, test_mode=False):
+        """
+        Borrow an iRODS session for the server configured in settings.
+
+        :param test_mode: Connect to the TEST server (boolean)
+        :return: iRODSSession object
+        """
+        return self._get(get_irods_kwargs(test_mode), test_mode=test_mode)
+
+    def get_clone(self, irods):
+        """
+        Borrow an iRODS session with the same configuration as an existing
+        session.
+
+        :param irods: iRODSSession object
+        :return: iRODSSession object
+        """
+        return self._get(dict(irods.do_configure))
+
+    def release(self, irods):
+        """
+        Return a borrowed iRODS session to the pool.
+
+        :param irods: iRODSSession object
+        """
+        if not irods:
+            return
+        self._check_fork()
+        key = self._get_key(irods.do_configure)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append((irods, time.monotonic()))
+                irods = None
+        if irods:
+            close_irods(irods)
+        self._evict()
+
+    def clear(self):
+        """Close all idle sessions"""
+        self._check_fork()
+        with self._lock:
+            idle = [s for v in self._idle.values() for s, _ in v]
+            self._idle = {}
+        for irods in idle:
+            close_irods(irods)
+
+    def get_stats(self):
+        """Return pool statistics as a dict"""
+        self._check_fork()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'idle': sum(len(v) for v in self._idle.values()),
+            }
+
+
+session_pool = IrodsSessionPool()
+
+
+class CollectionCache:
+    """
+    Cache of collection paths known to exist, so parent collections shared by
+    many paths are only checked once within a flow. Only existing collections
+    are cached. Collections removed or moved away must be invalidated with
+    remove().
+    """
+
+    def __init__(self):
+        self._paths = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._paths
+
+    def exists(self, irods, path):
+        """
+        Return True if collection exists, checking in iRODS if not cached.
+
+        :param irods: iRODS session object
+        :param path: Full path to collection (string)
+        :return: Boolean
+        """
+        with self._lock:
+            if path in self._paths:
+                self.hits += 1
+                return True
+            self.misses += 1
+        if not irods.collections.exists(path):
+            return False
+        self.add(path)
+        return True
+
+    def add(self, path):
+        """
+        Add existing or created collection to the cache.
+
+        :param path: Full path to collection (string)
+        """
+        with self._lock:
+            self._paths.add(path)
+
+    def remove(self, path):
+        """
+        Remove collection and its subcollections from the cache.
+
+        :param path: Full path to collection (string)
+        """
+        prefix = path + '/'
+        with self._lock:
+            self._paths = set(
+                p for p in self._paths if p != path and not p.startswith(prefix)
+            )
+
+
+def run_parallel(irods, func, items, concurrency):
+    """
+    Call func(session, item) for each item using a bounded pool of worker
+    threads, each of which uses its own iRODS session. Items are run serially
+    with the given session if concurrency is 1 or less.
+
+    Yields (item, result) tuples in order of completion. On the first exception
+    no further items are started, results of items already running are
+    yielded and the exception is then raised.
+
+    :param irods: iRODS session object
+    :param func: Function taking an iRODS session and an item
+    :param items: Iterable of items
+    :param concurrency: Maximum number of parallel workers (int)
+    :raise: Exception raised by func
+    """
+    if concurrency <= 1:
+        for item in items:
+            yield item, func(irods, item)
+        return
+
+    thread_data = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+
+    def _work(item):
+        session = getattr(thread_data, 'irods', None)
+        if not session:
+            session = session_pool.get_clone(irods)
+            thread_data.irods = session
+            with sessions_lock:
+                sessions.append(session)
+        return func(session, item)
+
+    items = iter(items)
+    error = None
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(_work, item): item
+                for item in itertools.islice(items, concurrency * 2)
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = futures.pop(future)
+                    if future.exception():
+                        error = error or future.exception()
+                        continue
+                    yield item, future.result()
+                if not error:
+                    for item in itertools.islice(items, len(done)):
+                        futures[executor.submit(_work, item)] = item
+    finally:
+        for session in sessions:
+            session_pool.release(session)
+    if error:
+        raise error
+
+
 def cleanup_irods_data(irods, verbose=True):
     """Cleanup data from iRODS. Used in debugging/testing."""
+    from irods.models import UserGroup
+
     # TODO: Remove stuff from user folders
     # TODO: Remove stuff from trash
     # Remove project folders
@@ -186,3 +475,321 @@ def get_subcoll_paths(coll):
         ret += get_subcoll_paths(sub_coll)
 
     return ret
+
+
+def get_subcoll_obj_data(irods, path):
+    """
+    Return data objects within a collection and its subcollections recursively
+    along with their replica information. Uses paged GenQuery queries instead
+    of per-object lookups.
+
+    :param irods: iRODS session object
+    :param path: Full path to root collection (string)
+    :return: Dict of path: {"size", "replicas"}, where replicas is a list of
+             dicts with "resource_name", "checksum" and "replica_status"
+    """
+    from irods.column import Like
+    from irods.models import Collection, DataObject
+
+    prefix = path + '/'
+    ret = {}
+    obj_cols = (
+        Collection.name,
+        DataObject.name,
+        DataObject.size,
+        DataObject.resource_name,
+        DataObject.checksum,
+        DataObject.replica_status,
+    )
+    # NOTE: LIKE treats "_" as a wildcard, so results are filtered by prefix
+    obj_queries = [
+        irods.query(*obj_cols).filter(Collection.name == path),
+        irods.query(*obj_cols).filter(Like(Collection.name, prefix + '%')),
+    ]
+
+    for query in obj_queries:
+        for row in query:
+            coll_name = row[Collection.name]
+            if coll_name != path and not coll_name.startswith(prefix):
+                continue
+            obj_path = coll_name + '/' + row[DataObject.name]
+            if obj_path not in ret:
+                ret[obj_path] = {'size': row[DataObject.size], 'replicas': []}
+            ret[obj_path]['replicas'].append(
+                {
+                    'resource_name': row[DataObject.resource_name],
+                    'checksum': row[DataObject.checksum],
+                    'replica_status': row[DataObject.replica_status],
+                }
+            )
+    return ret
+
+
+def get_subcoll_obj_access(irods, path, user_name=None):
+    """
+    Return user access of data objects within a collection and its
+    subcollections recursively. Uses paged GenQuery queries on data access
+    instead of per-object permission lookups.
+
+    :param irods: iRODS session object
+    :param path: Full path to root collection (string)
+    :param user_name: Only return access of this user or group (optional)
+    :return: Dict of path: {user_name: access_name}
+    """
+    from irods.column import Like
+    from irods.models import Collection, DataAccess, DataObject, User
+
+    prefix = path + '/'
+    ret = {}
+    access_cols = (Collection.name, DataObject.name, User.name, DataAccess.name)
+    access_queries = [
+        irods.query(*access_cols).filter(Collection.name == path),
+        irods.query(*access_cols).filter(Like(Collection.name, prefix + '%')),
+    ]
+
+    for query in access_queries:
+        if user_name:
+            query = query.filter(User.name == user_name)
+        for row in query:
+            coll_name = row[Collection.name]
+            if coll_name != path and not coll_name.startswith(prefix):
+                continue
+            obj_path = coll_name + '/' + row[DataObject.name]
+            ret.setdefault(obj_path, {})[row[User.name]] = row[DataAccess.name]
+    return ret
+
+
+def get_subcoll_coll_access(irods, path, user_name=None):
+    """
+    Return user access of a collection and its subcollections recursively.
+    Uses paged GenQuery queries on collection access instead of per-collection
+    permission lookups.
+
+    :param irods: iRODS session object
+    :param path: Full path to root collection (string)
+    :param user_name: Only return access of this user or group (optional)
+    :return: Dict of path: {user_name: access_name}
+    """
+    from irods.column import Like
+    from irods.models import Collection, CollectionAccess, CollectionUser
+
+    prefix = path + '/'
+    ret = {}
+    access_cols = (Collection.name, CollectionUser.name, CollectionAccess.name)
+    access_queries = [
+        irods.query(*access_cols).filter(Collection.name == path),
+        irods.query(*access_cols).filter(Like(Collection.name, prefix + '%')),
+    ]
+
+    for query in access_queries:
+        if user_name:
+            query = query.filter(CollectionUser.name == user_name)
+        for row in query:
+            coll_name = row[Collection.name]
+            if coll_name != path and not coll_name.startswith(prefix):
+                continue
+            ret.setdefault(coll_name, {})[row[CollectionUser.name]] = row[
+                CollectionAccess.name
+            ]
+    return ret
+
+
+def query_subcoll_paths(irods, path):
+    """
+    Return paths to all subcollections within collection recursively using a
+    single paged GenQuery query.
+
+    :param irods: iRODS session object
+    :param path: Full path to root collection (string)
+    :return: List of subcollection paths
+    """
+    from irods.column import Like
+    from irods.models import Collection
+
+    prefix = path + '/'
+    coll_query = irods.query(Collection.name).filter(
+        Like(Collection.name, prefix + '%')
+    )
+    return [
+        row[Collection.name]
+        for row in coll_query
+        if row[Collection.name].startswith(prefix)
+    ]
+
+
+def get_existing_coll_paths(irods, paths):
+    """
+    Return the collections which exist from a list of collection paths. Uses
+    GenQuery queries with up to QUERY_IN_SIZE paths per query instead of
+    checking each collection.
+
+    :param irods: iRODS session object
+    :param paths: List of full collection paths
+    :return: Set of existing collection paths
+    """
+    from irods.column import In
+    from irods.models import Collection
+
+    paths = list(paths)
+    ret = set()
+    for i in range(0, len(paths), QUERY_IN_SIZE):
+        query = irods.query(Collection.name).filter(
+            In(Collection.name, paths[i : i + QUERY_IN_SIZE])
+        )
+        ret.update(row[Collection.name] for row in query)
+    return ret
+
+
+def get_subcoll_data(irods, path):
+    """
+    Return data objects and collections within a collection and its
+    subcollections recursively. Uses paged GenQuery queries instead of walking
+    the collection tree one collection at a time.
+
+    :param irods: iRODS session object
+    :param path: Full path to root collection (string)
+    :return: Dict with "data_objects" (see get_subcoll_obj_data()) and
+             "colls" (list of subcollection paths)
+    """
+    return {
+        'data_objects': get_subcoll_obj_data(irods, path),
+        'colls': query_subcoll_paths(irods, path),
+    }
+
+
+def get_subtree_moves(src_root, dest_root, src_colls, src_paths, dest_colls):
+    """
+    Plan moving data objects from a source collection into a destination
+    collection. Source subcollections whose destination does not exist can be
+    moved as a whole with a single collection move. Only the topmost of these
+    are returned, and collections with empty subcollections are left out as
+    empty collections are not moved. The parent of each returned collection
+    exists in the destination.
+
+    :param src_root: Full path to source root collection (string)
+    :param dest_root: Full path to destination root collection (string)
+    :param src_colls: List of subcollection paths within src_root
+    :param src_paths: List of data object paths within src_root
+    :param dest_colls: Existing collection paths in the destination, including
+                       dest_root if it exists (list or set)
+    :return: Tuple of (subtree collection paths, data object paths to be
+             moved one at a time)
+    """
+    dest_colls = set(dest_colls)
+    src_depth = len(src_root.split('/'))
+
+    def _get_parent(path):
+        return path[: path.rfind('/')]
+
+    def _get_dest(path):
+        return '/'.join([dest_root] + path.split('/')[src_depth:])
+
+    # Collections with data objects in them or their subcollections
+    filled_colls = set()
+    for path in src_paths:
+        coll = _get_parent(path)
+        while len(coll) > len(src_root) and coll not in filled_colls:
+            filled_colls.add(coll)
+            coll = _get_parent(coll)
+    # Collections with empty collections under them can not be moved as such
+    mixed_colls = set()
+    for coll in src_colls:
+        if coll in filled_colls:
+            continue
+        coll = _get_parent(coll)
+        while len(coll) > len(src_root) and coll not in mixed_colls:
+            mixed_colls.add(coll)
+            coll = _get_parent(coll)
+
+    subtree_paths = []
+    for coll in sorted(filled_colls, key=lambda p: p.count('/')):
+        if (
+            coll not in mixed_colls
+            and _get_dest(coll) not in dest_colls
+            and _get_dest(_get_parent(coll)) in dest_colls
+        ):
+            subtree_paths.append(coll)
+
+    subtree_set = set(subtree_paths)
+    obj_paths = []
+    for path in src_paths:
+        coll = _get_parent(path)
+        while len(coll) > len(src_root) and coll not in subtree_set:
+            coll = _get_parent(coll)
+        if coll not in subtree_set:
+            obj_paths.append(path)
+    return sorted(subtree_paths), obj_paths
+
+
+def split_md5_paths(paths):
+    """
+    Split data object paths into file paths and .md5 checksum file paths.
+    Duplicates are removed.
+
+    :param paths: List of data object paths
+    :return: Tuple of lists (file_paths, md5_paths)
+    """
+    file_paths = set()
+    md5_paths = set()
+    for p in paths:
+        if p[p.rfind('.') + 1 :].lower() == MD5_SUFFIX[1:]:
+            md5_paths.add(p)
+        else:
+            file_paths.add(p)
+    return list(file_paths), list(md5_paths)
+
+
+def get_unpaired_md5_paths(file_paths, md5_paths):
+    """
+    Return expected paths missing from file and .md5 checksum file pairs in
+    linear time. For each file without a checksum file, the expected .md5 path
+    is returned. For each checksum file without a file, the expected file path
+    is returned.
+
+    :param file_paths: List of file paths
+    :param md5_paths: List of .md5 checksum file paths
+    :return: List of paths
+    """
+    file_set = set(file_paths)
+    md5_set = set(md5_paths)
+    ret = [p + MD5_SUFFIX for p in file_paths if p + MD5_SUFFIX not in md5_set]
+    ret += [
+        p[: -len(MD5_SUFFIX)]
+        for p in md5_paths
+        if p[: -len(MD5_SUFFIX)] not in file_set
+    ]
+    return ret
+
+
+def read_checksum_file(irods, path):
+    """
+    Read checksum from the .md5 checksum file of a data object.
+
+    :param irods: iRODS session object
+    :param path: Data object path (string)
+    :return: Checksum (string)
+    :raise: ChecksumFileReadException if reading fails
+    """
+    md5_path = path + MD5_SUFFIX
+    try:
+        with irods.data_objects.open(md5_path, mode='r') as md5_file:
+            return re.split(md5_re, md5_file.read().decode('utf-8'))[0]
+    except Exception as ex:
+        raise ChecksumFileReadException(md5_path) from ex
+
+
+def read_checksum_files(irods, paths, concurrency):
+    """
+    Read .md5 checksum files of data objects concurrently, each worker using
+    its own iRODS session. Yields (path, checksum) tuples in order of
+    completion as a stream.
+
+    :param irods: iRODS session object
+    :param paths: Iterable of data object paths
+    :param concurrency: Maximum number of parallel workers (int)
+    :raise: ChecksumFileReadException if reading fails
+    """
+    for path, checksum in run_parallel(
+        irods, read_checksum_file, paths, concurrency
+    ):
+        yield path, checksum
@@ -0,0 +1,209 @@
+"""Durable Redis job queue for async flows"""
+
+import json
+import logging
+import time
+import uuid
+
+from apis import redis_utils
+from config import settings
+
+
+QUEUE_NAME = 'sodar_taskflow:jobs'
+HEARTBEAT_TTL = settings.TASKFLOW_RUNNER_HEARTBEAT_TTL
+MAX_ATTEMPTS = settings.TASKFLOW_JOB_MAX_ATTEMPTS
+# Worker pool statistics summed over runners in get_stats()
+RUNNER_STATS = ['workers', 'running', 'completed', 'failed']
+
+logger = logging.getLogger('sodar_taskflow')
+
+
+class JobQueue:
+    """
+    Reliable job queue stored in Redis. Jobs are moved atomically from the
+    pending list into a processing list of the runner which received them and
+    are only removed when acknowledged. Jobs of runners whose heartbeat has
+    expired are returned to the front of the pending list.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        name=QUEUE_NAME,
+        heartbeat_ttl=HEARTBEAT_TTL,
+        max_attempts=MAX_ATTEMPTS,
+    ):
+        """
+        :param redis_client: Redis client object (optional)
+        :param name: Queue name used as key prefix (string)
+        :param heartbeat_ttl: Seconds after which a silent runner is dead
+        :param max_attempts: Maximum times a job is started
+        """
+        self._redis = redis_client
+        self.name = name
+        self.heartbeat_ttl = heartbeat_ttl
+        self.max_attempts = max_attempts
+        self.pending_key = name + ':pending'
+
+    @property
+    def redis(self):
+        return self._redis or redis_utils.get_client()
+
+    def _get_processing_key(self, runner_id):
+        return '{}:processing:{}'.format(self.name, runner_id)
+
+    def _get_heartbeat_key(self, runner_id):
+        return '{}:runner:{}'.format(self.name, runner_id)
+
+    def enqueue(self, data):
+        """
+        Add job to the queue.
+
+        :param data: Job data, must be JSON serializable (dict)
+        :return: Job ID (string)
+        """
+        job = {
+            'job_id': str(uuid.uuid4()),
+            'data': data,
+            'submit_time': time.time(),
+            'attempts': 0,
+        }
+        self.redis.lpush(self.pending_key, json.dumps(job))
+        return job['job_id']
+
+    def pop(self, runner_id, timeout=1):
+        """
+        Receive next job for a runner. The job must be acknowledged with ack()
+        once complete.
+
+        :param runner_id: Runner ID (string)
+        :param timeout: Seconds to wait for a job (int)
+        :return: Job dict or None if no job was received
+        """
+        raw = self.redis.brpoplpush(
+            self.pending_key, self._get_processing_key(runner_id), timeout
+        )
+        if not raw:
+            return None
+        job = json.loads(raw)
+        job['raw'] = raw
+        return job
+
+    def ack(self, runner_id, job):
+        """
+        Acknowledge a completed job and remove it from the queue.
+
+        :param runner_id: Runner ID (string)
+        :param job: Job dict returned by pop()
+        """
+        self.redis.lrem(self._get_processing_key(runner_id), 1, job['raw'])
+
+    def _requeue(self, processing_key, raw):
+        """Move job back to the front of the pending list"""
+        job = json.loads(raw)
+        job['attempts'] += 1
+
+        def _move(pipe):
+            if raw not in pipe.lrange(processing_key, 0, -1):
+                return False  # Already moved by another runner
+            pipe.multi()
+            pipe.lrem(processing_key, 1, raw)
+            if job['attempts'] < self.max_attempts:
+                pipe.rpush(self.pending_key, json.dumps(job))
+            return True
+
+        if not self.redis.transaction(
+            _move, processing_key, value_from_callable=True
+        ):
+            return
+        if job['attempts'] < self.max_attempts:
+            logger.warning('Requeued job "{}"'.format(job['job_id']))
+        else:
+            logger.error(
+                'Dropped job "{}" after {} attempts'.format(
+                    job['job_id'], job['attempts']
+                )
+            )
+
+    def retry(self, runner_id, job):
+        """
+        Return an interrupted job to the queue.
+
+        :param runner_id: Runner ID (string)
+        :param job: Job dict returned by pop()
+        """
+        self._requeue(self._get_processing_key(runner_id), job['raw'])
+
+    def heartbeat(self, runner_id, stats=None):
+        """
+        Mark runner as alive.
+
+        :param runner_id: Runner ID (string)
+        :param stats: Worker pool statistics of the runner (dict, optional)
+        """
+        self.redis.set(
+            self._get_heartbeat_key(runner_id),
+            json.dumps(stats or {}),
+            ex=self.heartbeat_ttl,
+        )
+
+    def stop(self, runner_id):
+        """
+        Unregister a stopped runner. Unacknowledged jobs are requeued.
+
+        :param runner_id: Runner ID (string)
+        """
+        self.redis.delete(self._get_heartbeat_key(runner_id))
+        self.recover()
+
+    def recover(self):
+        """
+        Requeue jobs of runners whose heartbeat has expired.
+
+        :return: Number of requeued jobs (int)
+        """
+        count = 0
+        prefix = self._get_processing_key('')
+        for key in self.redis.scan_iter(match=prefix + '*'):
+            runner_id = key.decode()[len(prefix) :]
+            if self.redis.exists(self._get_heartbeat_key(runner_id)):
+                continue
+            for raw in self.redis.lrange(key, 0, -1):
+                self._requeue(key, raw)
+                count += 1
+        return count
+
+    def get_depth(self):
+        """Return number of jobs waiting for a runner"""
+        return self.redis.llen(self.pending_key)
+
+    def get_stats(self):
+        """
+        Return queue statistics and worker pool statistics summed over live
+        runners as a dict.
+        """
+        prefix = self._get_heartbeat_key('')
+        ret = {'pending': self.get_depth(), 'runners': 0}
+        ret.update({k: 0 for k in RUNNER_STATS})
+        queue_wait = run_time = 0.0
+        for key in self.redis.scan_iter(match=prefix + '*'):
+            raw = self.redis.get(key)
+            if raw is None:  # Expired
+                continue
+            ret['runners'] += 1
+            stats = json.loads(raw)
+            if not isinstance(stats, dict):
+                continue
+            for k in RUNNER_STATS:
+                ret[k] += stats.get(k, 0)
+            queue_wait += stats.get('queue_wait_avg', 0) * stats.get(
+                'completed', 0
+            )
+            run_time += stats.get('run_time_avg', 0) * stats.get('completed', 0)
+        completed = ret['completed']
+        ret['queue_wait_avg'] = queue_wait / completed if completed else 0.0
+        ret['run_time_avg'] = run_time / completed if completed else 0.0
+        return ret
+
+
+job_queue = JobQueue()
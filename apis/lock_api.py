@@ -1,33 +1,59 @@
 """Project locking API"""
 
+import atexit
 import logging
+import os
+import threading
 import time
-from tooz import coordination
 import uuid
 
+from apis import redis_utils
 from config import settings
 
 
 LOCK_ENABLED = settings.TASKFLOW_LOCK_ENABLED
 LOCK_RETRY_COUNT = settings.TASKFLOW_LOCK_RETRY_COUNT
 LOCK_RETRY_INTERVAL = settings.TASKFLOW_LOCK_RETRY_INTERVAL
+LOCK_WAIT = settings.TASKFLOW_LOCK_WAIT
+LOCK_WAIT_SYNC = settings.TASKFLOW_LOCK_WAIT_SYNC
+LOCK_WAIT_ASYNC = settings.TASKFLOW_LOCK_WAIT_ASYNC
 REDIS_URL = settings.TASKFLOW_REDIS_URL
+QUEUE_NAME = 'sodar_taskflow:lock'
+METRICS_NAME = 'sodar_taskflow:lock_metrics'
+# Number of most contended projects returned in lock metrics
+METRICS_PROJECT_COUNT = 10
+# Seconds after which a silent waiter is removed from the queue
+WAITER_TTL = 10
+# Seconds between queue position checks while waiting
+WAIT_INTERVAL = 0.2
 
 
+# Acquire times of locks held by this process for hold time metrics
+_acquire_times = {}
+# Process-local coordinator, see get_coordinator()
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
 logger = logging.getLogger('sodar_taskflow')
 
 
+def get_lock_id(lock):
+    """Return lock ID from Tooz lock name"""
+    return lock.name.split('_')[2]
+
+
 def log_status(lock, unlock=False, failed=False):
     msg = '{} {} for project {}'.format(
         'Unlock' if unlock else 'Lock',
         'FAILED' if failed else 'OK',
-        lock.name.split('_')[2],
+        get_lock_id(lock),
     )
     logger.error(msg) if failed else logger.info(msg)
 
 
-def get_coordinator():
-    """Return a Tooz coordinator object"""
+def _create_coordinator():
+    from tooz import coordination
+
     host_id = 'sodar_taskflow_{}'.format(uuid.uuid4())
 
     try:
@@ -44,23 +70,97 @@ def get_coordinator():
     return None
 
 
+def get_coordinator():
+    """
+    Return Tooz coordinator for the current process. The coordinator is
+    created on first use and recreated if it has been stopped, so locks are
+    handed out without a new connection and heartbeat thread for each flow.
+
+    :return: Tooz coordinator object or None if connecting failed
+    """
+    global _coordinator
+    with _coordinator_lock:
+        if not _coordinator or not _coordinator.is_started:
+            _coordinator = _create_coordinator()
+        return _coordinator
+
+
+def stop_coordinator():
+    """Stop coordinator of the current process if started"""
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator and _coordinator.is_started:
+            from tooz import coordination
+
+            try:
+                _coordinator.stop()
+            except coordination.ToozError as ex:
+                logger.error('Error stopping coordinator: {}'.format(ex))
+        _coordinator = None
+
+
+def _reset_coordinator():
+    """Drop coordinator inherited from the parent process after fork"""
+    global _coordinator, _coordinator_lock
+    # NOTE: The connection and heartbeat thread belong to the parent process,
+    #       so the coordinator is not stopped here
+    _coordinator = None
+    _coordinator_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_coordinator)
+atexit.register(stop_coordinator)
+
+
+def record_acquire(lock, start_time, retries, acquired, flow_name, metrics):
+    """
+    Record lock acquiring in metrics. Errors are logged and not raised.
+
+    :param lock: Tooz lock object
+    :param start_time: Time when acquiring was started (monotonic)
+    :param retries: Number of retried acquire calls (int)
+    :param acquired: Whether the lock was acquired (boolean)
+    :param flow_name: Flow name, metrics are not recorded if None (string)
+    :param metrics: LockMetrics object or None for default
+    """
+    now = time.monotonic()
+    if acquired:
+        _acquire_times[lock.name] = now
+    if not flow_name:
+        return
+    try:
+        (metrics or lock_metrics).record_acquire(
+            flow_name, get_lock_id(lock), now - start_time, retries, acquired
+        )
+    except Exception as ex:
+        logger.error('Error recording lock metrics: {}'.format(ex))
+
+
 def acquire(
-    lock, retry_count=LOCK_RETRY_COUNT, retry_interval=LOCK_RETRY_INTERVAL
+    lock,
+    retry_count=LOCK_RETRY_COUNT,
+    retry_interval=LOCK_RETRY_INTERVAL,
+    flow_name=None,
+    metrics=None,
 ):
     """
     Acquire project lock
     :param lock: Tooz lock object
     :param retry_count: Times to retry if unsuccessful (int)
     :param retry_interval: Time in seconds to keep retrying (int)
+    :param flow_name: Flow name for metrics (string, optional)
+    :param metrics: LockMetrics object (optional)
     :returns: Boolean
     """
     if not LOCK_ENABLED:
         return True
 
+    start_time = time.monotonic()
     acquired = lock.acquire(blocking=False)
 
     if acquired:
         log_status(lock, unlock=False, failed=False)
+        record_acquire(lock, start_time, 0, True, flow_name, metrics)
         return True
 
     if retry_count > 0:
@@ -69,22 +169,140 @@ def acquire(
 
             if acquired:
                 log_status(lock, unlock=False, failed=False)
+                record_acquire(
+                    lock, start_time, i + 1, True, flow_name, metrics
+                )
                 return True
 
             time.sleep(retry_interval)
 
     log_status(lock, unlock=False, failed=True)
+    record_acquire(lock, start_time, retry_count, False, flow_name, metrics)
     raise LockAcquireException('Unable to acquire project lock')
 
 
-def release(lock):
+def wait_acquire(
+    lock,
+    lock_id,
+    timeout,
+    queue=None,
+    callback=None,
+    flow_name=None,
+    metrics=None,
+):
     """
+    Acquire project lock, waiting in line behind earlier callers. The caller
+    at the front of the queue waits for the lock with blocking acquisition.
+
     :param lock: Tooz lock object
+    :param lock_id: Lock ID (string)
+    :param timeout: Seconds to wait for the lock (float)
+    :param queue: LockQueue object (optional)
+    :param callback: Function called with queue position on change (optional)
+    :param flow_name: Flow name for metrics (string, optional)
+    :param metrics: LockMetrics object (optional)
+    :returns: Boolean
+    :raise: LockAcquireException if not acquired before timeout
+    """
+    if not LOCK_ENABLED:
+        return True
+
+    queue = queue or lock_queue
+    start_time = time.monotonic()
+    deadline = start_time + timeout
+    waiter_id = queue.join(lock_id)
+    position = None
+    attempts = 0
+
+    try:
+        while True:
+            new_position = queue.get_position(lock_id, waiter_id)
+            if new_position != position:
+                position = new_position
+                logger.debug(
+                    'Waiting for lock {} (position: {})'.format(
+                        lock_id, position
+                    )
+                )
+                if callback:
+                    callback(position)
+            remaining = deadline - time.monotonic()
+            if position == 0:
+                # Keep refreshing our place in the queue while blocking
+                wait = min(max(remaining, 0), WAITER_TTL / 2)
+                attempts += 1
+                if lock.acquire(blocking=wait if wait > 0 else False):
+                    log_status(lock, unlock=False, failed=False)
+                    record_acquire(
+                        lock,
+                        start_time,
+                        attempts - 1,
+                        True,
+                        flow_name,
+                        metrics,
+                    )
+                    return True
+            elif remaining > 0:
+                time.sleep(min(WAIT_INTERVAL, remaining))
+            if time.monotonic() >= deadline:
+                break
+    finally:
+        queue.leave(lock_id, waiter_id)
+
+    log_status(lock, unlock=False, failed=True)
+    record_acquire(
+        lock, start_time, max(attempts - 1, 0), False, flow_name, metrics
+    )
+    raise LockAcquireException(
+        'Timed out waiting for project lock (queue position: {})'.format(
+            position
+        ),
+        position=position,
+    )
+
+
+def acquire_project(lock, lock_id, async_mode=False, flow_name=None):
+    """
+    Acquire project lock for running a flow. In lock wait mode, async flows
+    wait in line for up to LOCK_WAIT_ASYNC and sync flows for up to
+    LOCK_WAIT_SYNC seconds. Otherwise acquiring is retried.
+
+    :param lock: Tooz lock object
+    :param lock_id: Lock ID (string)
+    :param async_mode: Flow is run in async mode (boolean)
+    :param flow_name: Flow name for metrics (string, optional)
+    :returns: Boolean
+    :raise: LockAcquireException if not acquired
+    """
+    if not LOCK_WAIT:
+        return acquire(lock, flow_name=flow_name)
+    return wait_acquire(
+        lock,
+        lock_id,
+        LOCK_WAIT_ASYNC if async_mode else LOCK_WAIT_SYNC,
+        flow_name=flow_name,
+    )
+
+
+def release(lock, flow_name=None, metrics=None):
+    """
+    :param lock: Tooz lock object
+    :param flow_name: Flow name for metrics (string, optional)
+    :param metrics: LockMetrics object (optional)
     """
     if not LOCK_ENABLED:
         return True
 
     released = lock.release()
+    acquire_time = _acquire_times.pop(lock.name, None)
+
+    if flow_name and acquire_time:
+        try:
+            (metrics or lock_metrics).record_release(
+                flow_name, time.monotonic() - acquire_time
+            )
+        except Exception as ex:
+            logger.error('Error recording lock metrics: {}'.format(ex))
 
     if released:
         log_status(lock, unlock=True, failed=False)
@@ -94,5 +312,217 @@ def release(lock):
     return False
 
 
+class LockQueue:
+    """
+    FIFO queue of callers waiting for project locks, stored in Redis as a
+    sorted set of waiter IDs per lock. Waiters keep a key with an expiry time
+    alive while waiting, so waiters of crashed processes are removed.
+    """
+
+    def __init__(
+        self, redis_client=None, name=QUEUE_NAME, waiter_ttl=WAITER_TTL
+    ):
+        """
+        :param redis_client: Redis client object (optional)
+        :param name: Queue name used as key prefix (string)
+        :param waiter_ttl: Seconds after which a silent waiter is removed
+        """
+        self._redis = redis_client
+        self.name = name
+        self.waiter_ttl = waiter_ttl
+        self.ticket_key = name + ':ticket'
+
+    @property
+    def redis(self):
+        return self._redis or redis_utils.get_client()
+
+    def _get_queue_key(self, lock_id):
+        return '{}:{}:waiters'.format(self.name, lock_id)
+
+    def _get_waiter_key(self, waiter_id):
+        return '{}:waiter:{}'.format(self.name, waiter_id)
+
+    def join(self, lock_id):
+        """
+        Add waiter to the end of the queue of a lock.
+
+        :param lock_id: Lock ID (string)
+        :return: Waiter ID (string)
+        """
+        waiter_id = str(uuid.uuid4())
+        ticket = self.redis.incr(self.ticket_key)
+        pipe = self.redis.pipeline()
+        pipe.set(self._get_waiter_key(waiter_id), 1, ex=self.waiter_ttl)
+        pipe.zadd(self._get_queue_key(lock_id), {waiter_id: ticket})
+        pipe.execute()
+        return waiter_id
+
+    def get_position(self, lock_id, waiter_id):
+        """
+        Return position of a waiter in the queue and keep it alive. Expired
+        waiters ahead of it are removed.
+
+        :param lock_id: Lock ID (string)
+        :param waiter_id: Waiter ID (string)
+        :return: Position, 0 for the front of the queue (int)
+        """
+        queue_key = self._get_queue_key(lock_id)
+        if not self.redis.expire(
+            self._get_waiter_key(waiter_id), self.waiter_ttl
+        ):  # Expired while stalled, get back in line
+            logger.warning('Lock waiter {} expired'.format(waiter_id))
+            self.redis.zrem(queue_key, waiter_id)
+            self.redis.set(
+                self._get_waiter_key(waiter_id), 1, ex=self.waiter_ttl
+            )
+            self.redis.zadd(
+                queue_key, {waiter_id: self.redis.incr(self.ticket_key)}
+            )
+        position = 0
+        for member in self.redis.zrange(queue_key, 0, -1):
+            member = member.decode()
+            if member == waiter_id:
+                break
+            if self.redis.exists(self._get_waiter_key(member)):
+                position += 1
+            else:
+                self.redis.zrem(queue_key, member)
+        return position
+
+    def leave(self, lock_id, waiter_id):
+        """
+        Remove waiter from the queue.
+
+        :param lock_id: Lock ID (string)
+        :param waiter_id: Waiter ID (string)
+        """
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._get_queue_key(lock_id), waiter_id)
+        pipe.delete(self._get_waiter_key(waiter_id))
+        pipe.execute()
+
+    def get_length(self, lock_id):
+        """
+        Return number of waiters for a lock.
+
+        :param lock_id: Lock ID (string)
+        :return: int
+        """
+        return self.redis.zcard(self._get_queue_key(lock_id))
+
+
+class LockMetrics:
+    """
+    Project lock metrics stored in Redis, combining metrics of all server and
+    runner processes. Counts and wait and hold times are kept per flow name,
+    total wait times per project.
+    """
+
+    def __init__(self, redis_client=None, name=METRICS_NAME):
+        """
+        :param redis_client: Redis client object (optional)
+        :param name: Name used as key prefix (string)
+        """
+        self._redis = redis_client
+        self.name = name
+        self.flows_key = name + ':flows'
+        self.projects_key = name + ':projects'
+
+    @property
+    def redis(self):
+        return self._redis or redis_utils.get_client()
+
+    def _get_flow_key(self, flow_name):
+        return '{}:flow:{}'.format(self.name, flow_name)
+
+    def _set_max(self, key, field, value):
+        def _update(pipe):
+            current = pipe.hget(key, field)
+            if current is None or float(current) < value:
+                pipe.multi()
+                pipe.hset(key, field, value)
+
+        self.redis.transaction(_update, key)
+
+    def record_acquire(self, flow_name, lock_id, wait_time, retries, acquired):
+        """
+        Record acquiring or failing to acquire a lock.
+
+        :param flow_name: Flow name (string)
+        :param lock_id: Lock ID (string)
+        :param wait_time: Seconds spent acquiring (float)
+        :param retries: Number of retried acquire calls (int)
+        :param acquired: Whether the lock was acquired (boolean)
+        """
+        key = self._get_flow_key(flow_name)
+        pipe = self.redis.pipeline()
+        pipe.sadd(self.flows_key, flow_name)
+        pipe.hincrby(key, 'acquired' if acquired else 'failed', 1)
+        pipe.hincrby(key, 'retries', retries)
+        pipe.hincrbyfloat(key, 'wait_time', wait_time)
+        pipe.zincrby(self.projects_key, wait_time, lock_id)
+        pipe.execute()
+        self._set_max(key, 'wait_time_max', wait_time)
+
+    def record_release(self, flow_name, hold_time):
+        """
+        Record releasing a lock.
+
+        :param flow_name: Flow name (string)
+        :param hold_time: Seconds the lock was held (float)
+        """
+        key = self._get_flow_key(flow_name)
+        pipe = self.redis.pipeline()
+        pipe.sadd(self.flows_key, flow_name)
+        pipe.hincrby(key, 'released', 1)
+        pipe.hincrbyfloat(key, 'hold_time', hold_time)
+        pipe.execute()
+        self._set_max(key, 'hold_time_max', hold_time)
+
+    def get_stats(self, project_count=METRICS_PROJECT_COUNT):
+        """
+        Return lock metrics.
+
+        :param project_count: Number of most contended projects (int)
+        :return: Dict
+        """
+        flows = {}
+        for flow_name in sorted(self.redis.smembers(self.flows_key)):
+            flow_name = flow_name.decode()
+            data = {
+                k.decode(): float(v)
+                for k, v in self.redis.hgetall(
+                    self._get_flow_key(flow_name)
+                ).items()
+            }
+            stats = {
+                k: int(data.get(k, 0))
+                for k in ['acquired', 'failed', 'retries', 'released']
+            }
+            for k in ['wait_time', 'wait_time_max', 'hold_time_max']:
+                stats[k] = round(data.get(k, 0), 3)
+            stats['hold_time_avg'] = (
+                round(data['hold_time'] / stats['released'], 3)
+                if stats['released']
+                else 0
+            )
+            flows[flow_name] = stats
+        projects = [
+            {'project_uuid': k.decode(), 'wait_time': round(v, 3)}
+            for k, v in self.redis.zrevrange(
+                self.projects_key, 0, project_count - 1, withscores=True
+            )
+        ]
+        return {'flows': flows, 'projects': projects}
+
+
+lock_queue = LockQueue()
+lock_metrics = LockMetrics()
+
+
 class LockAcquireException(Exception):
     """Project lock acquiring exception"""
+
+    def __init__(self, msg, position=None):
+        super().__init__(msg)
+        self.position = position
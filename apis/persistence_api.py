@@ -0,0 +1,124 @@
+"""Taskflow persistence API for resuming interrupted flows"""
+
+import contextlib
+import logging
+import os
+
+from taskflow import exceptions as tf_exceptions
+from taskflow.persistence import backends, models
+
+from config import settings
+
+
+PERSISTENCE_URL = settings.TASKFLOW_PERSISTENCE_URL
+SQLITE_PREFIX = 'sqlite:///'
+
+# Process-local backend, see get_backend()
+_backend = None
+_backend_pid = None
+
+logger = logging.getLogger('sodar_taskflow')
+
+
+def get_backend():
+    """
+    Return persistence backend for the current process. Database tables are
+    created or upgraded on first use, along with the directory of an SQLite
+    database.
+
+    :return: Taskflow persistence backend or None if persistence is disabled
+    """
+    global _backend, _backend_pid
+    if not PERSISTENCE_URL:
+        return None
+    if not _backend or _backend_pid != os.getpid():
+        if PERSISTENCE_URL.startswith(SQLITE_PREFIX):
+            db_dir = os.path.dirname(PERSISTENCE_URL[len(SQLITE_PREFIX) :])
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+        _backend = backends.fetch({'connection': PERSISTENCE_URL})
+        with contextlib.closing(_backend.get_connection()) as conn:
+            conn.upgrade()
+        _backend_pid = os.getpid()
+    return _backend
+
+
+def create_flow_detail(backend, flow_uuid, flow_name, meta, data=None):
+    """
+    Create and save a logbook with a single flow detail, both identified by
+    flow_uuid. The flow detail is saved again on each state change, so large
+    values referenced from its metadata are saved once with the logbook.
+
+    :param backend: Taskflow persistence backend
+    :param flow_uuid: UUID for logbook and flow detail (string)
+    :param flow_name: Flow name (string)
+    :param meta: Flow metadata (dict)
+    :param data: Values referenced from flow metadata (dict, optional)
+    :return: FlowDetail object
+    """
+    book = models.LogBook(flow_name, uuid=flow_uuid)
+    book.meta = {'data': data or {}}
+    flow_detail = models.FlowDetail(flow_name, uuid=flow_uuid)
+    flow_detail.meta = meta
+    book.add(flow_detail)
+    with contextlib.closing(backend.get_connection()) as conn:
+        conn.save_logbook(book)
+    return flow_detail
+
+
+def get_flow_detail(backend, flow_uuid):
+    """
+    Return saved flow detail.
+
+    :param backend: Taskflow persistence backend
+    :param flow_uuid: UUID of logbook and flow detail (string)
+    :return: FlowDetail object or None if not found
+    """
+    with contextlib.closing(backend.get_connection()) as conn:
+        try:
+            book = conn.get_logbook(flow_uuid)
+        except tf_exceptions.NotFound:
+            return None
+    return book.find(flow_uuid)
+
+
+def get_flow_data(backend, flow_uuid):
+    """
+    Return values referenced from the metadata of a saved flow detail.
+
+    :param backend: Taskflow persistence backend
+    :param flow_uuid: UUID of logbook and flow detail (string)
+    :return: Dict
+    """
+    with contextlib.closing(backend.get_connection()) as conn:
+        try:
+            book = conn.get_logbook(flow_uuid, lazy=True)
+        except tf_exceptions.NotFound:
+            return {}
+    return (book.meta or {}).get('data', {})
+
+
+def get_flow_details(backend):
+    """
+    Return all saved flow details. Flow details are removed once a flow is
+    finished, so these are flows which are running or were interrupted.
+
+    :param backend: Taskflow persistence backend
+    :return: List of FlowDetail objects
+    """
+    with contextlib.closing(backend.get_connection()) as conn:
+        return [fd for book in conn.get_logbooks() for fd in book]
+
+
+def delete_flow_detail(backend, flow_uuid):
+    """
+    Delete saved logbook and flow detail.
+
+    :param backend: Taskflow persistence backend
+    :param flow_uuid: UUID of logbook and flow detail (string)
+    """
+    with contextlib.closing(backend.get_connection()) as conn:
+        try:
+            conn.destroy_logbook(flow_uuid)
+        except tf_exceptions.NotFound:
+            pass
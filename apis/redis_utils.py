@@ -0,0 +1,25 @@
+"""Shared Redis client"""
+
+from config import settings
+
+
+REDIS_URL = settings.TASKFLOW_REDIS_URL
+
+# Process-wide client, see get_client()
+_client = None
+
+
+def get_client():
+    """
+    Return Redis client shared within the process, created on first use so
+    the redis package is not imported at startup. The client connection pool
+    is reset by redis-py in forked child processes.
+
+    :return: Redis client object
+    """
+    global _client
+    if not _client:
+        import redis
+
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
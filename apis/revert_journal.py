@@ -0,0 +1,187 @@
+"""On-disk journal of changes made by batch tasks"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from config import settings
+
+
+JOURNAL_DIR = settings.TASKFLOW_JOURNAL_DIR
+FLUSH_COUNT = settings.TASKFLOW_JOURNAL_FLUSH_COUNT
+FSYNC_INTERVAL = settings.TASKFLOW_JOURNAL_FSYNC_INTERVAL
+JOURNAL_SUFFIX = '.jsonl'
+# Status records written when closing a journal
+STATUS_DONE = 'done'
+STATUS_REVERTED = 'reverted'
+
+
+logger = logging.getLogger('sodar_taskflow')
+
+
+class RevertJournal:
+    """
+    Append-only journal of changes made by a batch task, stored as JSON lines.
+    The first line is a header describing the task and its plan, which is
+    synced to disk before any changes are made. Each following line is a
+    record list of [operation, path] or [operation, path, access]. Records
+    are written in batches of flush_count records or every fsync_interval
+    seconds and synced to disk after each batch. Closing the journal writes a
+    status record.
+    """
+
+    def __init__(
+        self, path, flush_count=FLUSH_COUNT, fsync_interval=FSYNC_INTERVAL
+    ):
+        """
+        :param path: Path to journal file (string)
+        :param flush_count: Number of records to write at once (int)
+        :param fsync_interval: Max seconds between writes (float)
+        """
+        self.path = path
+        self.flush_count = flush_count
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_time = 0
+
+    def open(self, header=None):
+        """
+        Open journal for appending. If a header is given, a new journal is
+        started and the header is written to disk. Otherwise a partially
+        written last line is removed before appending.
+
+        :param header: Task and plan information (dict, optional)
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if not header and os.path.exists(self.path):
+            self._truncate_partial()
+        self._file = open(
+            self.path, 'a' if not header else 'w', encoding='utf-8'
+        )
+        self._flush_time = time.monotonic()
+        if header:
+            with self._lock:
+                self._buffer.append(header)
+                self._flush()
+
+    def _truncate_partial(self, chunk_size=4096):
+        """Truncate file to its last complete line"""
+        with open(self.path, 'rb+') as f:
+            size = pos = f.seek(0, os.SEEK_END)
+            end = 0
+            while pos > 0:
+                step = min(chunk_size, pos)
+                pos -= step
+                f.seek(pos)
+                i = f.read(step).rfind(b'\n')
+                if i >= 0:
+                    end = pos + i + 1
+                    break
+            if end < size:
+                logger.warning(
+                    'Removing incomplete journal line in "{}"'.format(self.path)
+                )
+                f.truncate(end)
+
+    def append(self, op, path, access=None):
+        """
+        Add record to the journal, writing it to disk with the current batch.
+
+        :param op: Operation (string)
+        :param path: Path to data object or collection (string)
+        :param access: Previous access if modified (string, optional)
+        """
+        record = [op, path] if access is None else [op, path, access]
+        with self._lock:
+            self._buffer.append(record)
+            if (
+                len(self._buffer) >= self.flush_count
+                or time.monotonic() - self._flush_time >= self.fsync_interval
+            ):
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        self._file.write(
+            ''.join(
+                json.dumps(r, separators=(',', ':')) + '\n'
+                for r in self._buffer
+            )
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer = []
+        self._flush_time = time.monotonic()
+
+    def flush(self):
+        """Write and sync buffered records to disk"""
+        with self._lock:
+            self._flush()
+
+    def close(self, status=None):
+        """
+        Write remaining records and close the journal.
+
+        :param status: Status record to write (string, optional)
+        """
+        if not self._file:
+            return
+        with self._lock:
+            if status:
+                self._buffer.append([status])
+            self._flush()
+            self._file.close()
+            self._file = None
+
+
+def read_journal(path):
+    """
+    Read journal written by RevertJournal. Partially written lines are
+    ignored.
+
+    :param path: Path to journal file (string)
+    :return: Dict with "header", "records" (list of lists) and "status"
+             (string or None)
+    """
+    ret = {'header': None, 'records': [], 'status': None}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(
+                    'Ignoring incomplete journal line in "{}"'.format(path)
+                )
+                continue
+            if isinstance(record, dict):
+                if not ret['header']:
+                    ret['header'] = record
+            elif len(record) == 1:
+                ret['status'] = record[0]
+            else:
+                ret['records'].append(record)
+    return ret
+
+
+def list_journals(journal_dir=None):
+    """
+    Return paths to journal files in the journal directory, with flows in
+    subdirectories.
+
+    :param journal_dir: Journal directory (string, default JOURNAL_DIR)
+    :return: List of paths
+    """
+    journal_dir = journal_dir or JOURNAL_DIR
+    if not journal_dir or not os.path.isdir(journal_dir):
+        return []
+    ret = []
+    for root, _, files in os.walk(journal_dir):
+        ret += [
+            os.path.join(root, f) for f in files if f.endswith(JOURNAL_SUFFIX)
+        ]
+    return sorted(ret)
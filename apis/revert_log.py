@@ -0,0 +1,112 @@
+"""Compact undo records for batch tasks"""
+
+from array import array
+import base64
+
+
+# Access levels recorded in the log, None for unmodified access
+ACCESS_CODES = [None, 'null', 'read', 'write', 'own']
+ACCESS_INDEX = {a: i for i, a in enumerate(ACCESS_CODES)}
+# Key identifying a serialized revert log in task state
+STATE_KEY = 'revert_log'
+
+
+class RevertLog:
+    """
+    Compact list of (path, access) records for undoing batch tasks. Parent
+    collection paths are stored once and referenced by index, names are
+    stored in a single byte buffer and access levels as codes of
+    ACCESS_CODES. Iterating the log returns (path, access) tuples in the order
+    they were added. Not thread-safe, appends must be synchronized by the
+    caller.
+    """
+
+    def __init__(self, records=None):
+        """
+        :param records: Iterable of (path, access) tuples (optional)
+        """
+        self._colls = []
+        self._coll_index = {}
+        self._entry_colls = array('I')
+        self._names = bytearray()
+        self._name_ends = array('Q')
+        self._access = bytearray()
+        for path, access in records or []:
+            self.append(path, access)
+
+    def append(self, path, access=None):
+        """
+        Add record to the log.
+
+        :param path: Full path to data object or collection (string)
+        :param access: Previous access or None if not modified (string)
+        """
+        i = path.rfind('/')
+        coll, name = path[:i], path[i + 1 :]
+        coll_idx = self._coll_index.get(coll)
+        if coll_idx is None:
+            coll_idx = len(self._colls)
+            self._coll_index[coll] = coll_idx
+            self._colls.append(coll)
+        self._entry_colls.append(coll_idx)
+        self._names += name.encode('utf-8')
+        self._name_ends.append(len(self._names))
+        self._access.append(ACCESS_INDEX[access])
+
+    def __len__(self):
+        return len(self._entry_colls)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        start = self._name_ends[i - 1] if i > 0 else 0
+        name = self._names[start : self._name_ends[i]].decode('utf-8')
+        return (
+            self._colls[self._entry_colls[i]] + '/' + name,
+            ACCESS_CODES[self._access[i]],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, RevertLog):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def get_paths(self):
+        """Return list of recorded paths"""
+        return [p for p, _ in self]
+
+    def to_dict(self):
+        """Return log in JSON serializable form for persisting (dict)"""
+        return {
+            STATE_KEY: 1,
+            'colls': self._colls,
+            'entry_colls': base64.b64encode(self._entry_colls).decode(),
+            'names': base64.b64encode(self._names).decode(),
+            'name_ends': base64.b64encode(self._name_ends).decode(),
+            'access': base64.b64encode(self._access).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Return log restored from to_dict() output.
+
+        :param data: Dict
+        :return: RevertLog object
+        """
+        log = cls()
+        log._colls = list(data['colls'])
+        log._coll_index = {c: i for i, c in enumerate(log._colls)}
+        log._entry_colls.frombytes(base64.b64decode(data['entry_colls']))
+        log._names = bytearray(base64.b64decode(data['names']))
+        log._name_ends.frombytes(base64.b64decode(data['name_ends']))
+        log._access = bytearray(base64.b64decode(data['access']))
+        return log
@@ -1,12 +1,28 @@
 """API for accessing the Django Taskflow REST service"""
 
-import requests
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
 
 from config import settings
 
 
 TL_URL = 'timeline/taskflow/status/set'
-ZONE_URL = 'zones/taskflow/status/set'
+ZONE_URL = 'landingzones/taskflow/status/set'
+POOL_SIZE = settings.TASKFLOW_SODAR_POOL_SIZE
+REQUEST_TIMEOUT = settings.TASKFLOW_SODAR_TIMEOUT
+STATUS_WINDOW = settings.TASKFLOW_SODAR_STATUS_WINDOW
+PROGRESS_COUNT = settings.TASKFLOW_PROGRESS_INTERVAL_COUNT
+PROGRESS_TIME = settings.TASKFLOW_PROGRESS_INTERVAL_TIME
+SIZE_UNITS = ['B', 'KB', 'MB', 'GB', 'TB']
+
+# Process-local HTTP session, see get_session()
+_session = None
+_session_pid = None
+
+logger = logging.getLogger('sodar_taskflow')
 
 
 class SODARRequestException(Exception):
@@ -15,16 +31,176 @@ class SODARRequestException(Exception):
     pass
 
 
+def get_session():
+    """
+    Return a keep-alive HTTP session shared within the current process. A new
+    session is created after fork, as connections can not be shared between
+    processes.
+
+    :return: requests.Session object
+    """
+    global _session, _session_pid
+    if not _session or _session_pid != os.getpid():
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+        _session_pid = os.getpid()
+    return _session
+
+
+class StatusOutbox:
+    """
+    Outbox for status updates sent to SODAR by a background thread. Updates
+    queued with the same key within the coalescing window replace each other,
+    so only the latest one is sent. Pending updates are sent in batches in the
+    order they were first queued, which retains ordering per key. The sender
+    thread exits once no updates are pending and is restarted by the next
+    update. Errors in sending are raised by check() and flush(), unless a later
+    update with the same key has been sent successfully.
+    """
+
+    def __init__(self, sodar_api, window=STATUS_WINDOW):
+        """
+        :param sodar_api: SODARAPI object
+        :param window: Coalescing window in seconds, send immediately if 0
+        """
+        self.sodar_api = sodar_api
+        self.window = window
+        self._pid = None
+
+    def __getstate__(self):
+        # Thread state is process-local and recreated by _init()
+        return {
+            'sodar_api': self.sodar_api,
+            'window': self.window,
+            '_pid': None,
+        }
+
+    def _init(self):
+        """Initialize outbox state if not done in the current process"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()
+        self._thread = None
+        self._sending = False
+        self._flushing = False
+        self.errors = OrderedDict()  # (URL, key): latest exception
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Wait for further updates to coalesce unless flushing
+                self._cond.wait_for(lambda: self._flushing, self.window)
+                batch = list(self._pending.items())
+                self._pending.clear()
+                if not batch:  # Exit until the next update is queued
+                    self._thread = None
+                    return
+                self._sending = True
+            for (url, key), query_data in batch:
+                try:
+                    self.sodar_api.send_request(url, query_data)
+                    error = None
+                except Exception as ex:
+                    logger.error(
+                        'Error sending status update to "{}": {}'.format(
+                            url, ex
+                        )
+                    )
+                    error = ex
+                with self._cond:
+                    self.errors.pop((url, key), None)
+                    if error:
+                        self.errors[(url, key)] = error
+            with self._cond:
+                self._sending = False
+                self._cond.notify_all()
+
+    def put(self, url, key, query_data):
+        """
+        Queue status update.
+
+        :param url: SODAR API URL (string)
+        :param key: Key for coalescing updates, e.g. zone UUID (string)
+        :param query_data: Request data (dict)
+        """
+        if self.window <= 0:
+            self.sodar_api.send_request(url, query_data)
+            return
+        self._init()
+        with self._cond:
+            self._pending[(url, key)] = query_data
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _raise_errors(self):
+        """Raise and clear collected send errors, call with lock held"""
+        errors = list(self.errors.values())
+        self.errors.clear()
+        if errors:
+            raise SODARRequestException(
+                'Error sending status updates: {}'.format(
+                    '; '.join(str(e) for e in errors)
+                )
+            )
+
+    def check(self):
+        """
+        Raise errors of updates sent so far without waiting for pending ones.
+
+        :raise: SODARRequestException if sending updates failed
+        """
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._raise_errors()
+
+    def flush(self):
+        """
+        Send pending updates and wait until all updates have been sent.
+
+        :raise: SODARRequestException if sending updates failed
+        """
+        if self._pid != os.getpid():
+            return  # Nothing queued in this process
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._pending and not self._sending)
+            self._flushing = False
+            self._raise_errors()
+
+
 class SODARAPI:
     """API for accessing the Django Taskflow REST views"""
 
-    def __init__(self, sodar_url):
+    def __init__(
+        self, sodar_url, timeout=REQUEST_TIMEOUT, status_window=STATUS_WINDOW
+    ):
+        """
+        :param sodar_url: SODAR server URL (string)
+        :param timeout: Request timeout in seconds (int or float)
+        :param status_window: Status update coalescing window in seconds
+        """
         self.sodar_url = sodar_url
+        self.timeout = timeout
+        self.status_outbox = StatusOutbox(self, window=status_window)
 
     def send_request(self, url, query_data):
         request_url = self.sodar_url + '/' + url
         query_data['sodar_secret'] = settings.TASKFLOW_SODAR_SECRET
-        response = requests.post(request_url, data=query_data)
+        response = get_session().post(
+            request_url, data=query_data, timeout=self.timeout
+        )
 
         if response.status_code != 200:
             raise SODARRequestException(
@@ -38,6 +214,7 @@ class SODARAPI:
     def set_timeline_status(
         self, event_uuid, status_type, status_desc=None, extra_data=None
     ):
+        """Queue timeline event status update in the status outbox"""
         set_data = {
             'event_uuid': event_uuid,
             'status_type': status_type,
@@ -45,4 +222,160 @@ class SODARAPI:
             'extra_data': extra_data,
             'sodar_secret': settings.TASKFLOW_SODAR_SECRET,
         }
-        self.send_request(TL_URL, set_data)
+        self.status_outbox.put(TL_URL, event_uuid, set_data)
+
+    def set_zone_status(
+        self, zone_uuid, status, status_info, flow_name=None, extra_data=None
+    ):
+        """Queue landing zone status update in the status outbox"""
+        set_data = {
+            'zone_uuid': zone_uuid,
+            'status': status,
+            'status_info': status_info,
+        }
+        if flow_name:
+            set_data['flow_name'] = flow_name
+        if extra_data:
+            set_data.update(extra_data)
+        self.status_outbox.put(ZONE_URL, zone_uuid, set_data)
+
+    def check_status(self):
+        """
+        Raise errors of status updates sent so far.
+
+        :raise: SODARRequestException if sending updates failed
+        """
+        self.status_outbox.check()
+
+    def flush_status(self):
+        """
+        Wait until queued status updates have been sent.
+
+        :raise: SODARRequestException if sending updates failed
+        """
+        self.status_outbox.flush()
+
+
+def format_size(size):
+    """
+    Return human readable data size.
+
+    :param size: Size in bytes (int)
+    :return: String
+    """
+    for unit in SIZE_UNITS[:-1]:
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = SIZE_UNITS[-1]
+    return '{} {}'.format(round(size, 1) if unit != 'B' else size, unit)
+
+
+class ProgressReporter:
+    """
+    Throttled progress reporting for batch tasks via landing zone status
+    updates. The status is updated at most every interval_count files or
+    interval_time seconds. Updates are queued in the status outbox, so
+    reporting does not block the batch.
+    """
+
+    def __init__(
+        self,
+        sodar_api,
+        zone_uuid,
+        status,
+        status_info,
+        total,
+        sizes=None,
+        flow_name=None,
+        interval_count=PROGRESS_COUNT,
+        interval_time=PROGRESS_TIME,
+    ):
+        """
+        :param sodar_api: SODARAPI object
+        :param zone_uuid: Landing zone UUID (string)
+        :param status: Zone status to report with (string)
+        :param status_info: Status info prefix (string)
+        :param total: Total number of files (int)
+        :param sizes: Dict of file sizes by path (optional)
+        :param flow_name: Name of flow (string, optional)
+        :param interval_count: Report at most every N files (int)
+        :param interval_time: Report at most every T seconds (int or float)
+        """
+        self.sodar_api = sodar_api
+        self.zone_uuid = zone_uuid
+        self.status = status
+        self.status_info = status_info
+        self.total = total
+        self.sizes = sizes or {}
+        self.total_bytes = sum(self.sizes.values())
+        self.flow_name = flow_name
+        self.interval_count = interval_count
+        self.interval_time = interval_time
+        self.start()
+
+    def get_config(self):
+        """Return arguments for recreating the reporter without sodar_api"""
+        return {
+            'zone_uuid': self.zone_uuid,
+            'status': self.status,
+            'status_info': self.status_info,
+            'total': self.total,
+            'sizes': self.sizes,
+            'flow_name': self.flow_name,
+            'interval_count': self.interval_count,
+            'interval_time': self.interval_time,
+        }
+
+    def start(self):
+        """Reset counters and start timing"""
+        self.count = 0
+        self.bytes = 0
+        self.start_time = time.monotonic()
+        self._report_count = 0
+        self._report_time = self.start_time
+
+    def update(self, path=None):
+        """
+        Register a processed file and report progress if an interval has
+        passed.
+
+        :param path: Path of processed file (string, optional)
+        """
+        self.count += 1
+        if path:
+            self.bytes += self.sizes.get(path, 0)
+        if (
+            self.count - self._report_count >= self.interval_count
+            or time.monotonic() - self._report_time >= self.interval_time
+        ):
+            self.report()
+
+    def get_status_info(self):
+        """Return status info string with current progress"""
+        elapsed = time.monotonic() - self.start_time
+        info = '{} ({}/{} files'.format(
+            self.status_info, self.count, self.total
+        )
+        if self.total_bytes:
+            info += ', {}/{}'.format(
+                format_size(self.bytes), format_size(self.total_bytes)
+            )
+        if elapsed > 0:
+            info += ', {:.1f} files/s'.format(self.count / elapsed)
+        return info + ')'
+
+    def report(self):
+        """Queue status update with current progress"""
+        self._report_count = self.count
+        self._report_time = time.monotonic()
+        try:
+            self.sodar_api.set_zone_status(
+                zone_uuid=self.zone_uuid,
+                status=self.status,
+                status_info=self.get_status_info(),
+                flow_name=self.flow_name,
+            )
+        except Exception as ex:  # Never fail the batch for progress reports
+            logger.error('Error reporting progress: {}'.format(ex))
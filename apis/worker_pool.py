@@ -0,0 +1,167 @@
+"""Worker pool for running async flows"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from config import settings
+
+
+POOL_WORKERS = settings.TASKFLOW_ASYNC_WORKERS
+START_METHOD = settings.TASKFLOW_ASYNC_START_METHOD
+
+logger = logging.getLogger('sodar_taskflow')
+
+
+def _run_job(func, args, submit_time):
+    """
+    Run job in a worker process and return timing data.
+
+    :param func: Function to run
+    :param args: Tuple of function arguments
+    :param submit_time: Time of job submission (float)
+    :return: Dict
+    """
+    start_time = time.time()
+    func(*args)
+    return {
+        'queue_wait': start_time - submit_time,
+        'run_time': time.time() - start_time,
+    }
+
+
+class FlowWorkerPool:
+    """
+    Process-local pool of worker processes. Callers check has_capacity()
+    before submitting a job. Workers are started from a fork server by
+    default, so they do not inherit the state of the web server process.
+    """
+
+    def __init__(
+        self, workers=POOL_WORKERS, start_method=START_METHOD, preload=None
+    ):
+        """
+        :param workers: Number of worker processes
+        :param start_method: Multiprocessing start method (string)
+        :param preload: Modules imported once in the fork server (list)
+        """
+        self.workers = workers
+        self.start_method = start_method
+        self.preload = preload
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_wait = 0.0
+        self.run_time = 0.0
+
+    def _check_fork(self):
+        """Drop executor inherited from a parent process after fork"""
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _get_executor(self):
+        if not self._executor:
+            mp_context = multiprocessing.get_context(self.start_method)
+            if self.preload and self.start_method == 'forkserver':
+                mp_context.set_forkserver_preload(self.preload)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=mp_context
+            )
+        return self._executor
+
+    def _done(self, job_name, callback, future):
+        """Record job result and timing"""
+        with self._lock:
+            self.pending -= 1
+            ex = future.exception()
+            if ex:
+                self.failed += 1
+                if isinstance(ex, BrokenProcessPool):
+                    self._executor = None
+            else:
+                result = future.result()
+                self.completed += 1
+                self.queue_wait += result['queue_wait']
+                self.run_time += result['run_time']
+        if ex:
+            logger.error('Async job "{}" failed: {}'.format(job_name, ex))
+        else:
+            logger.info(
+                'Async job "{}" done (queue wait: {:.2f} s, run time: '
+                '{:.2f} s)'.format(
+                    job_name, result['queue_wait'], result['run_time']
+                )
+            )
+        if callback:
+            callback(ex)
+
+    def get_depth(self):
+        """Return number of jobs waiting for a worker"""
+        return max(self.pending - self.workers, 0)
+
+    def has_capacity(self):
+        """Return True if a worker is free to run a job"""
+        self._check_fork()
+        return self.pending < self.workers
+
+    def submit(self, job_name, func, *args, callback=None, submit_time=None):
+        """
+        Submit job to be run in a worker process.
+
+        :param job_name: Name of job for logging (string)
+        :param func: Module level function to run
+        :param args: Function arguments, must be picklable
+        :param callback: Function called with exception or None when done
+        :param submit_time: Time the job was originally submitted (float)
+        """
+        self._check_fork()
+        with self._lock:
+            submit_time = submit_time or time.time()
+            try:
+                future = self._get_executor().submit(
+                    _run_job, func, args, submit_time
+                )
+            except BrokenProcessPool:  # Worker died, start a new executor
+                self._executor = None
+                future = self._get_executor().submit(
+                    _run_job, func, args, submit_time
+                )
+            self.pending += 1
+        future.add_done_callback(lambda f: self._done(job_name, callback, f))
+
+    def shutdown(self, wait=True):
+        """Shut down worker processes"""
+        self._check_fork()
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor:
+            executor.shutdown(wait=wait)
+
+    def get_stats(self):
+        """Return pool statistics as a dict"""
+        self._check_fork()
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'running': min(self.pending, self.workers),
+                'queued': self.get_depth(),
+                'completed': self.completed,
+                'failed': self.failed,
+                'queue_wait_avg': self.queue_wait / self.completed
+                if self.completed
+                else 0.0,
+                'run_time_avg': self.run_time / self.completed
+                if self.completed
+                else 0.0,
+            }
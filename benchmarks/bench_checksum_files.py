@@ -0,0 +1,101 @@
+"""Benchmark for reading .md5 checksum files with a fake iRODS backend"""
+
+import argparse
+import io
+import time
+
+from apis import irods_utils
+
+
+CHECKSUM = 'd41d8cd98f00b204e9800998ecf8427e'
+
+
+class FakeFile(io.BytesIO):
+    """Fake data object file with latency for each read"""
+
+    def __init__(self, data, latency):
+        super().__init__(data)
+        self.latency = latency
+
+    def read(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().read(*args, **kwargs)
+
+
+class FakeDataObjectManager:
+    """Fake data object manager with latency for opening files"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def open(self, path, mode='r'):
+        time.sleep(self.latency)
+        data = '{}  {}'.format(CHECKSUM, path.split('/')[-1]).encode('utf-8')
+        return FakeFile(data, self.latency)
+
+
+class FakeIrods:
+    """Fake iRODS session"""
+
+    def __init__(self, latency):
+        self.data_objects = FakeDataObjectManager(latency)
+
+
+class FakeSessionPool:
+    """Fake iRODS session pool returning fake sessions"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def get_clone(self, irods):
+        return FakeIrods(self.latency)
+
+    def release(self, irods):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=1000, help='Number of files'
+    )
+    parser.add_argument(
+        '-l',
+        '--latency',
+        type=float,
+        default=0.002,
+        help='Latency per iRODS request in seconds',
+    )
+    parser.add_argument(
+        '-c',
+        '--concurrency',
+        type=int,
+        nargs='+',
+        default=[1, 4, 8, 16],
+        help='Concurrency values to benchmark',
+    )
+    args = parser.parse_args()
+
+    irods_utils.session_pool = FakeSessionPool(args.latency)
+    paths = [
+        '/omicsZone/zone/file{}.fastq.gz'.format(i) for i in range(args.count)
+    ]
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        checksums = dict(
+            irods_utils.read_checksum_files(
+                FakeIrods(args.latency), paths, concurrency
+            )
+        )
+        elapsed = time.perf_counter() - start
+        assert len(checksums) == args.count
+        assert set(checksums.values()) == {CHECKSUM}
+        print(
+            'concurrency {}: {} files in {:.3f} s ({:.0f} files/s)'.format(
+                concurrency, args.count, elapsed, args.count / elapsed
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark for sodar_taskflow startup import time"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+STARTUP_CODE = 'import sodar_taskflow'
+FLOW_CODE = 'import flows; flows.get_flow("{}")'
+# Budget for cumulative import time of sodar_taskflow in milliseconds
+IMPORT_BUDGET = 300
+# Modules which should only be imported when running flows
+DEFERRED_MODULES = [
+    'irods',
+    'networkx',
+    'redis',
+    'requests',
+    'sqlalchemy',
+    'taskflow',
+    'tooz',
+]
+
+
+def run(code, count):
+    """Return median wall time of running code in a new interpreter"""
+    times = []
+    for _ in range(count):
+        out = subprocess.run(
+            [
+                sys.executable,
+                '-c',
+                'import time; t = time.perf_counter(); {}; '
+                'print(time.perf_counter() - t)'.format(code),
+            ],
+            stdout=subprocess.PIPE,
+            check=True,
+            env=os.environ,
+        ).stdout
+        times.append(float(out.decode().strip().split('\n')[-1]))
+    return statistics.median(times)
+
+
+def run_importtime():
+    """
+    Import sodar_taskflow with python -X importtime.
+
+    :return: List of (cumulative time in ms, module name, depth) tuples for
+             sodar_taskflow and modules imported by it
+    """
+    env = dict(os.environ, TASKFLOW_PRELOAD='0')
+    err = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        stderr=subprocess.PIPE,
+        check=True,
+        env=env,
+    ).stderr
+    ret = []
+    for line in err.decode().split('\n'):
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:') :].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        ret.append((int(cumulative) / 1000, name.strip(), depth))
+    # Modules are listed before the module importing them
+    end = next(i for i, v in enumerate(ret) if v[1] == 'sodar_taskflow')
+    start = end
+    while start > 0 and ret[start - 1][2] > 0:
+        start -= 1
+    return ret[start : end + 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=10, help='Number of imports'
+    )
+    parser.add_argument(
+        '-f',
+        '--flow',
+        default='landing_zone_move',
+        help='Flow to load after startup',
+    )
+    parser.add_argument(
+        '-b',
+        '--budget',
+        type=float,
+        default=IMPORT_BUDGET,
+        help='Import time budget for sodar_taskflow in ms',
+    )
+    parser.add_argument(
+        '-t', '--top', type=int, default=10, help='Top imports to list'
+    )
+    args = parser.parse_args()
+
+    elapsed = run(STARTUP_CODE, args.count)
+    print('import sodar_taskflow: {:.1f} ms'.format(elapsed * 1000))
+    elapsed = run(FLOW_CODE.format(args.flow), args.count)
+    print('get_flow("{}"): {:.1f} ms'.format(args.flow, elapsed * 1000))
+
+    totals = []
+    for _ in range(args.count):
+        imports = run_importtime()
+        totals.append(
+            next(t for t, name, _ in imports if name == 'sodar_taskflow')
+        )
+    total = statistics.median(totals)
+    print('\nImports of sodar_taskflow (cumulative):')
+    top = sorted((i for i in imports if i[2] == 1), reverse=True)
+    for cumulative, name, _ in top[: args.top]:
+        print('  {:8.1f} ms  {}'.format(cumulative, name))
+    deferred = sorted(
+        set(
+            name.split('.')[0]
+            for _, name, _ in imports
+            if name.split('.')[0] in DEFERRED_MODULES
+        )
+    )
+    if deferred:
+        print('Imported deferred modules: {}'.format(', '.join(deferred)))
+    print('Total: {:.1f} ms (budget: {:.1f} ms)'.format(total, args.budget))
+    if deferred or total > args.budget:
+        print('Import budget exceeded')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Benchmark for project lock acquire/release with a local Redis stand-in"""
+
+import argparse
+import time
+
+import fakeredis
+from tooz.drivers import redis as tooz_redis
+
+from apis import lock_api
+
+
+LOCK_ID = 'e4b3c1a2-0d7e-4f0b-9a51-3f5b8e2c6d10'
+
+
+class StandInRedis(fakeredis.FakeStrictRedis):
+    """In-memory Redis client with latency for connecting and each command"""
+
+    latency = 0
+    connect_latency = 0
+
+    def __init__(self, *args, **kwargs):
+        time.sleep(self.connect_latency)
+        super().__init__(*args, **kwargs)
+
+    def execute_command(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().execute_command(*args, **kwargs)
+
+    def info(self, *args, **kwargs):
+        return {'redis_version': '6.2.0'}
+
+
+def run(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=200, help='Number of flows'
+    )
+    parser.add_argument(
+        '-l',
+        '--latency',
+        type=float,
+        default=0.0005,
+        help='Latency per Redis command in seconds',
+    )
+    parser.add_argument(
+        '-c',
+        '--connect-latency',
+        type=float,
+        default=0.002,
+        help='Latency for opening a Redis connection in seconds',
+    )
+    args = parser.parse_args()
+
+    server = fakeredis.FakeServer()
+    StandInRedis.latency = args.latency
+    StandInRedis.connect_latency = args.connect_latency
+    tooz_redis.RedisDriver._make_client = classmethod(
+        lambda cls, *a: StandInRedis(server=server)
+    )
+
+    def _per_flow():
+        coordinator = lock_api._create_coordinator()
+        lock = coordinator.get_lock(LOCK_ID)
+        lock_api.acquire(lock)
+        lock_api.release(lock)
+        coordinator.stop()
+
+    def _shared():
+        lock = lock_api.get_coordinator().get_lock(LOCK_ID)
+        lock_api.acquire(lock)
+        lock_api.release(lock)
+
+    elapsed = run(_per_flow, args.count)
+    print('Coordinator per flow: {:.3f} ms per lock'.format(elapsed * 1000))
+    lock_api.get_coordinator()  # Created once per process
+    elapsed = run(_shared, args.count)
+    print('Shared coordinator: {:.3f} ms per lock'.format(elapsed * 1000))
+    lock_api.stop_coordinator()
+
+
+if __name__ == '__main__':
+    main()
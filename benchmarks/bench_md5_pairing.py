@@ -0,0 +1,76 @@
+"""Benchmark for pairing data object and .md5 checksum file paths"""
+
+import argparse
+import time
+
+from apis.irods_utils import get_unpaired_md5_paths, split_md5_paths
+
+
+ZONE_PATH = '/omicsZone/projects/00/00000000-0000-0000-0000-000000000000/zone'
+
+
+def get_paths(count):
+    """Return synthetic zone paths with .md5 files for each file"""
+    ret = []
+    for i in range(count // 2):
+        p = '{}/sample{}/file{}.fastq.gz'.format(ZONE_PATH, i % 1000, i)
+        ret += [p, p + '.md5']
+    return ret
+
+
+def legacy_pairing(paths):
+    """List based pairing used prior to get_unpaired_md5_paths()"""
+    file_paths = list(
+        set([p for p in paths if p[p.rfind('.') + 1 :].lower() != 'md5'])
+    )
+    md5_paths = list(set([p for p in paths if p not in file_paths]))
+    err_paths = []
+    for p in file_paths:
+        if p + '.md5' not in md5_paths:
+            err_paths.append(p + '.md5')
+    for p in md5_paths:
+        if p[:-4] not in file_paths:
+            err_paths.append(p[:-4])
+    return err_paths
+
+
+def pairing(paths):
+    file_paths, md5_paths = split_md5_paths(paths)
+    return get_unpaired_md5_paths(file_paths, md5_paths)
+
+
+def run(func, paths):
+    start = time.perf_counter()
+    err_paths = func(paths)
+    elapsed = time.perf_counter() - start
+    assert not err_paths
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=1000000, help='Number of paths'
+    )
+    parser.add_argument(
+        '-l',
+        '--legacy-count',
+        type=int,
+        default=10000,
+        help='Number of paths for legacy pairing (0 to skip)',
+    )
+    args = parser.parse_args()
+
+    elapsed = run(pairing, get_paths(args.count))
+    print('pairing: {} paths in {:.3f} s'.format(args.count, elapsed))
+    if args.legacy_count:
+        elapsed = run(legacy_pairing, get_paths(args.legacy_count))
+        print(
+            'legacy pairing: {} paths in {:.3f} s'.format(
+                args.legacy_count, elapsed
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
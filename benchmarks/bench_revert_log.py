@@ -0,0 +1,87 @@
+"""Benchmark for memory use of batch move undo records"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from apis.revert_log import RevertLog
+
+
+ZONE_PATH = (
+    '/omicsZone/projects/a1/a1b2c3d4-0000-4000-8000-000000000000/'
+    'landing_zones/user/study_0000/assay_0000/20221001_120000_zone'
+)
+
+
+def get_records(count, per_coll):
+    """Return synthetic (path, access) records of a landing zone move"""
+    for i in range(count):
+        yield (
+            '{}/sample_{:05d}/run_{:d}/file_{:07d}.fastq.gz'.format(
+                ZONE_PATH, i // per_coll, i % 2, i
+            ),
+            'null' if i % 10 else None,
+        )
+
+
+def measure(func):
+    """Return result of func, memory allocated by it in bytes and time"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    ret = func()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return ret, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=1000000, help='Number of objects'
+    )
+    parser.add_argument(
+        '-c',
+        '--per-coll',
+        type=int,
+        default=100,
+        help='Number of objects per sample collection',
+    )
+    args = parser.parse_args()
+
+    def _list():
+        ret = []
+        for path, access in get_records(args.count, args.per_coll):
+            ret.append((path, access))
+        return ret
+
+    def _log():
+        ret = RevertLog()
+        for path, access in get_records(args.count, args.per_coll):
+            ret.append(path, access)
+        return ret
+
+    records, size, elapsed = measure(_list)
+    state_size = len(json.dumps(records))
+    print(
+        'List of tuples: {:.1f} MB in memory, {:.1f} MB serialized, '
+        '{:.2f} s'.format(size / 1e6, state_size / 1e6, elapsed)
+    )
+    del records
+    log, size, elapsed = measure(_log)
+    state_size = len(json.dumps(log.to_dict()))
+    print(
+        'RevertLog: {:.1f} MB in memory, {:.1f} MB serialized, '
+        '{:.2f} s'.format(size / 1e6, state_size / 1e6, elapsed)
+    )
+    start = time.perf_counter()
+    for _ in log:
+        pass
+    print('RevertLog iteration: {:.2f} s'.format(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark for SODAR API requests against a local stub HTTP server"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+import requests
+
+from apis.sodar_api import SODARAPI
+from config import settings
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Stub SODAR view handler accepting all POST requests"""
+
+    protocol_version = 'HTTP/1.1'  # Enable keep-alive
+    disable_nagle_algorithm = True  # Avoid delayed ACK stalls on keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'OK')
+
+    def log_message(self, *args):
+        pass
+
+
+def run(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=500, help='Number of requests'
+    )
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sodar_url = 'http://127.0.0.1:{}'.format(server.server_port)
+    query_data = {
+        'zone_uuid': '00000000-0000-0000-0000-000000000000',
+        'status': 'MOVING',
+        'status_info': 'Moving files',
+    }
+
+    def _post():
+        requests.post(
+            sodar_url + '/landingzones/taskflow/status/set',
+            data=dict(query_data, sodar_secret=settings.TASKFLOW_SODAR_SECRET),
+        )
+
+    sodar_api = SODARAPI(sodar_url)
+
+    def _send():
+        sodar_api.send_request(
+            'landingzones/taskflow/status/set', dict(query_data)
+        )
+
+    elapsed = run(_post, args.count)
+    print('requests.post: {:.3f} ms per call'.format(elapsed * 1000))
+    elapsed = run(_send, args.count)
+    print('SODARAPI.send_request: {:.3f} ms per call'.format(elapsed * 1000))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
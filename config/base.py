@@ -31,6 +31,12 @@ TASKFLOW_IRODS_ENV = {
 TASKFLOW_IRODS_ENV_OVERRIDE = os.getenv('TASKFLOW_IRODS_ENV_OVERRIDE', None)
 TASKFLOW_IRODS_CERT_PATH = os.getenv('TASKFLOW_IRODS_CERT_PATH', None)
 
+# iRODS session pool: max idle sessions per server and idle timeout in seconds
+TASKFLOW_IRODS_POOL_SIZE = int(os.getenv('TASKFLOW_IRODS_POOL_SIZE', 8))
+TASKFLOW_IRODS_POOL_IDLE_TIMEOUT = int(
+    os.getenv('TASKFLOW_IRODS_POOL_IDLE_TIMEOUT', 300)
+)
+
 # iRODS server test settings
 TASKFLOW_IRODS_PROJECT_ROOT = '/{}{}/projects'.format(
     TASKFLOW_IRODS_ZONE,
@@ -42,6 +48,20 @@ TASKFLOW_SAMPLE_COLL = 'sample_data'
 TASKFLOW_LANDING_ZONE_COLL = 'landing_zones'
 
 TASKFLOW_SODAR_URL = os.getenv('TASKFLOW_SODAR_URL', 'http://0.0.0.0:8000')
+# Max kept-alive connections to SODAR and request timeout in seconds
+TASKFLOW_SODAR_POOL_SIZE = int(os.getenv('TASKFLOW_SODAR_POOL_SIZE', 10))
+TASKFLOW_SODAR_TIMEOUT = int(os.getenv('TASKFLOW_SODAR_TIMEOUT', 60))
+# Window in seconds for coalescing status updates (0 = send immediately)
+TASKFLOW_SODAR_STATUS_WINDOW = float(
+    os.getenv('TASKFLOW_SODAR_STATUS_WINDOW', 0.5)
+)
+# Report batch task progress every N files or T seconds
+TASKFLOW_PROGRESS_INTERVAL_COUNT = int(
+    os.getenv('TASKFLOW_PROGRESS_INTERVAL_COUNT', 1000)
+)
+TASKFLOW_PROGRESS_INTERVAL_TIME = float(
+    os.getenv('TASKFLOW_PROGRESS_INTERVAL_TIME', 5)
+)
 TASKFLOW_REDIS_URL = os.getenv('TASKFLOW_REDIS_URL', 'redis://0.0.0.0:6633')
 
 TASKFLOW_SODAR_SECRET = os.getenv('TASKFLOW_SODAR_SECRET', 'CHANGE ME!')
@@ -53,9 +73,56 @@ TASKFLOW_IRODS_TEST_PORT = os.getenv('TASKFLOW_IRODS_TEST_PORT', 4488)
 TASKFLOW_IRODS_TEST_USER = os.getenv('TASKFLOW_IRODS_TEST_USER', 'rods')
 TASKFLOW_IRODS_TEST_PASS = os.getenv('TASKFLOW_IRODS_TEST_PASS', 'rods')
 
+# Number of parallel iRODS sessions used in batch tasks (1 = serial)
+TASKFLOW_BATCH_CONCURRENCY = int(os.getenv('TASKFLOW_BATCH_CONCURRENCY', 4))
+# Default max threads for unordered flow sections (1 = serial)
+TASKFLOW_PARALLEL_WORKERS = int(os.getenv('TASKFLOW_PARALLEL_WORKERS', 4))
+
+# Worker processes per runner and maximum pending jobs for async flows
+TASKFLOW_ASYNC_WORKERS = int(os.getenv('TASKFLOW_ASYNC_WORKERS', 4))
+TASKFLOW_ASYNC_QUEUE_SIZE = int(os.getenv('TASKFLOW_ASYNC_QUEUE_SIZE', 16))
+TASKFLOW_ASYNC_START_METHOD = os.getenv(
+    'TASKFLOW_ASYNC_START_METHOD', 'forkserver'
+)
+# Seconds after which jobs of a silent runner are requeued
+TASKFLOW_RUNNER_HEARTBEAT_TTL = int(
+    os.getenv('TASKFLOW_RUNNER_HEARTBEAT_TTL', 30)
+)
+TASKFLOW_JOB_MAX_ATTEMPTS = int(os.getenv('TASKFLOW_JOB_MAX_ATTEMPTS', 3))
+
+# Import flow dependencies at startup instead of on first use
+TASKFLOW_PRELOAD = bool(int(os.getenv('TASKFLOW_PRELOAD', 0)))
+
+# Directory for persistent service data, should be an absolute path
+TASKFLOW_DATA_DIR = os.getenv('TASKFLOW_DATA_DIR', '/var/lib/sodar_taskflow')
+
+# Taskflow persistence backend for resuming interrupted flows (empty = off)
+TASKFLOW_PERSISTENCE_URL = os.getenv(
+    'TASKFLOW_PERSISTENCE_URL',
+    'sqlite:///' + os.path.join(TASKFLOW_DATA_DIR, 'sodar_taskflow.db'),
+)
+
+# Directory for on-disk journals of batch task changes (empty = off)
+TASKFLOW_JOURNAL_DIR = os.getenv(
+    'TASKFLOW_JOURNAL_DIR', os.path.join(TASKFLOW_DATA_DIR, 'journal')
+)
+# Number of records written at once and max seconds between writes
+TASKFLOW_JOURNAL_FLUSH_COUNT = int(
+    os.getenv('TASKFLOW_JOURNAL_FLUSH_COUNT', 1000)
+)
+TASKFLOW_JOURNAL_FSYNC_INTERVAL = float(
+    os.getenv('TASKFLOW_JOURNAL_FSYNC_INTERVAL', 1)
+)
+
 TASKFLOW_LOCK_RETRY_COUNT = 2
 TASKFLOW_LOCK_RETRY_INTERVAL = 3
 TASKFLOW_LOCK_ENABLED = True
+# Wait in line for project locks instead of retrying, with timeouts in seconds.
+# The sync wait is spent in the request and must stay well below the gunicorn
+# worker timeout (GUNICORN_TIMEOUT, 600 by default) to leave time for the flow
+TASKFLOW_LOCK_WAIT = bool(int(os.getenv('TASKFLOW_LOCK_WAIT', 1)))
+TASKFLOW_LOCK_WAIT_SYNC = float(os.getenv('TASKFLOW_LOCK_WAIT_SYNC', 30))
+TASKFLOW_LOCK_WAIT_ASYNC = float(os.getenv('TASKFLOW_LOCK_WAIT_ASYNC', 3600))
 
 TASKFLOW_FORCE_FAIL_STRING = 'force_fail=True'
 
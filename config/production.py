@@ -7,3 +7,4 @@ FLASK_ENV = 'production'
 # Taskflow
 TASKFLOW_LOG_TO_FILE = os.getenv('TASKFLOW_LOG_TO_FILE', True)
 TASKFLOW_LOG_LEVEL = os.getenv('TASKFLOW_LOG_LEVEL', 'WARNING')
+TASKFLOW_PRELOAD = bool(int(os.getenv('TASKFLOW_PRELOAD', 1)))
@@ -7,3 +7,5 @@ TESTING = True
 # Taskflow
 TASKFLOW_ALLOW_IRODS_CLEANUP = True
 TASKFLOW_LOG_LEVEL = 'CRITICAL'
+TASKFLOW_PERSISTENCE_URL = 'memory://'
+TASKFLOW_JOURNAL_DIR = ''
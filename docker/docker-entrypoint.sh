@@ -5,6 +5,7 @@ set -euo pipefail
 # Commands:
 #
 #   wsgi            -- run SODAR Taskflow with GUnicorn WSGI
+#   runner          -- run SODAR Taskflow async flow runner
 #
 # Environment Variables:
 #
@@ -45,7 +46,12 @@ if [[ "$1" == wsgi ]]; then
     --bind "$HTTP_HOST:$HTTP_PORT" \
     --timeout "$GUNICORN_TIMEOUT" \
     --workers 4 \
+    --preload \
     sodar_taskflow:app
+elif [[ "$1" == runner ]]; then
+  cd $APP_DIR
+  export SODAR_TASKFLOW_SETTINGS=${APP_DIR}/config/production.py
+  exec python runner.py
 else
   cd $APP_DIR
   exec "$@"
@@ -1,25 +1,58 @@
-# Import code adapted from http://stackoverflow.com/a/6246478
-import os
-import sys
+"""Registry of flows supported by SODAR Taskflow"""
 
-path = os.path.dirname(os.path.abspath(__file__))
+import importlib
 
-for py in [
-    f[:-3] for f in os.listdir(path) if f.endswith('.py') and f != '__init__.py'
-]:
-    mod = __import__('.'.join([__name__, py]), fromlist=[py])
-    classes = [
-        getattr(mod, x) for x in dir(mod) if isinstance(getattr(mod, x), type)
-    ]
 
-    for cls in classes:
-        setattr(sys.modules[__name__], cls.__name__, cls)
+# Supported flow names, each implemented as Flow in the module of the same name
+FLOW_NAMES = [
+    'data_delete',
+    'landing_zone_create',
+    'landing_zone_delete',
+    'landing_zone_move',
+    'project_create',
+    'project_update',
+    'public_access_update',
+    'role_delete',
+    'role_sync_delete_all',
+    'role_update',
+    'role_update_irods_batch',
+    'sheet_colls_create',
+    'sheet_delete',
+]
+
+# Flow classes imported so far, see get_flow()
+_flows = {}
 
 
 def get_flow(name):
-    """Return flow implementation or None if not found"""
-    try:
-        return eval('{}.Flow'.format(name))
+    """
+    Return flow implementation or None if not found. The flow module is
+    imported on first use.
+
+    :param name: Flow name (string)
+    :return: Flow class or None
+    """
+    if name not in FLOW_NAMES:
+        return None
+    if name not in _flows:
+        _flows[name] = importlib.import_module(
+            '{}.{}'.format(__name__, name)
+        ).Flow
+    return _flows[name]
+
+
+def get_flow_info(name):
+    """
+    Return supported request modes and lock requirement of a flow without
+    building it.
 
-    except NameError:
+    :param name: Flow name (string)
+    :return: Dict or None if not found
+    """
+    flow_cls = get_flow(name)
+    if not flow_cls:
         return None
+    return {
+        'supported_modes': list(flow_cls.supported_modes),
+        'require_lock': flow_cls.require_lock,
+    }
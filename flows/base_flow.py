@@ -1,16 +1,72 @@
+import contextlib
+import hashlib
+import importlib
 import logging
-from taskflow import engines
+import os
+import uuid
+from taskflow import engines, states
+from taskflow.listeners import base as listener_base
 from taskflow.patterns import linear_flow as lf
+from taskflow.patterns import unordered_flow as uf
 
-from tasks.base_task import ForceFailException
+from apis import persistence_api
+from apis.irods_utils import CollectionCache
+from apis.sodar_api import ProgressReporter
+from apis.revert_journal import (
+    JOURNAL_SUFFIX,
+    STATUS_DONE,
+    STATUS_REVERTED,
+    list_journals,
+    read_journal,
+)
+from config import settings
+import flows
+from tasks.base_task import BaseTask, ForceFailException
 
 
 logger = logging.getLogger('sodar_taskflow')
 
+# Flow states in which an interrupted flow is reverted instead of continued
+REVERT_STATES = [states.REVERTING, states.REVERTED, states.FAILURE]
+# Flow states after which the saved flow detail is no longer needed
+FINISHED_STATES = [states.SUCCESS, states.REVERTED]
+PARALLEL_WORKERS = settings.TASKFLOW_PARALLEL_WORKERS
+JOURNAL_DIR = settings.TASKFLOW_JOURNAL_DIR
+# Lists and dicts with more items are saved once and referenced in flow meta
+DATA_REF_SIZE = 100
+DATA_REF_KEY = '_data_ref'
+
+
+class TaskStateListener(listener_base.Listener):
+    """Listener for persisting task undo state once a task is completed"""
+
+    def __init__(self, engine, tasks):
+        """
+        :param engine: Taskflow engine object
+        :param tasks: List of task objects
+        """
+        super().__init__(
+            engine,
+            task_listen_for=[states.SUCCESS],
+            flow_listen_for=[],
+            retry_listen_for=[],
+        )
+        self.tasks = {t.name: t for t in tasks}
+
+    def _task_receiver(self, state, details):
+        task = self.tasks.get(details['task_name'])
+        if task:
+            self._engine.storage.update_atom_metadata(
+                task.name, {'state': task.get_state()}
+            )
+
 
 class BaseLinearFlow:
     """Base class for linear flows used for task queues"""
 
+    supported_modes = ['sync']  # Support only sync by default
+    require_lock = True  # Always require project lock by default
+
     def __init__(
         self,
         irods,
@@ -31,12 +87,21 @@ class BaseLinearFlow:
         self.required_fields = []  # For validation
         self.timeline_uuid = timeline_uuid
         self.request_mode = request_mode
-        self.supported_modes = [
-            'sync',
-            # 'async'                   # Support only sync by default
-        ]
-        self.require_lock = True  # Always require project lock by default
         self.flow = lf.Flow(flow_name)
+        self.restored = False
+        # Max threads for running tasks in unordered sections (1 = serial)
+        self.max_workers = PARALLEL_WORKERS
+        # Collections known to exist, shared by the iRODS tasks of the flow
+        self.coll_cache = CollectionCache()
+        # Directory for journals of batch tasks, None if not enabled
+        self.journal_dir = None
+        if JOURNAL_DIR:
+            self.journal_dir = os.path.join(
+                JOURNAL_DIR, timeline_uuid or str(uuid.uuid4())
+            )
+        # Interrupted tasks to be reverted from their journals
+        self._interrupted = []
+        self._section = None
 
     def validate(self):
         """
@@ -56,7 +121,54 @@ class BaseLinearFlow:
     def add_task(self, task):
         """Add task into the flow, if in current targets."""
         if task.target in self.targets:
-            self.flow.add(task)
+            self._setup_task(task)
+            if self._section is not None:
+                task.parallel = True
+                self._section.add(task)
+            else:
+                self.flow.add(task)
+
+    def _setup_task(self, task):
+        """Set shared collection cache and journal path for iRODS tasks"""
+        if hasattr(task, 'coll_cache'):
+            task.coll_cache = self.coll_cache
+        if hasattr(task, 'journal_path') and self.journal_dir:
+            task.journal_path = os.path.join(
+                self.journal_dir,
+                hashlib.sha1(task.name.encode('utf-8')).hexdigest()[:16]
+                + JOURNAL_SUFFIX,
+            )
+            task.journal_info = {
+                'flow_name': self.flow_name,
+                'project_uuid': self.project_uuid,
+                'timeline_uuid': self.timeline_uuid,
+            }
+
+    @contextlib.contextmanager
+    def unordered(self, name):
+        """
+        Context manager for adding tasks which do not depend on each other.
+        Tasks added within the context may be run in parallel, after tasks
+        added before and before tasks added after the context.
+
+        :param name: Name of the section (string)
+        """
+        self._section = uf.Flow('{} ({})'.format(name, len(self.flow)))
+        try:
+            yield
+        finally:
+            section = self._section
+            self._section = None
+        if len(section):
+            self.flow.add(section)
+
+    def iter_tasks(self):
+        """Return iterator for all tasks in the flow"""
+        for node in self.flow:
+            if isinstance(node, uf.Flow):
+                yield from node
+            else:
+                yield node
 
     def build(self, force_fail=False):
         """
@@ -69,21 +181,240 @@ class BaseLinearFlow:
         logger.error(msg)
         raise NotImplementedError(msg)
 
+    def get_meta(self, data=None):
+        """
+        Return flow metadata for persisting and restoring the flow.
+
+        :param data: Dict for storing large values referenced from the
+                     metadata, kept in the metadata if not given
+        :return: Dict
+        """
+        return {
+            'flow_name': self.flow_name,
+            'project_uuid': self.project_uuid,
+            'targets': self.targets,
+            'request_mode': self.request_mode,
+            'sodar_url': self.sodar_api.sodar_url if self.sodar_api else None,
+            'tasks': [
+                {
+                    'unordered': n.name,
+                    'tasks': [self._get_task_meta(t, data) for t in n],
+                }
+                if isinstance(n, uf.Flow)
+                else self._get_task_meta(n, data)
+                for n in self.flow
+            ],
+        }
+
+    @classmethod
+    def _get_data_ref(cls, value, data):
+        """Store large value in data and return a reference to it"""
+        if (
+            data is None
+            or not isinstance(value, (list, dict))
+            or len(value) <= DATA_REF_SIZE
+        ):
+            return value
+        key = str(id(value))  # Values shared by tasks are stored once
+        data[key] = value
+        return {DATA_REF_KEY: key}
+
+    @classmethod
+    def _get_task_meta(cls, task, data=None):
+        kwargs = dict(task.init_kwargs)
+        if kwargs.get('inject'):
+            kwargs['inject'] = {
+                k: cls._get_data_ref(v, data)
+                for k, v in kwargs['inject'].items()
+            }
+        ret = {
+            'cls': '{}.{}'.format(
+                task.__class__.__module__, task.__class__.__name__
+            ),
+            'kwargs': kwargs,
+        }
+        if getattr(task, 'progress', None):
+            ret['progress'] = {
+                k: cls._get_data_ref(v, data)
+                for k, v in task.progress.get_config().items()
+            }
+        return ret
+
+    @classmethod
+    def _get_data(cls, value, data):
+        """Return value referenced by _get_data_ref()"""
+        if isinstance(value, dict) and DATA_REF_KEY in value:
+            return data[value[DATA_REF_KEY]]
+        return value
+
+    def _restore_task(self, task_data, atom_details, revert, data):
+        """Recreate task and restore its state, return None if skipped"""
+        module_name, cls_name = task_data['cls'].rsplit('.', 1)
+        cls = getattr(importlib.import_module(module_name), cls_name)
+        kwargs = dict(task_data['kwargs'])
+        if kwargs.get('inject'):
+            kwargs['inject'] = {
+                k: self._get_data(v, data) for k, v in kwargs['inject'].items()
+            }
+        if task_data.get('progress') and self.sodar_api:
+            kwargs['progress'] = ProgressReporter(
+                sodar_api=self.sodar_api,
+                **{
+                    k: self._get_data(v, data)
+                    for k, v in task_data['progress'].items()
+                }
+            )
+        task = cls(
+            irods=self.irods,
+            sodar_api=self.sodar_api,
+            project_uuid=self.project_uuid,
+            **kwargs
+        )
+        self._setup_task(task)
+        atom_detail = atom_details.get(task.name)
+        if atom_detail and 'state' in atom_detail.meta:
+            task.set_state(atom_detail.meta['state'])
+        if revert and (not atom_detail or atom_detail.state != states.SUCCESS):
+            # The engine only reverts completed tasks, so tasks interrupted
+            # while running are reverted from their journals
+            if atom_detail and hasattr(task, 'revert_journal'):
+                self._interrupted.append(task)
+            return None
+        return task
+
+    def restore(self, flow_detail, revert=False):
+        """
+        Replace tasks of the flow with the ones saved in a flow detail and
+        restore their undo state. If reverting, only completed tasks are
+        restored, followed by a failing task to revert them. Interrupted tasks
+        writing a journal are reverted from their journals when running.
+
+        :param flow_detail: FlowDetail object
+        :param revert: Revert instead of continuing the flow (boolean)
+        """
+        atom_details = {ad.name: ad for ad in flow_detail}
+        backend = persistence_api.get_backend()
+        data = (
+            persistence_api.get_flow_data(backend, flow_detail.uuid)
+            if backend
+            else {}
+        )
+        self.flow = lf.Flow(self.flow_name)
+        self._interrupted = []
+        for node_data in flow_detail.meta['tasks']:
+            if 'unordered' not in node_data:
+                task = self._restore_task(node_data, atom_details, revert, data)
+                if task:
+                    self.flow.add(task)
+                continue
+            section = uf.Flow(node_data['unordered'])
+            for task_data in node_data['tasks']:
+                task = self._restore_task(task_data, atom_details, revert, data)
+                if task:
+                    task.parallel = True
+                    section.add(task)
+            if len(section):
+                self.flow.add(section)
+        if revert:
+            self.flow.add(
+                BaseTask(name='Revert interrupted flow', force_fail=True)
+            )
+        self.restored = True
+
+    def _get_flow_detail(self, backend):
+        """Return saved flow detail, restoring the flow if interrupted"""
+        flow_detail = persistence_api.get_flow_detail(
+            backend, self.timeline_uuid
+        )
+        if not flow_detail:
+            data = {}
+            meta = self.get_meta(data)
+            return persistence_api.create_flow_detail(
+                backend, self.timeline_uuid, self.flow_name, meta, data
+            )
+        if not self.restored:
+            revert = flow_detail.state in REVERT_STATES
+            logger.info(
+                'Restoring interrupted flow "{}" ({})'.format(
+                    self.timeline_uuid, 'revert' if revert else 'continue'
+                )
+            )
+            self.restore(flow_detail, revert=revert)
+        return flow_detail
+
+    def _remove_journals(self, flow_state):
+        """
+        Remove task journals of a finished flow. Journals of tasks which were
+        not completed or reverted along with the flow are kept for reverting
+        them with journal.py.
+
+        :param flow_state: Final state of the flow (string)
+        """
+        for path in list_journals(self.journal_dir):
+            status = read_journal(path)['status']
+            if status == STATUS_REVERTED or (
+                status == STATUS_DONE and flow_state == states.SUCCESS
+            ):
+                os.remove(path)
+            else:
+                logger.warning(
+                    'Keeping journal "{}" with status "{}"'.format(path, status)
+                )
+        try:
+            os.rmdir(self.journal_dir)
+        except OSError:
+            pass  # Not empty or not created
+
     def run(self, verbose=True):
         """
         Run the flow. Returns True or False depending on success. If False,
         the flow was rolled back. Also handle project locking and unlocking.
+
+        Flows with unordered sections are run on the parallel engine with up to
+        max_workers threads. If persistence is enabled and the flow has a
+        timeline UUID, flow progress is saved under it. An interrupted flow
+        with the same UUID is restored and continued or reverted from its last
+        completed task.
         """
         if verbose:
             logger.info('--- Running flow "{}" ---'.format(self.flow.name))
-        engine = engines.load(self.flow, engine='serial')
+        backend = None
+        flow_detail = None
+        if self.timeline_uuid:
+            backend = persistence_api.get_backend()
+        if backend:
+            flow_detail = self._get_flow_detail(backend)
+        # Revert interrupted tasks before the engine reverts completed tasks
+        for task in reversed(self._interrupted):
+            task.revert_journal()
+        self._interrupted = []
+        engine_kwargs = {'engine': 'serial'}
+        if self.max_workers > 1 and any(
+            isinstance(n, uf.Flow) for n in self.flow
+        ):
+            engine_kwargs = {
+                'engine': 'parallel',
+                'executor': 'threaded',
+                'max_workers': self.max_workers,
+            }
+        engine = engines.load(
+            self.flow, backend=backend, flow_detail=flow_detail, **engine_kwargs
+        )
         try:
-            engine.run()
+            with TaskStateListener(engine, self.iter_tasks()):
+                engine.run()
         except ForceFailException:
             return False
         except Exception as ex:
             logger.error('Exception: {}'.format(ex))
             raise ex
+        finally:
+            # Keep flow detail if interrupted or reverting failed
+            flow_state = engine.storage.get_flow_state()
+            if backend and flow_state in FINISHED_STATES:
+                persistence_api.delete_flow_detail(backend, self.timeline_uuid)
+            if self.journal_dir and flow_state in FINISHED_STATES:
+                self._remove_journals(flow_state)
         result = (
             True
             if (
@@ -103,3 +434,36 @@ class BaseLinearFlow:
                 )
             )
         return result
+
+
+class ResumedFlow(BaseLinearFlow):
+    """Flow restored from a saved flow detail for resuming"""
+
+    supported_modes = ['sync', 'async']
+
+    def __init__(self, irods, sodar_api, flow_detail, revert=False):
+        """
+        :param irods: iRODSSession object
+        :param sodar_api: SODARAPI object
+        :param flow_detail: FlowDetail object
+        :param revert: Revert instead of continuing the flow (boolean)
+        """
+        meta = flow_detail.meta
+        super().__init__(
+            irods=irods,
+            sodar_api=sodar_api,
+            project_uuid=meta['project_uuid'],
+            flow_name=meta['flow_name'],
+            flow_data={},
+            targets=meta['targets'],
+            timeline_uuid=flow_detail.uuid,
+            request_mode=meta['request_mode'],
+        )
+        flow_cls = flows.get_flow(self.flow_name)
+        if flow_cls:
+            self.require_lock = flow_cls.require_lock
+        self.flow_detail = flow_detail
+        self.revert = revert or flow_detail.state in REVERT_STATES
+
+    def build(self, force_fail=False):
+        self.restore(self.flow_detail, revert=self.revert)
@@ -12,9 +12,10 @@ TASKFLOW_LANDING_ZONE_DIR = settings.TASKFLOW_LANDING_ZONE_COLL
 class Flow(BaseLinearFlow):
     """Flow for deleting data objects in iRODS"""
 
+    supported_modes = ['async', 'sync']
+
     def validate(self):
         self.required_fields = ['paths']
-        self.supported_modes = ['async', 'sync']
         return super().validate()
 
     def build(self, force_fail=False):
@@ -23,20 +24,21 @@ class Flow(BaseLinearFlow):
         # iRODS Tasks
         ##############
 
-        for path in self.flow_data['paths']:
-            if self.irods.data_objects.exists(path):
-                self.add_task(
-                    irods_tasks.RemoveDataObjectTask(
-                        name=f'Remove data object ({path})',
-                        irods=self.irods,
-                        inject={'path': path},
+        with self.unordered('Remove data'):
+            for path in self.flow_data['paths']:
+                if self.irods.data_objects.exists(path):
+                    self.add_task(
+                        irods_tasks.RemoveDataObjectTask(
+                            name=f'Remove data object ({path})',
+                            irods=self.irods,
+                            inject={'path': path},
+                        )
                     )
-                )
-            else:
-                self.add_task(
-                    irods_tasks.RemoveCollectionTask(
-                        name=f'Remove collection ({path})',
-                        irods=self.irods,
-                        inject={'path': path},
+                else:
+                    self.add_task(
+                        irods_tasks.RemoveCollectionTask(
+                            name=f'Remove collection ({path})',
+                            irods=self.irods,
+                            inject={'path': path},
+                        )
                     )
-                )
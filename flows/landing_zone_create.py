@@ -15,9 +15,10 @@ PROJECT_ROOT = settings.TASKFLOW_IRODS_PROJECT_ROOT
 class Flow(BaseLinearFlow):
     """Flow for creating a landing zone for an assay and a user in iRODS"""
 
+    supported_modes = ['sync', 'async']
+    require_lock = False  # Project lock not required for this flow
+
     def validate(self):
-        self.require_lock = False  # Project lock not required for this flow
-        self.supported_modes = ['sync', 'async']
         self.required_fields = [
             'zone_title',
             'zone_uuid',
@@ -184,13 +185,16 @@ class Flow(BaseLinearFlow):
                 )
             )
 
-        for d in self.flow_data['colls']:
-            coll_path = zone_path + '/' + d
+        if self.flow_data['colls']:
             self.add_task(
-                irods_tasks.CreateCollectionTask(
-                    name='Create collection {}'.format(coll_path),
+                irods_tasks.CreateCollectionTreeTask(
+                    name='Create collections in landing zone',
                     irods=self.irods,
-                    inject={'path': coll_path},
+                    inject={
+                        'paths': [
+                            zone_path + '/' + d for d in self.flow_data['colls']
+                        ]
+                    },
                 )
             )
 
@@ -11,9 +11,10 @@ PROJECT_ROOT = settings.TASKFLOW_IRODS_PROJECT_ROOT
 class Flow(BaseLinearFlow):
     """Flow for deleting a landing zone from a project and a user in iRODS"""
 
+    supported_modes = ['sync', 'async']
+    require_lock = False  # Project lock not required for this flow
+
     def validate(self):
-        self.require_lock = False  # Project lock not required for this flow
-        self.supported_modes = ['sync', 'async']
         self.required_fields = [
             'zone_title',
             'zone_uuid',
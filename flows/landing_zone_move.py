@@ -4,10 +4,13 @@ from .base_flow import BaseLinearFlow
 from apis.irods_utils import (
     get_sample_path,
     get_landing_zone_path,
-    get_subcoll_obj_paths,
     get_project_group_name,
-    get_subcoll_paths,
+    get_subcoll_data,
+    get_subtree_moves,
+    query_subcoll_paths,
+    split_md5_paths,
 )
+from apis.sodar_api import ProgressReporter
 
 from tasks import sodar_tasks, irods_tasks
 
@@ -22,8 +25,9 @@ class Flow(BaseLinearFlow):
     sample data collection in iRODS.
     """
 
+    supported_modes = ['sync', 'async']
+
     def validate(self):
-        self.supported_modes = ['sync', 'async']
         self.required_fields = [
             'zone_title',
             'zone_uuid',
@@ -36,15 +40,12 @@ class Flow(BaseLinearFlow):
     def build(self, force_fail=False):
         validate_only = self.flow_data.get('validate_only', False)
         # Set zone status in the Django site
-        set_data = {
-            'zone_uuid': self.flow_data['zone_uuid'],
-            'status': 'PREPARING',
-            'status_info': 'Preparing transaction for validation{}'.format(
+        self.sodar_api.set_zone_status(
+            zone_uuid=self.flow_data['zone_uuid'],
+            status='PREPARING',
+            status_info='Preparing transaction for validation{}'.format(
                 ' and moving' if not validate_only else ''
             ),
-        }
-        self.sodar_api.send_request(
-            'landingzones/taskflow/status/set', set_data
         )
 
         ########
@@ -66,29 +67,36 @@ class Flow(BaseLinearFlow):
         admin_name = self.irods.username
 
         # Get landing zone file paths (without .md5 files) from iRODS
-        zone_coll = self.irods.collections.get(zone_path)
-        zone_objects = get_subcoll_obj_paths(zone_coll)
+        self.irods.collections.get(zone_path)  # Ensure zone exists
+        zone_data = get_subcoll_data(self.irods, zone_path)
+        zone_objects = list(zone_data['data_objects'].keys())
 
-        zone_objects_nomd5 = list(
-            set(
-                [
-                    p
-                    for p in zone_objects
-                    if p[p.rfind('.') + 1 :].lower() != 'md5'
-                ]
-            )
-        )
-        zone_objects_md5 = list(
-            set([p for p in zone_objects if p not in zone_objects_nomd5])
-        )
+        zone_objects_nomd5, zone_objects_md5 = split_md5_paths(zone_objects)
         file_count = len(zone_objects_nomd5)
 
         # Get all collections with root path
         zone_all_colls = [zone_path]
-        zone_all_colls += get_subcoll_paths(zone_coll)
+        zone_all_colls += zone_data['colls']
+
+        # Get zone collections which can be moved as a whole as they don't
+        # exist in sample collection, other files are moved one by one
+        move_colls = []
+        move_objects = zone_objects
+        if not validate_only:
+            sample_exist_colls = query_subcoll_paths(self.irods, sample_path)
+            if self.coll_cache.exists(self.irods, sample_path):
+                sample_exist_colls.append(sample_path)
+            move_colls, move_objects = get_subtree_moves(
+                zone_path,
+                sample_path,
+                zone_data['colls'],
+                zone_objects,
+                sample_exist_colls,
+            )
 
-        # Get list of collections containing files (ignore empty colls)
-        zone_object_colls = list(set([p[: p.rfind('/')] for p in zone_objects]))
+        # Get list of collections containing files moved one by one (ignore
+        # empty colls)
+        zone_object_colls = list(set([p[: p.rfind('/')] for p in move_objects]))
 
         # Convert these to collections inside sample collection
         sample_colls = list(
@@ -101,12 +109,42 @@ class Flow(BaseLinearFlow):
             )
         )
 
+        # Set up progress reporting for batch tasks
+        zone_sizes = {
+            k: v['size'] for k, v in zone_data['data_objects'].items()
+        }
+        validate_info = 'Validating {} file{}, write access disabled'.format(
+            file_count, 's' if file_count != 1 else ''
+        )
+        validate_progress = ProgressReporter(
+            sodar_api=self.sodar_api,
+            zone_uuid=self.flow_data['zone_uuid'],
+            status='VALIDATING',
+            status_info=validate_info,
+            total=file_count,
+            sizes=zone_sizes,
+            flow_name=self.flow_name,
+        )
+        move_info = 'Validation OK, moving {} files into {}'.format(
+            file_count, SAMPLE_COLL
+        )
+        move_progress = ProgressReporter(
+            sodar_api=self.sodar_api,
+            zone_uuid=self.flow_data['zone_uuid'],
+            status='MOVING',
+            status_info=move_info,
+            total=len(zone_objects),
+            sizes=zone_sizes,
+            flow_name=self.flow_name,
+        )
+
         # print('sample_path: {}'.format(sample_path))                # DEBUG
         # print('zone_objects: {}'.format(zone_objects))              # DEBUG
         # print('zone_objects_nomd5: {}'.format(zone_objects_nomd5))  # DEBUG
         # print('zone_all_colls: {}'.format(zone_all_colls))          # DEBUG
         # print('zone_object_colls: {}'.format(zone_object_colls))    # DEBUG
         # print('sample_colls: {}'.format(sample_colls))              # DEBUG
+        # print('move_colls: {}'.format(move_colls))                  # DEBUG
 
         ########
         # Tasks
@@ -138,10 +176,7 @@ class Flow(BaseLinearFlow):
                 inject={
                     'zone_uuid': self.flow_data['zone_uuid'],
                     'status': 'VALIDATING',
-                    'status_info': 'Validating {} file{}, '
-                    'write access disabled'.format(
-                        file_count, 's' if file_count != 1 else ''
-                    ),
+                    'status_info': validate_info,
                     'flow_name': self.flow_name,
                 },
             )
@@ -172,6 +207,7 @@ class Flow(BaseLinearFlow):
                     name='Batch validate MD5 checksums of {} data '
                     'objects'.format(file_count),
                     irods=self.irods,
+                    progress=validate_progress,
                     inject={
                         'paths': zone_objects_nomd5,
                         'zone_path': zone_path,
@@ -274,6 +310,7 @@ class Flow(BaseLinearFlow):
                     file_count
                 ),
                 irods=self.irods,
+                progress=validate_progress,
                 inject={'paths': zone_objects_nomd5, 'zone_path': zone_path},
             )
         )
@@ -286,8 +323,7 @@ class Flow(BaseLinearFlow):
                 inject={
                     'zone_uuid': self.flow_data['zone_uuid'],
                     'status': 'MOVING',
-                    'status_info': 'Validation OK, '
-                    'moving {} files into {}'.format(file_count, SAMPLE_COLL),
+                    'status_info': move_info,
                     'flow_name': self.flow_name,
                 },
             )
@@ -307,12 +343,14 @@ class Flow(BaseLinearFlow):
                 name='Move {} files and set project group '
                 'read access'.format(len(zone_objects)),
                 irods=self.irods,
+                progress=move_progress,
                 inject={
                     'src_root': zone_path,
                     'dest_root': sample_path,
                     'src_paths': zone_objects,
                     'access_name': 'read',
                     'user_name': project_group,
+                    'src_colls': move_colls,
                 },
             )
         )
@@ -130,32 +130,34 @@ class Flow(BaseLinearFlow):
         )
 
         # Add inherited owners
-        for username in set(
-            [r['username'] for r in self.flow_data.get('roles_add', [])]
-        ):
-            self.add_task(
-                irods_tasks.CreateUserTask(
-                    name='Create user "{}" in irods'.format(username),
-                    irods=self.irods,
-                    inject={'user_name': username, 'user_type': 'rodsuser'},
+        with self.unordered('Create inherited owner users'):
+            for username in set(
+                [r['username'] for r in self.flow_data.get('roles_add', [])]
+            ):
+                self.add_task(
+                    irods_tasks.CreateUserTask(
+                        name='Create user "{}" in irods'.format(username),
+                        irods=self.irods,
+                        inject={'user_name': username, 'user_type': 'rodsuser'},
+                    )
                 )
-            )
 
-        for role_add in self.flow_data.get('roles_add', []):
-            project_group = get_project_group_name(role_add['project_uuid'])
-
-            self.add_task(
-                irods_tasks.AddUserToGroupTask(
-                    name='Add user "{}" to project user group "{}"'.format(
-                        role_add['username'], project_group
-                    ),
-                    irods=self.irods,
-                    inject={
-                        'group_name': project_group,
-                        'user_name': role_add['username'],
-                    },
+        with self.unordered('Add inherited owners to groups'):
+            for role_add in self.flow_data.get('roles_add', []):
+                project_group = get_project_group_name(role_add['project_uuid'])
+
+                self.add_task(
+                    irods_tasks.AddUserToGroupTask(
+                        name='Add user "{}" to project user group "{}"'.format(
+                            role_add['username'], project_group
+                        ),
+                        irods=self.irods,
+                        inject={
+                            'group_name': project_group,
+                            'user_name': role_add['username'],
+                        },
+                    )
                 )
-            )
 
         ##############
         # SODAR Tasks
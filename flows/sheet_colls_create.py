@@ -62,13 +62,17 @@ class Flow(BaseLinearFlow):
             )
         )
 
-        for c in self.flow_data['colls']:
-            coll_path = sample_path + '/' + c
+        if self.flow_data['colls']:
             self.add_task(
-                irods_tasks.CreateCollectionTask(
-                    name='Create collection {}'.format(coll_path),
+                irods_tasks.CreateCollectionTreeTask(
+                    name='Create collections in sample sheet collection',
                     irods=self.irods,
-                    inject={'path': coll_path},
+                    inject={
+                        'paths': [
+                            sample_path + '/' + c
+                            for c in self.flow_data['colls']
+                        ]
+                    },
                 )
             )
 
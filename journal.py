@@ -0,0 +1,121 @@
+"""Finish or revert batch tasks from their on-disk journals"""
+
+import argparse
+import importlib
+import sys
+
+from apis import irods_utils, lock_api
+from apis.revert_journal import list_journals, read_journal
+from sodar_taskflow import app
+
+
+def print_journals():
+    """Print journals in the journal directory"""
+    for path in list_journals():
+        journal = read_journal(path)
+        header = journal['header'] or {}
+        print(
+            '{}\t{}\t{}\t{}\t{}'.format(
+                path,
+                header.get('flow_name'),
+                header.get('name'),
+                journal['status'] or 'incomplete',
+                len(journal['records']),
+            )
+        )
+
+
+def get_task(path, irods):
+    """
+    Recreate task from the header of a journal.
+
+    :param path: Path to journal file (string)
+    :param irods: iRODSSession object
+    :return: Task object and execute() arguments (dict), or (None, None)
+    """
+    header = read_journal(path)['header']
+    if not header:
+        return None, None
+    module_name, cls_name = header['cls'].rsplit('.', 1)
+    cls = getattr(importlib.import_module(module_name), cls_name)
+    task = cls(
+        name=header['name'],
+        irods=irods,
+        sodar_api=None,
+        project_uuid=header.get('project_uuid'),
+    )
+    task.journal_path = path
+    return task, header['args']
+
+
+def replay_journal(path, revert=False, test_mode=False):
+    """
+    Finish or revert a batch task from its journal while holding the project
+    lock.
+
+    :param path: Path to journal file (string)
+    :param revert: Revert the task instead of finishing it (boolean)
+    :param test_mode: Use TEST iRODS server (boolean)
+    :return: True if the task was finished or reverted
+    """
+    try:
+        header = read_journal(path)['header']
+    except OSError as ex:
+        app.logger.error('Error reading journal: {}'.format(ex))
+        return False
+    if not header:
+        app.logger.error('No journal header found in "{}"'.format(path))
+        return False
+    lock = None
+    if header.get('project_uuid'):
+        try:
+            lock = lock_api.get_coordinator().get_lock(header['project_uuid'])
+            lock_api.acquire(lock, flow_name=header.get('flow_name'))
+        except Exception as ex:
+            app.logger.error('Error acquiring project lock: {}'.format(ex))
+            return False
+    irods = None
+    try:
+        irods = irods_utils.session_pool.get(test_mode=test_mode)
+        task, args = get_task(path, irods)
+        if revert:
+            if not task.revert_journal():
+                app.logger.info('Nothing to revert in "{}"'.format(path))
+                return True
+            app.logger.info('Reverted "{}"'.format(task.name))
+        else:
+            task.execute(**args)
+            app.logger.info('Finished "{}"'.format(task.name))
+    except Exception as ex:
+        app.logger.error('Error replaying "{}": {}'.format(path, ex))
+        return False
+    finally:
+        irods_utils.session_pool.release(irods)
+        if lock:
+            try:
+                lock_api.release(lock, flow_name=header.get('flow_name'))
+            except Exception as ex:
+                app.logger.error('Error releasing project lock: {}'.format(ex))
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', nargs='?', help='Path to journal file')
+    parser.add_argument(
+        '--revert',
+        action='store_true',
+        help='Revert the task instead of finishing it',
+    )
+    parser.add_argument(
+        '--test-mode', action='store_true', help='Use TEST iRODS server'
+    )
+    args = parser.parse_args()
+    if not args.path:
+        print_journals()
+        return 0
+    return 0 if replay_journal(args.path, args.revert, args.test_mode) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
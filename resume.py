@@ -0,0 +1,83 @@
+"""Resume flows interrupted by a crash or restart"""
+
+import argparse
+import sys
+
+from apis import persistence_api, sodar_api
+from flows.base_flow import ResumedFlow
+from sodar_taskflow import app, run_flow
+
+
+def list_flows(backend):
+    """Print saved flows"""
+    for flow_detail in persistence_api.get_flow_details(backend):
+        print(
+            '{}\t{}\t{}\t{}'.format(
+                flow_detail.uuid,
+                flow_detail.meta.get('flow_name'),
+                flow_detail.meta.get('project_uuid'),
+                flow_detail.state,
+            )
+        )
+
+
+def resume_flow(backend, timeline_uuid, revert=False, test_mode=False):
+    """
+    Continue or revert an interrupted flow from its last completed task.
+
+    :param backend: Taskflow persistence backend
+    :param timeline_uuid: Timeline event UUID of the flow (string)
+    :param revert: Revert instead of continuing the flow (boolean)
+    :param test_mode: Use TEST iRODS server (boolean)
+    :return: True if the flow was resumed
+    """
+    flow_detail = persistence_api.get_flow_detail(backend, timeline_uuid)
+    if not flow_detail:
+        app.logger.error('Flow "{}" not found'.format(timeline_uuid))
+        return False
+    sodar_tf = sodar_api.SODARAPI(flow_detail.meta['sodar_url'])
+    flow = ResumedFlow(
+        irods=None, sodar_api=sodar_tf, flow_detail=flow_detail, revert=revert
+    )
+    run_flow(
+        flow,
+        flow.project_uuid,
+        timeline_uuid,
+        sodar_tf,
+        False,
+        flow.request_mode == 'async',
+        test_mode,
+    )
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'timeline_uuid', nargs='?', help='Timeline event UUID of flow'
+    )
+    parser.add_argument(
+        '--revert',
+        action='store_true',
+        help='Revert the flow instead of continuing it',
+    )
+    parser.add_argument(
+        '--test-mode', action='store_true', help='Use TEST iRODS server'
+    )
+    args = parser.parse_args()
+    backend = persistence_api.get_backend()
+    if not backend:
+        app.logger.error('Persistence not enabled (TASKFLOW_PERSISTENCE_URL)')
+        return 1
+    if not args.timeline_uuid:
+        list_flows(backend)
+        return 0
+    return (
+        0
+        if resume_flow(backend, args.timeline_uuid, args.revert, args.test_mode)
+        else 1
+    )
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Runner process for async flows queued by sodar_taskflow"""
+
+from concurrent.futures.process import BrokenProcessPool
+import os
+import signal
+import socket
+import time
+import uuid
+
+from apis.job_queue import job_queue
+from apis.worker_pool import FlowWorkerPool
+from sodar_taskflow import PRELOAD_MODULES, app, run_async_flow
+
+
+class Runner:
+    """
+    Consume jobs from the job queue and run them in a worker pool. Jobs are
+    acknowledged once complete, so jobs of a crashed runner are picked up by
+    another runner after its heartbeat expires.
+    """
+
+    def __init__(self, queue=job_queue, pool=None):
+        """
+        :param queue: JobQueue object
+        :param pool: FlowWorkerPool object (optional)
+        """
+        self.queue = queue
+        self.pool = pool or FlowWorkerPool(
+            preload=['sodar_taskflow'] + PRELOAD_MODULES
+        )
+        self.runner_id = '{}_{}_{}'.format(
+            socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8]
+        )
+        self.stopped = False
+        self._recover_time = 0
+
+    def _done(self, job, ex):
+        if isinstance(ex, BrokenProcessPool):  # Worker crashed, run again
+            self.queue.retry(self.runner_id, job)
+        else:
+            self.queue.ack(self.runner_id, job)
+
+    def run_once(self, timeout=1):
+        """
+        Send heartbeat with pool statistics, recover jobs of dead runners and
+        start the next job if a worker is free.
+
+        :param timeout: Seconds to wait for a job (int)
+        :return: True if a job was started
+        """
+        self.queue.heartbeat(self.runner_id, self.pool.get_stats())
+        now = time.monotonic()
+        if now - self._recover_time > self.queue.heartbeat_ttl / 2:
+            self.queue.recover()
+            self._recover_time = now
+        if not self.pool.has_capacity():
+            time.sleep(0.1)
+            return False
+        job = self.queue.pop(self.runner_id, timeout=timeout)
+        if not job:
+            return False
+        data = job['data']
+        app.logger.info(
+            'Starting job "{}" ({}, attempt {})'.format(
+                job['job_id'], data['form_data']['flow_name'], job['attempts']
+            )
+        )
+        self.pool.submit(
+            data['form_data']['flow_name'],
+            run_async_flow,
+            data['form_data'],
+            data['sodar_url'],
+            data['force_fail'],
+            data['test_mode'],
+            callback=lambda ex: self._done(job, ex),
+            submit_time=job['submit_time'],
+        )
+        return True
+
+    def stop(self, *args):
+        self.stopped = True
+
+    def drain(self, interval=1):
+        """
+        Wait for running jobs to complete, sending heartbeats meanwhile so the
+        jobs are not recovered by other runners.
+
+        :param interval: Seconds between heartbeats (int or float)
+        """
+        while self.pool.pending > 0:
+            self.queue.heartbeat(self.runner_id, self.pool.get_stats())
+            time.sleep(interval)
+
+    def run(self):
+        """Run until stopped, then wait for running jobs to complete"""
+        app.logger.info('Runner "{}" started'.format(self.runner_id))
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.stopped:
+            self.run_once()
+        app.logger.info('Runner "{}" stopping'.format(self.runner_id))
+        self.drain()
+        self.pool.shutdown(wait=True)
+        self.queue.stop(self.runner_id)
+
+
+if __name__ == '__main__':
+    Runner().run()
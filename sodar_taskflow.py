@@ -1,15 +1,28 @@
-from flask import Flask, request, Response
+from flask import Flask, jsonify, request, Response
+import importlib
 import logging
 from logging.handlers import RotatingFileHandler
-from multiprocessing import Process
 import os
 import sys
 
 from apis import irods_utils, lock_api, sodar_api
+from apis.job_queue import job_queue
 from config import settings
 import flows
 
 
+# Heavy modules imported on first use, or by preload() before forking workers
+PRELOAD_MODULES = [
+    'irods.session',
+    'irods.models',
+    'redis',
+    'requests',
+    'tooz.coordination',
+    'taskflow.engines',
+    'apis.persistence_api',
+] + ['flows.' + name for name in flows.FLOW_NAMES]
+
+
 app = Flask('sodar_taskflow')
 app.config.from_envvar('SODAR_TASKFLOW_SETTINGS')
 # NOTE: FLASK_ENV from settings does not work automatically?
@@ -35,30 +48,114 @@ if settings.TASKFLOW_LOG_TO_FILE:
 app.logger.setLevel(logging.getLevelName(settings.TASKFLOW_LOG_LEVEL))
 
 
+def preload():
+    """
+    Import modules needed for running flows. Called at startup if
+    TASKFLOW_PRELOAD is set, e.g. in a gunicorn master process with --preload,
+    so forked workers do not import them on their first request.
+    """
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+
+
+def flush_status(sodar_api, async_mode=True):
+    """
+    Send queued status updates to SODAR and log errors.
+
+    :param sodar_api: SODARAPI object
+    :param async_mode: Submit in async mode (boolean)
+    :return: Error response if sending failed in sync mode, else None
+    """
+    try:
+        sodar_api.flush_status()
+    except Exception as ex:
+        app.logger.error(str(ex))
+        if not async_mode:
+            return Response(str(ex), status=500)
+
+
+def handle_irods_error(ex, timeline_uuid, sodar_api, async_mode):
+    """
+    Log iRODS initialization error and set timeline status if in async mode.
+
+    :param ex: Exception
+    :param timeline_uuid: Timeline event UUID as string
+    :param sodar_api: SODARAPI object
+    :param async_mode: Submit in async mode (boolean)
+    :return: Response object
+    """
+    msg = 'Error initializing iRODS: {} ({})'.format(ex.__class__.__name__, ex)
+    app.logger.error(msg)
+    if async_mode:
+        sodar_api.set_timeline_status(
+            event_uuid=timeline_uuid, status_type='FAILED', status_desc=msg
+        )
+        flush_status(sodar_api)
+    return Response(msg, status=500)
+
+
+def handle_lock_error(ex, timeline_uuid, sodar_api, async_mode):
+    """
+    Log project lock acquiring error and set timeline status if in async mode.
+
+    :param ex: Exception
+    :param timeline_uuid: Timeline event UUID as string
+    :param sodar_api: SODARAPI object
+    :param async_mode: Submit in async mode (boolean)
+    :return: Response object
+    """
+    msg = 'Unable to acquire project lock'
+    app.logger.info(msg + ': ' + str(ex))
+    if async_mode:
+        sodar_api.set_timeline_status(
+            event_uuid=timeline_uuid,
+            status_type='FAILED',
+            status_desc='{}: {}'.format(msg, ex),
+        )
+        flush_status(sodar_api)
+    position = getattr(ex, 'position', None)
+    if position is not None:
+        msg += ' (queue position: {})'.format(position)
+    return Response(
+        msg,
+        status=503,
+        headers={'Retry-After': str(lock_api.LOCK_RETRY_INTERVAL)},
+    )
+
+
 def run_flow(
     flow,
     project_uuid,
     timeline_uuid,
     sodar_api,
-    irods,
     force_fail,
     async_mode=True,
+    test_mode=False,
 ):
     """
-    Run a task flow, either synchronously or asynchronously.
+    Run a task flow, either synchronously or asynchronously. If flow.irods is
+    not set, an iRODS session is borrowed from the session pool. The session is
+    returned to the pool after running.
 
     :param flow: Flow object
     :param project_uuid: Project UUID as string
     :param timeline_uuid: Timeline event UUID as string
     :param sodar_api: SODARAPI object
-    :param irods: iRODS session object
     :param force_fail: Force failure (boolean, for testing)
     :param async_mode: Submit in async mode (boolean, default=True)
+    :param test_mode: Use TEST iRODS server (boolean, default=False)
     :return: Response object
     """
     coordinator = None
     lock = None
 
+    # Borrow iRODS session, needed for async flows run in a separate process
+    if not flow.irods:
+        try:
+            flow.irods = irods_utils.session_pool.get(test_mode=test_mode)
+        except Exception as ex:
+            return handle_irods_error(ex, timeline_uuid, sodar_api, async_mode)
+
     # Acquire lock if needed
     if flow.require_lock:
         # Acquire lock
@@ -69,12 +166,14 @@ def run_flow(
             lock_id = project_uuid
             lock = coordinator.get_lock(lock_id)
             try:
-                lock_api.acquire(lock)
+                lock_api.acquire_project(
+                    lock, lock_id, async_mode, flow_name=flow.flow_name
+                )
             except Exception as ex:
-                msg = 'Unable to acquire project lock'
-                app.logger.info(msg + ': ' + str(ex))
-                irods_utils.close_irods(irods)
-                return Response(msg, status=503)
+                irods_utils.session_pool.release(flow.irods)
+                return handle_lock_error(
+                    ex, timeline_uuid, sodar_api, async_mode
+                )
     else:
         app.logger.info('Lock not required (flow.require_lock=False)')
 
@@ -92,14 +191,13 @@ def run_flow(
         # TODO: HACK! generalize to report building problems in ODM!
         if async_mode and 'zone_uuid' in flow.flow_data:
             # Set zone status in the Django site
-            set_data = {
-                'zone_uuid': flow.flow_data['zone_uuid'],
-                'status': 'NOT CREATED'
+            sodar_api.set_zone_status(
+                zone_uuid=flow.flow_data['zone_uuid'],
+                status='NOT CREATED'
                 if flow.flow_name == 'landing_zone_create'
                 else 'FAILED',
-                'status_info': '{}: {}'.format(msg, ex),
-            }
-            sodar_api.send_request('landingzones/taskflow/status/set', set_data)
+                status_info='{}: {}'.format(msg, ex),
+            )
             # Set timeline status
             sodar_api.set_timeline_status(
                 event_uuid=timeline_uuid, status_type='FAILED', status_desc=msg
@@ -144,15 +242,64 @@ def run_flow(
             app.logger.error(msg)
             response = Response(msg, status=500)
 
+    # Send queued status updates before releasing the lock
+    response = flush_status(sodar_api, async_mode) or response
+
     # Release lock if acquired
     if flow.require_lock and lock:
-        lock_api.release(lock)
-        coordinator.stop()
+        lock_api.release(lock, flow_name=flow.flow_name)
 
-    irods_utils.close_irods(irods)
+    irods_utils.session_pool.release(flow.irods)
     return response
 
 
+def create_flow(flow_cls, form_data, sodar_tf):
+    """
+    Create flow object from submit request data.
+
+    :param flow_cls: Flow class
+    :param form_data: Request data (dict)
+    :param sodar_tf: SODARAPI object
+    :return: Flow object
+    """
+    return flow_cls(
+        irods=None,  # Set when running
+        sodar_api=sodar_tf,
+        project_uuid=form_data['project_uuid'],
+        flow_name=form_data['flow_name'],
+        flow_data=form_data['flow_data'],
+        targets=form_data['targets'],
+        request_mode=form_data['request_mode'],
+        timeline_uuid=form_data['timeline_uuid'],
+    )
+
+
+def run_async_flow(form_data, sodar_url, force_fail, test_mode):
+    """
+    Create and run an async flow in a runner worker process. The flow is
+    recreated from request data, as flow objects can not be queued.
+
+    :param form_data: Request data (dict)
+    :param sodar_url: SODAR server URL (string)
+    :param force_fail: Force failure (boolean, for testing)
+    :param test_mode: Use TEST iRODS server (boolean)
+    """
+    sodar_tf = sodar_api.SODARAPI(sodar_url)
+    flow = create_flow(
+        flows.get_flow(form_data['flow_name']), form_data, sodar_tf
+    )
+    flow.validate()
+    run_flow(
+        flow,
+        form_data['project_uuid'],
+        form_data['timeline_uuid'],
+        sodar_tf,
+        force_fail,
+        True,
+        test_mode,
+    )
+
+
 @app.route('/submit', methods=['POST'])
 def submit():
     """
@@ -195,19 +342,6 @@ def submit():
         app.logger.error(msg)
         return Response(msg, status=501)  # Not implemented
 
-    #############
-    # Init iRODS
-    #############
-
-    try:
-        irods = irods_utils.init_irods(test_mode=test_mode)
-    except Exception as ex:
-        msg = 'Error initializing iRODS: {} ({})'.format(
-            ex.__class__.__name__, ex
-        )
-        app.logger.error(msg)
-        return Response(msg, status=500)
-
     ################
     # Init SODAR API
     ################
@@ -223,57 +357,71 @@ def submit():
     # Create flow
     ##############
 
-    flow = flow_cls(
-        irods=irods,
-        sodar_api=sodar_tf,
-        project_uuid=form_data['project_uuid'],
-        flow_name=form_data['flow_name'],
-        flow_data=form_data['flow_data'],
-        targets=form_data['targets'],
-        request_mode=form_data['request_mode'],
-        timeline_uuid=form_data['timeline_uuid'],
-    )
+    flow = create_flow(flow_cls, form_data, sodar_tf)
     try:
         flow.validate()
     except TypeError as ex:
         msg = 'Error validating flow: {}'.format(ex)
         app.logger.error(msg)
-        irods_utils.close_irods(irods)
         return Response(msg, status=400)
 
     project_uuid = form_data['project_uuid']
 
+    #############
+    # Init iRODS
+    #############
+
+    try:
+        irods = irods_utils.session_pool.get(test_mode=test_mode)
+    except Exception as ex:
+        return handle_irods_error(ex, form_data['timeline_uuid'], None, False)
+
     #####################
     # Build and run flow
     #####################
 
     # Run asynchronously
     if form_data['request_mode'] == 'async':
-        p = Process(
-            target=run_flow,
-            args=(
-                flow,
-                project_uuid,
-                form_data['timeline_uuid'],
-                sodar_tf,
-                irods,
-                force_fail,
-                True,
-            ),
-        )
-        p.start()
+        # NOTE: The flow is run by a runner process which borrows its own
+        #       iRODS session
+        irods_utils.session_pool.release(irods)
+        try:
+            depth = job_queue.get_depth()
+            if depth >= settings.TASKFLOW_ASYNC_QUEUE_SIZE:
+                msg = 'Async job queue full (depth: {})'.format(depth)
+                app.logger.warning(msg)
+                return Response(msg, status=429)  # Too many requests
+            # NOTE: The secret is not needed for running and is not stored
+            job_id = job_queue.enqueue(
+                {
+                    'form_data': {
+                        k: v
+                        for k, v in form_data.items()
+                        if k != 'sodar_secret'
+                    },
+                    'sodar_url': sodar_url,
+                    'force_fail': force_fail,
+                    'test_mode': test_mode,
+                }
+            )
+        except Exception as ex:
+            msg = 'Error queuing async flow: {}'.format(ex)
+            app.logger.error(msg)
+            return Response(msg, status=500)
+        app.logger.info('Queued job "{}"'.format(job_id))
         return Response(str(True), status=200)
 
     # Run synchronously
     else:
+        flow.irods = irods
         return run_flow(
             flow,
             project_uuid,
             form_data['timeline_uuid'],
             sodar_tf,
-            irods,
             force_fail,
             False,
+            test_mode,
         )
 
 
@@ -285,10 +433,10 @@ def cleanup():
     if test_mode or settings.TASKFLOW_ALLOW_IRODS_CLEANUP:
         try:
             app.logger.info('--- Cleanup started ---')
-            irods = irods_utils.init_irods(test_mode=test_mode)
+            irods = irods_utils.session_pool.get(test_mode=test_mode)
             irods_utils.cleanup_irods_data(irods)
             app.logger.info('--- Cleanup done ---')
-            irods_utils.close_irods(irods)
+            irods_utils.session_pool.release(irods)
         except Exception as ex:
             return Response(
                 'Error during cleanup: {} ({})'.format(
@@ -301,6 +449,30 @@ def cleanup():
     return Response('iRODS cleanup not allowed', status=403)
 
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Return service statistics as JSON"""
+    return jsonify(
+        {
+            'irods_pool': irods_utils.session_pool.get_stats(),
+            'job_queue': job_queue.get_stats(),
+            'locks': lock_api.lock_metrics.get_stats(),
+        }
+    )
+
+
+@app.route('/lock/<project_uuid>', methods=['GET'])
+def lock_status(project_uuid):
+    """Return number of callers waiting for a project lock as JSON"""
+    try:
+        waiters = lock_api.lock_queue.get_length(project_uuid)
+    except Exception as ex:
+        msg = 'Error retrieving lock queue: {}'.format(ex)
+        app.logger.error(msg)
+        return Response(msg, status=500)
+    return jsonify({'project_uuid': project_uuid, 'waiters': waiters})
+
+
 # DEBUG
 @app.route('/hello', methods=['GET'])
 def hello():
@@ -308,10 +480,13 @@ def hello():
     return Response('Hello world from sodar_taskflow!', status=200)
 
 
+if settings.TASKFLOW_PRELOAD:
+    preload()
+
+
 if __name__ == '__main__':
     app.logger.info('settings={}'.format(os.getenv('SODAR_TASKFLOW_SETTINGS')))
-    app_kwargs = {'processes': 4} if settings.DEBUG else {}
-    app.run('0.0.0.0', 5005, threaded=False, **app_kwargs)
+    app.run('0.0.0.0', 5005, threaded=settings.DEBUG)
 
 
 def validate_kwargs(kwargs_dict, required_keys):
@@ -1,6 +1,8 @@
 import logging
 from taskflow import task
 
+from apis.revert_log import RevertLog, STATE_KEY
+
 
 logger = logging.getLogger('sodar_taskflow')
 
@@ -22,6 +24,38 @@ class BaseTask(task.Task):
         self.verbose = verbose
         self.data_modified = False
         self.execute_data = {}
+        self.parallel = False  # Set True if run in parallel with other tasks
+        # Arguments for recreating the task when resuming a flow
+        self.init_kwargs = {
+            'name': name,
+            'force_fail': force_fail,
+            'verbose': verbose,
+            'inject': inject,
+        }
+
+    def get_state(self):
+        """Return undo state of the task for persisting (dict)"""
+        return {
+            'data_modified': self.data_modified,
+            'execute_data': {
+                k: v.to_dict() if isinstance(v, RevertLog) else v
+                for k, v in self.execute_data.items()
+            },
+        }
+
+    def set_state(self, state):
+        """
+        Restore undo state of the task.
+
+        :param state: Dict returned by get_state()
+        """
+        self.data_modified = state['data_modified']
+        self.execute_data = {
+            k: RevertLog.from_dict(v)
+            if isinstance(v, dict) and STATE_KEY in v
+            else v
+            for k, v in state['execute_data'].items()
+        }
 
     def execute(self, *args, **kwargs):
         # Raise Exception for testing revert()
@@ -3,14 +3,34 @@
 import logging
 import os
 import random
-import re
 import string
+import threading
 
 from irods.access import iRODSAccess
 from irods.exception import UserDoesNotExist, UserGroupDoesNotExist
 from irods.models import Collection
 
 from .base_task import BaseTask
+from apis.irods_utils import (
+    ChecksumFileReadException,
+    get_existing_coll_paths,
+    get_subcoll_coll_access,
+    get_subcoll_obj_access,
+    get_subcoll_obj_data,
+    get_unpaired_md5_paths,
+    query_subcoll_paths,
+    read_checksum_files,
+    run_parallel,
+    session_pool,
+)
+from apis.revert_journal import (
+    RevertJournal,
+    STATUS_DONE,
+    STATUS_REVERTED,
+    read_journal,
+)
+from apis.revert_log import RevertLog
+from config import settings
 
 
 # NOTE: Yes, we really need this for the python irods client
@@ -25,8 +45,8 @@ ACCESS_CONVERSION = {
 }
 INHERIT_STRINGS = {True: 'inherit', False: 'noinherit'}
 META_EMPTY_VALUE = 'N/A'
+BATCH_CONCURRENCY = settings.TASKFLOW_BATCH_CONCURRENCY
 
-md5_re = re.compile(r'([^\w.])')
 logger = logging.getLogger('sodar_taskflow')
 
 
@@ -40,6 +60,123 @@ class IrodsBaseTask(BaseTask):
         self.target = 'irods'
         self.name = '<iRODS> {} ({})'.format(name, self.__class__.__name__)
         self.irods = kwargs['irods']
+        self.progress = kwargs.get('progress')  # Optional ProgressReporter
+        self.coll_cache = None  # Optional CollectionCache, set by the flow
+        # Optional journal file and flow information, set by the flow
+        self.journal_path = None
+        self.journal_info = {}
+        self._journal = None
+        self._shared_irods = None
+
+    def _borrow_session(self):
+        """Use a separate iRODS session when run in parallel"""
+        if self.parallel and self.irods:
+            self._shared_irods = self.irods
+            self.irods = session_pool.get_clone(self._shared_irods)
+
+    def _release_session(self):
+        if self._shared_irods:
+            session_pool.release(self.irods)
+            self.irods = self._shared_irods
+            self._shared_irods = None
+
+    def pre_execute(self):
+        self._borrow_session()
+
+    def post_execute(self, *args, **kwargs):
+        self._release_session()
+        super().post_execute(*args, **kwargs)
+
+    def pre_revert(self):
+        self._borrow_session()
+
+    def post_revert(self, *args, **kwargs):
+        self._release_session()
+        super().post_revert(*args, **kwargs)
+
+    def _coll_exists(self, path):
+        """Check if collection exists, using the flow collection cache if set"""
+        if self.coll_cache:
+            return self.coll_cache.exists(self.irods, path)
+        return self.irods.collections.exists(path)
+
+    def _create_coll(self, path):
+        self.irods.collections.create(path)
+        if self.coll_cache:
+            self.coll_cache.add(path)
+
+    def _invalidate_coll(self, path):
+        """Remove collection from the flow collection cache after removal"""
+        if self.coll_cache:
+            self.coll_cache.remove(path)
+
+    def _open_journal(self, args=None, plan=None):
+        """
+        Open journal of changes if enabled. If args are given, a new journal
+        is started, otherwise an existing journal is continued.
+
+        :param args: Arguments of execute() (dict, optional)
+        :param plan: Information needed for restoring the task (dict)
+        """
+        if not self.journal_path:
+            return
+        header = None
+        if args is not None:
+            header = dict(
+                self.journal_info,
+                cls='{}.{}'.format(
+                    self.__class__.__module__, self.__class__.__name__
+                ),
+                name=self.init_kwargs['name'],
+                args=args,
+                plan=plan or {},
+            )
+        self._journal = RevertJournal(self.journal_path)
+        self._journal.open(header)
+
+    def _journal_append(self, op, path, access=None):
+        if self._journal:
+            self._journal.append(op, path, access)
+
+    def _close_journal(self, status=None):
+        """Write remaining records and status to journal if enabled"""
+        if self._journal:
+            self._journal.close(status)
+            self._journal = None
+        elif status and self.journal_path and os.path.exists(self.journal_path):
+            journal = RevertJournal(self.journal_path)
+            journal.open()
+            journal.close(status)
+
+    def _read_journal(self):
+        """Return journal of an earlier run which was not reverted or None"""
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return None
+        journal = read_journal(self.journal_path)
+        if not journal['header'] or journal['status'] == STATUS_REVERTED:
+            return None
+        return journal
+
+    def restore_journal(self):
+        """
+        Restore undo state from the journal of an earlier run. Implement in
+        tasks writing a journal.
+
+        :return: True if state was restored
+        """
+        return False
+
+    def revert_journal(self):
+        """
+        Revert changes of an earlier run recorded in the journal, using the
+        execute() arguments saved in the journal header.
+
+        :return: True if reverted, False if there was nothing to revert
+        """
+        if not self.restore_journal():
+            return False
+        self.revert(**self._read_journal()['header']['args'])
+        return True
 
     # For when taskflow won't catch a proper exception from the client
     def _raise_irods_exception(self, ex, info=None):
@@ -62,8 +199,8 @@ class CreateCollectionTask(IrodsBaseTask):
         self.execute_data['created_colls'] = []
         for i in range(2, len(path.split('/')) + 1):
             sub_path = '/'.join(path.split('/')[:i])
-            if not self.irods.collections.exists(sub_path):
-                self.irods.collections.create(sub_path)
+            if not self._coll_exists(sub_path):
+                self._create_coll(sub_path)
                 self.execute_data['created_colls'].append(sub_path)
                 self.data_modified = True
         super().execute(*args, **kwargs)
@@ -71,6 +208,7 @@ class CreateCollectionTask(IrodsBaseTask):
     def revert(self, path, *args, **kwargs):
         if self.data_modified:
             for coll_path in reversed(self.execute_data['created_colls']):
+                self._invalidate_coll(coll_path)
                 if self.irods.collections.exists(coll_path):
                     self.irods.collections.remove(coll_path, recurse=True)
 
@@ -100,6 +238,7 @@ class RemoveCollectionTask(IrodsBaseTask):
 
         if self.irods.collections.exists(path):
             self.irods.collections.create(trash_path)  # Must create this 1st
+            self._invalidate_coll(path)
 
             try:
                 self.irods.collections.move(src_path=path, dest_path=trash_path)
@@ -452,13 +591,7 @@ class BatchCheckFilesTask(IrodsBaseTask):
     """
 
     def execute(self, file_paths, md5_paths, zone_path, *args, **kwargs):
-        err_paths = []
-        for p in file_paths:
-            if p + '.md5' not in md5_paths:
-                err_paths.append(p + '.md5')
-        for p in md5_paths:
-            if p[:-4] not in file_paths:
-                err_paths.append(p[:-4])
+        err_paths = get_unpaired_md5_paths(file_paths, md5_paths)
         err_len = len(err_paths)
         if err_len > 0:
             msg = '{} expected file{} missing: {}'.format(
@@ -477,54 +610,65 @@ class BatchValidateChecksumsTask(IrodsBaseTask):
     """Batch validate checksums of a given list of data object paths"""
 
     @classmethod
-    def _compare_checksums(cls, data_obj, checksum):
+    def _compare_checksums(cls, path, replicas, checksum):
         """
         Compares object replicate checksums to expected sum. Raises exception if
         checksums do not match.
 
-        :param data_obj: Data object
+        :param path: Data object path (string)
+        :param replicas: List of dicts with "resource_name" and "checksum"
         :param checksum: Expected checksum (string)
         :raises: Exception if checksums do not match
         """
-        for replica in data_obj.replicas:
-            if checksum != replica.checksum:
+        for replica in replicas:
+            if checksum != replica['checksum']:
                 msg = (
                     'Checksums do not match for "{}" in resource "{}" '
                     '(File: {}; iRODS: {})'.format(
-                        os.path.basename(data_obj.path),
-                        replica.resource_name,
+                        os.path.basename(path),
+                        replica['resource_name'],
                         checksum,
-                        replica.checksum,
+                        replica['checksum'],
                     )
                 )
                 logger.error(msg)
                 raise Exception(msg)
 
-    def execute(self, paths, zone_path, *args, **kwargs):
-        zone_path_len = len(zone_path.split('/'))
-
-        for path in paths:
+    def execute(self, paths, zone_path, concurrency=None, *args, **kwargs):
+        if concurrency is None:
+            concurrency = BATCH_CONCURRENCY
+        try:
+            obj_data = get_subcoll_obj_data(self.irods, zone_path)
+            if self.progress:
+                self.progress.start()
             try:
-                md5_path = path + '.md5'
-                try:
-                    md5_file = self.irods.data_objects.open(md5_path, mode='r')
-                    file_sum = re.split(
-                        md5_re, md5_file.read().decode('utf-8')
-                    )[0]
-                except Exception as ex:
-                    msg = 'Unable to read checksum file "{}"'.format(
-                        '/'.join(md5_path.split('/')[zone_path_len:])
-                    )
-                    self._raise_irods_exception(ex, msg)
-                self._compare_checksums(
-                    self.irods.data_objects.get(path), file_sum
+                for path, file_sum in read_checksum_files(
+                    self.irods, paths, concurrency
+                ):
+                    if path in obj_data:
+                        replicas = obj_data[path]['replicas']
+                    else:  # Not found in bulk query results, look up directly
+                        replicas = [
+                            {
+                                'resource_name': r.resource_name,
+                                'checksum': r.checksum,
+                            }
+                            for r in self.irods.data_objects.get(path).replicas
+                        ]
+                    self._compare_checksums(path, replicas, file_sum)
+                    if self.progress:
+                        self.progress.update(path)
+            except ChecksumFileReadException as ex:
+                msg = 'Unable to read checksum file "{}"'.format(
+                    '/'.join(ex.path.split('/')[len(zone_path.split('/')) :])
                 )
-            except Exception as ex:
-                self._raise_irods_exception(ex)
+                self._raise_irods_exception(ex.__cause__, msg)
+        except Exception as ex:
+            self._raise_irods_exception(ex)
 
         super().execute(*args, **kwargs)
 
-    def revert(self, paths, zone_path, *args, **kwargs):
+    def revert(self, paths, zone_path, concurrency=None, *args, **kwargs):
         pass  # Nothing is modified so no need for revert
 
 
@@ -532,26 +676,131 @@ class BatchCreateCollectionsTask(IrodsBaseTask):
     """Batch create collections from a list (imkdir)"""
 
     def execute(self, paths, *args, **kwargs):
-        # Create parent collections if they don't exist
-        self.execute_data['created_colls'] = []
+        # Continue from the journal of an interrupted run if found
+        restored = self.restore_journal()
+        if not restored:
+            self.execute_data['created_colls'] = RevertLog()
+
+        # Find missing parent collections before creating, so the journal
+        # knows which collections may have been created
+        missing = []
+        checked = set()
         for path in paths:
             for i in range(2, len(path.split('/')) + 1):
                 sub_path = '/'.join(path.split('/')[:i])
-                if not self.irods.collections.exists(sub_path):
-                    self.irods.collections.create(sub_path)
-                    self.execute_data['created_colls'].append(sub_path)
-                    self.data_modified = True
+                if sub_path in checked:
+                    continue
+                checked.add(sub_path)
+                if not self._coll_exists(sub_path):
+                    missing.append(sub_path)
+
+        if restored:
+            self._open_journal()
+        else:
+            self._open_journal({'paths': paths}, {'missing': missing})
+        try:
+            for sub_path in missing:
+                self._create_coll(sub_path)
+                self.execute_data['created_colls'].append(sub_path)
+                self._journal_append('create_coll', sub_path)
+                self.data_modified = True
+        except Exception:
+            self._close_journal()
+            raise
+        self._close_journal(STATUS_DONE)
+        super().execute(*args, **kwargs)
+
+    def revert(self, paths, *args, **kwargs):
+        if self.data_modified:
+            for coll_path, _ in reversed(self.execute_data['created_colls']):
+                self._invalidate_coll(coll_path)
+                if self.irods.collections.exists(coll_path):
+                    self.irods.collections.remove(coll_path, recurse=True)
+        self._close_journal(STATUS_REVERTED)
+
+    def restore_journal(self):
+        journal = self._read_journal()
+        if not journal:
+            return False
+        missing = journal['header']['plan']['missing']
+        try:
+            existing = get_existing_coll_paths(self.irods, missing)
+        except Exception as ex:
+            self._raise_irods_exception(ex, 'Error querying collections')
+        self.execute_data['created_colls'] = RevertLog(
+            (p, None) for p in missing if p in existing
+        )
+        self.data_modified = len(self.execute_data['created_colls']) > 0
+        return True
+
+
+class CreateCollectionTreeTask(IrodsBaseTask):
+    """Create collections and their parent collections from a list, querying
+    existing collections in bulk (imkdir)"""
+
+    @staticmethod
+    def get_tree(paths):
+        """
+        Return prefix tree of collection paths.
+
+        :param paths: List of full collection paths
+        :return: Nested dict of collection name: subcollections
+        """
+        tree = {}
+        for path in paths:
+            node = tree
+            for name in path.strip('/').split('/'):
+                node = node.setdefault(name, {})
+        return tree
+
+    def execute(self, paths, *args, **kwargs):
+        self.execute_data['created_colls'] = []
+        tree = self.get_tree(paths)
+        # Collection paths in top down order
+        tree_paths = []
+        nodes = [('', tree)]
+        while nodes:
+            parent_path, node = nodes.pop(0)
+            for name, sub_node in node.items():
+                tree_paths.append(parent_path + '/' + name)
+                nodes.append((tree_paths[-1], sub_node))
+
+        query_paths = [
+            p
+            for p in tree_paths
+            if not self.coll_cache or p not in self.coll_cache
+        ]
+        try:
+            existing = get_existing_coll_paths(self.irods, query_paths)
+        except Exception as ex:
+            self._raise_irods_exception(ex, 'Error querying collections')
+        if self.coll_cache:
+            for path in existing:
+                self.coll_cache.add(path)
+
+        for path in query_paths:
+            if path in existing:
+                continue
+            try:
+                self._create_coll(path)
+            except Exception as ex:
+                self._raise_irods_exception(ex, path)
+            self.execute_data['created_colls'].append(path)
+            self.data_modified = True
         super().execute(*args, **kwargs)
 
     def revert(self, paths, *args, **kwargs):
         if self.data_modified:
             for coll_path in reversed(self.execute_data['created_colls']):
+                self._invalidate_coll(coll_path)
                 if self.irods.collections.exists(coll_path):
                     self.irods.collections.remove(coll_path, recurse=True)
 
 
 class BatchMoveDataObjectsTask(IrodsBaseTask):
-    """Batch move files (imv) and set access to user group (ichmod)"""
+    """Batch move files (imv) and set access to user group (ichmod). Data
+    objects under collections given in src_colls are moved along with their
+    collection."""
 
     @staticmethod
     def get_dest_coll_path(src_path, src_root, dest_root):
@@ -566,95 +815,312 @@ class BatchMoveDataObjectsTask(IrodsBaseTask):
             + src_path.split('/')[-1]
         )
 
-    def execute(
+    @staticmethod
+    def get_prev_access(user_access, access_name):
+        """Return access to be restored in revert or None if not modified"""
+        if user_access and user_access != ACCESS_CONVERSION[access_name]:
+            return ACCESS_CONVERSION[user_access]
+        elif not user_access:
+            return 'null'
+        return None
+
+    @staticmethod
+    def get_coll_objects(src_root, src_paths, src_colls):
+        """
+        Sort data objects by the collection they are moved with.
+
+        :return: Tuple of (dict of collection path: data object paths, list of
+                 data object paths moved one at a time)
+        """
+        coll_objects = {c: [] for c in src_colls or []}
+        obj_paths = []
+        for src_path in src_paths:
+            coll = src_path[: src_path.rfind('/')]
+            while len(coll) > len(src_root) and coll not in coll_objects:
+                coll = coll[: coll.rfind('/')]
+            if coll in coll_objects:
+                coll_objects[coll].append(src_path)
+            else:
+                obj_paths.append(src_path)
+        return coll_objects, obj_paths
+
+    def _move_object(
         self,
+        irods,
+        src_path,
         src_root,
         dest_root,
-        src_paths,
         access_name,
         user_name,
-        *args,
-        **kwargs
+        obj_access,
     ):
-        self.execute_data['moved_objects'] = []
+        """
+        Move data object and set access if needed.
 
-        for src_path in src_paths:
-            dest_coll_path = self.get_dest_coll_path(
-                src_path, src_root, dest_root
-            )
-            dest_obj_path = self.get_dest_obj_path(src_path, dest_coll_path)
+        :param obj_access: Access of objects before moving (dict)
+        :return: Previous access to be restored in revert or None
+        """
+        dest_coll_path = self.get_dest_coll_path(src_path, src_root, dest_root)
+        dest_obj_path = self.get_dest_obj_path(src_path, dest_coll_path)
 
-            try:
-                self.irods.data_objects.move(
-                    src_path=src_path, dest_path=dest_obj_path
+        try:
+            irods.data_objects.move(src_path=src_path, dest_path=dest_obj_path)
+        except Exception as ex:
+            if ex.__class__.__name__ == 'CAT_NAME_EXISTS_AS_DATAOBJ':
+                msg = 'Target file already exists: {}'.format(dest_obj_path)
+            else:
+                msg = 'Error moving move data object "{}" to "{}"'.format(
+                    src_path, dest_obj_path
                 )
-            except Exception as ex:
-                if ex.__class__.__name__ == 'CAT_NAME_EXISTS_AS_DATAOBJ':
-                    msg = 'Target file already exists: {}'.format(dest_obj_path)
-                else:
-                    msg = 'Error moving move data object "{}" to "{}"'.format(
-                        src_path, dest_obj_path
-                    )
-                self._raise_irods_exception(ex, msg)
+            self._raise_irods_exception(ex, msg)
 
-            modifying_access = False
+        prev_access = self.get_prev_access(
+            obj_access.get(src_path, {}).get(user_name), access_name
+        )
 
+        # Record before setting access, as the object has already been moved
+        with self._moved_lock:
+            self.execute_data['moved_objects'].append(src_path, prev_access)
+            self._journal_append('move', src_path, prev_access)
+
+        if prev_access:  # Access needs to be modified
+            acl = iRODSAccess(
+                access_name=access_name,
+                path=dest_obj_path,
+                user_name=user_name,
+                user_zone=irods.zone,
+            )
             try:
-                target = self.irods.data_objects.get(dest_obj_path)
+                irods.permissions.set(acl, recursive=False)
             except Exception as ex:
                 self._raise_irods_exception(
                     ex,
-                    'Error retrieving destination object "{}"'.format(
-                        dest_obj_path
-                    ),
+                    'Error setting permission for "{}"'.format(dest_coll_path),
                 )
+        return prev_access
 
+    def _move_coll(
+        self,
+        irods,
+        src_coll,
+        src_root,
+        dest_root,
+        access_name,
+        user_name,
+        obj_paths,
+        access,
+    ):
+        """
+        Move collection with its contents and set access recursively if
+        needed.
+
+        :param obj_paths: Paths of data objects within the collection (list)
+        :param access: Access of collections and objects before moving (dict)
+        :return: List of data object paths moved
+        """
+        dest_parent = self.get_dest_coll_path(
+            src_coll, src_root, dest_root
+        ).rstrip('/')
+        dest_coll = self.get_dest_obj_path(src_coll, dest_parent)
+
+        # Collections are not empty, so they can be found from object paths
+        paths = set()
+        for path in obj_paths:
+            while len(path) > len(src_coll) and path not in paths:
+                paths.add(path)
+                path = path[: path.rfind('/')]
+        paths.add(src_coll)
+        changed_access = []
+        for path in sorted(paths):
+            prev_access = self.get_prev_access(
+                access.get(path, {}).get(user_name), access_name
+            )
+            if prev_access:
+                changed_access.append((path, prev_access))
+
+        # Journal before moving, as contents of the collection are not listed
+        with self._moved_lock:
+            self._journal_append('move_coll', src_coll)
+            for path, prev_access in changed_access:
+                self._journal_append('coll_access', path, prev_access)
+        if self._journal:
+            self._journal.flush()
+
+        self._invalidate_coll(src_coll)
+        try:
+            irods.collections.move(src_path=src_coll, dest_path=dest_parent)
+        except Exception as ex:
+            self._raise_irods_exception(
+                ex,
+                'Error moving collection "{}" to "{}"'.format(
+                    src_coll, dest_coll
+                ),
+            )
+
+        # Record before setting access, as the collection has already been moved
+        with self._moved_lock:
+            self.execute_data['moved_colls'].append(src_coll)
+            for path, prev_access in changed_access:
+                self.execute_data['moved_colls_access'].append(
+                    path, prev_access
+                )
+
+        if changed_access:
+            acl = iRODSAccess(
+                access_name=access_name,
+                path=dest_coll,
+                user_name=user_name,
+                user_zone=irods.zone,
+            )
             try:
-                target_access = self.irods.permissions.get(target=target)
+                irods.permissions.set(acl, recursive=True)
             except Exception as ex:
                 self._raise_irods_exception(
-                    ex,
-                    'Error getting permissions of target "{}"'.format(target),
+                    ex, 'Error setting permission for "{}"'.format(dest_coll)
                 )
+        return obj_paths
 
-            user_access = next(
-                (x for x in target_access if x.user_name == user_name), None
-            )
-            prev_access = None
-
-            if (
-                user_access
-                and user_access.access_name != ACCESS_CONVERSION[access_name]
-            ):
-                prev_access = ACCESS_CONVERSION[user_access.access_name]
-                modifying_access = True
-            elif not user_access:
-                prev_access = 'null'
-                modifying_access = True
-
-            self.execute_data['moved_objects'].append((src_path, prev_access))
-
-            if modifying_access:
-                acl = iRODSAccess(
-                    access_name=access_name,
-                    path=dest_obj_path,
-                    user_name=user_name,
-                    user_zone=self.irods.zone,
+    def execute(
+        self,
+        src_root,
+        dest_root,
+        src_paths,
+        access_name,
+        user_name,
+        src_colls=None,
+        concurrency=None,
+        *args,
+        **kwargs
+    ):
+        if concurrency is None:
+            concurrency = BATCH_CONCURRENCY
+        self._moved_lock = threading.Lock()
+        if self.progress:
+            self.progress.start()
+        coll_objects, obj_paths = self.get_coll_objects(
+            src_root, src_paths, src_colls
+        )
+
+        # Continue from the journal of an interrupted run if found
+        restored = self.restore_journal()
+        if restored:
+            moved = set(self.execute_data['moved_objects'].get_paths())
+            obj_paths = [p for p in obj_paths if p not in moved]
+            for src_coll in self.execute_data['moved_colls']:
+                coll_objects.pop(src_coll, None)
+        else:
+            self.execute_data['moved_objects'] = RevertLog()
+            self.execute_data['moved_colls'] = []
+            self.execute_data['moved_colls_access'] = RevertLog()
+
+        # Access is retained in move, so it can be queried before moving
+        try:
+            obj_access = get_subcoll_obj_access(self.irods, src_root, user_name)
+            if coll_objects:
+                obj_access.update(
+                    get_subcoll_coll_access(self.irods, src_root, user_name)
                 )
-                try:
-                    self.irods.permissions.set(acl, recursive=False)
-                except Exception as ex:
-                    self._raise_irods_exception(
-                        ex,
-                        'Error setting permission for "{}"'.format(
-                            dest_coll_path
-                        ),
-                    )
+        except Exception as ex:
+            self._raise_irods_exception(
+                ex, 'Error getting permissions in "{}"'.format(src_root)
+            )
 
+        if restored:
+            self._open_journal()
+        else:
+            self._open_journal(
+                {
+                    'src_root': src_root,
+                    'dest_root': dest_root,
+                    'src_paths': src_paths,
+                    'access_name': access_name,
+                    'user_name': user_name,
+                    'src_colls': src_colls or [],
+                },
+                {
+                    'access': {
+                        k: v[user_name]
+                        for k, v in obj_access.items()
+                        if user_name in v
+                    }
+                },
+            )
+        try:
+            self._move_all(
+                src_root,
+                dest_root,
+                access_name,
+                user_name,
+                coll_objects,
+                obj_paths,
+                obj_access,
+                concurrency,
+            )
+        except Exception:
+            self._close_journal()
+            raise
+        self._close_journal(STATUS_DONE)
         super().execute(*args, **kwargs)
 
+    def _move_all(
+        self,
+        src_root,
+        dest_root,
+        access_name,
+        user_name,
+        coll_objects,
+        obj_paths,
+        obj_access,
+        concurrency,
+    ):
+        """Move collections and data objects in parallel"""
+        # NOTE: No new moves are started after the first failure
+        for _, moved_paths in run_parallel(
+            self.irods,
+            lambda irods, src_coll: self._move_coll(
+                irods,
+                src_coll,
+                src_root,
+                dest_root,
+                access_name,
+                user_name,
+                coll_objects[src_coll],
+                obj_access,
+            ),
+            sorted(coll_objects.keys()),
+            concurrency,
+        ):
+            if self.progress:
+                for src_path in moved_paths:
+                    self.progress.update(src_path)
+
+        for src_path, _ in run_parallel(
+            self.irods,
+            lambda irods, src_path: self._move_object(
+                irods,
+                src_path,
+                src_root,
+                dest_root,
+                access_name,
+                user_name,
+                obj_access,
+            ),
+            obj_paths,
+            concurrency,
+        ):
+            if self.progress:
+                self.progress.update(src_path)
+
     def revert(
-        self, src_root, dest_root, access_name, user_name, *args, **kwargs
+        self,
+        src_root,
+        dest_root,
+        access_name,
+        user_name,
+        src_colls=None,
+        concurrency=None,
+        *args,
+        **kwargs
     ):
         for moved_object in self.execute_data['moved_objects']:
             src_path = moved_object[0]
@@ -670,6 +1136,8 @@ class BatchMoveDataObjectsTask(IrodsBaseTask):
 
             self.irods.data_objects.move(src_path=new_src, dest_path=new_dest)
 
+            if not prev_access:  # Access was not modified
+                continue
             acl = iRODSAccess(
                 access_name=prev_access,
                 path=new_dest_obj,
@@ -677,3 +1145,82 @@ class BatchMoveDataObjectsTask(IrodsBaseTask):
                 user_zone=self.irods.zone,
             )
             self.irods.permissions.set(acl, recursive=False)
+
+        for src_coll in self.execute_data.get('moved_colls', []):
+            dest_parent = self.get_dest_coll_path(
+                src_coll, src_root, dest_root
+            ).rstrip('/')
+            dest_coll = self.get_dest_obj_path(src_coll, dest_parent)
+            self._invalidate_coll(dest_coll)
+            self.irods.collections.move(
+                src_path=dest_coll,
+                dest_path=src_coll[: src_coll.rfind('/')],
+            )
+        for path, prev_access in self.execute_data.get(
+            'moved_colls_access', []
+        ):
+            acl = iRODSAccess(
+                access_name=prev_access,
+                path=path,
+                user_name=user_name,
+                user_zone=self.irods.zone,
+            )
+            self.irods.permissions.set(acl, recursive=False)
+        self._close_journal(STATUS_REVERTED)
+
+    def restore_journal(self):
+        journal = self._read_journal()
+        if not journal:
+            return False
+        args = journal['header']['args']
+        src_root = args['src_root']
+        access = journal['header']['plan']['access']
+        records = journal['records']
+        coll_objects, obj_paths = self.get_coll_objects(
+            src_root, args['src_paths'], args['src_colls']
+        )
+
+        # Objects and collections no longer in the source have been moved
+        try:
+            remaining = set(get_subcoll_obj_data(self.irods, src_root))
+            remaining.update(query_subcoll_paths(self.irods, src_root))
+        except Exception as ex:
+            self._raise_irods_exception(
+                ex, 'Error listing collection "{}"'.format(src_root)
+            )
+
+        # Collections are journaled with their access before moving
+        moved_colls = [
+            r[1]
+            for r in records
+            if r[0] == 'move_coll' and r[1] not in remaining
+        ]
+        moved_colls_access = RevertLog(
+            (r[1], r[2])
+            for r in records
+            if r[0] == 'coll_access'
+            and any(r[1] == c or r[1].startswith(c + '/') for c in moved_colls)
+        )
+        # Objects moved after the last journal write are found in the plan
+        recorded = {
+            r[1]: r[2] if len(r) > 2 else None
+            for r in records
+            if r[0] == 'move'
+        }
+        moved_objects = RevertLog()
+        for path in obj_paths:
+            if path in remaining:
+                continue
+            if path in recorded:
+                prev_access = recorded[path]
+            else:
+                prev_access = self.get_prev_access(
+                    access.get(path), args['access_name']
+                )
+            moved_objects.append(path, prev_access)
+
+        self.execute_data['moved_objects'] = moved_objects
+        self.execute_data['moved_colls'] = moved_colls
+        self.execute_data['moved_colls_access'] = moved_colls_access
+        self.data_modified = len(moved_objects) > 0 or len(moved_colls) > 0
+        return True
@@ -288,16 +288,14 @@ class SetLandingZoneStatusTask(SODARBaseTask):
         *args,
         **kwargs
     ):
-        set_data = {
-            'status': status,
-            'status_info': status_info,
-            'zone_uuid': zone_uuid,
-            'flow_name': flow_name,
-        }
-        if extra_data:
-            set_data.update(extra_data)
-        self.sodar_api.send_request(
-            'landingzones/taskflow/status/set', set_data
+        # Fail the flow if earlier status updates could not be sent
+        self.sodar_api.check_status()
+        self.sodar_api.set_zone_status(
+            zone_uuid=zone_uuid,
+            status=status,
+            status_info=status_info,
+            flow_name=flow_name,
+            extra_data=extra_data,
         )
         self.data_modified = True
         super().execute(*args, **kwargs)
@@ -346,14 +344,10 @@ class RevertLandingZoneFailTask(SODARBaseTask):
             status_info += ': '
             status_info += str(v.exception) if v.exception else 'unknown error'
 
-        set_data = {
-            'zone_uuid': zone_uuid,
-            'status': status,
-            'status_info': status_info,
-            'flow_name': flow_name,
-        }
-        if extra_data:
-            set_data.update(extra_data)
-        self.sodar_api.send_request(
-            'landingzones/taskflow/status/set', set_data
+        self.sodar_api.set_zone_status(
+            zone_uuid=zone_uuid,
+            status=status,
+            status_info=status_info,
+            flow_name=flow_name,
+            extra_data=extra_data,
         )
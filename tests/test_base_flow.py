@@ -0,0 +1,511 @@
+"""Tests for the base flow and flow persistence"""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from taskflow import states
+
+from apis import persistence_api
+from apis.revert_journal import STATUS_DONE, read_journal
+from apis.sodar_api import ProgressReporter
+from flows.base_flow import BaseLinearFlow, ResumedFlow
+from tasks.base_task import BaseTask
+from tasks.irods_tasks import (
+    BatchCreateCollectionsTask,
+    BatchMoveDataObjectsTask,
+    CreateCollectionTask,
+    IrodsBaseTask,
+)
+
+
+# Task calls recorded by the test tasks
+CALLS = []
+
+
+class RecordTask(BaseTask):
+    """Test task recording its calls"""
+
+    def __init__(self, name, interrupt=False, delay=0, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+        self.target = 'test'
+        self.interrupt = interrupt
+        self.delay = delay
+
+    def execute(self, value, *args, **kwargs):
+        CALLS.append(('execute', self.name))
+        if self.interrupt:
+            raise KeyboardInterrupt  # Simulate a crash
+        time.sleep(self.delay)
+        self.thread = threading.get_ident()
+        self.execute_data['value'] = value
+        self.data_modified = True
+        super().execute(*args, **kwargs)
+
+    def revert(self, value, *args, **kwargs):
+        CALLS.append(('revert', self.name, self.execute_data.get('value')))
+
+
+class IrodsRecordTask(IrodsBaseTask):
+    """Test iRODS task recording the session used"""
+
+    def execute(self, *args, **kwargs):
+        self.execute_data['irods'] = self.irods
+        super().execute(*args, **kwargs)
+
+
+def get_flow(timeline_uuid=None):
+    return BaseLinearFlow(
+        irods=None,
+        sodar_api=None,
+        project_uuid=str(uuid.uuid4()),
+        flow_name='test_flow',
+        flow_data={},
+        targets=['test', 'irods'],
+        timeline_uuid=timeline_uuid,
+    )
+
+
+class TestBaseLinearFlowUnordered(TestCase):
+    """Tests for unordered flow sections in BaseLinearFlow"""
+
+    def setUp(self):
+        CALLS.clear()
+        self.flow = get_flow()
+        self.flow.add_task(RecordTask(name='First', inject={'value': 0}))
+        with self.flow.unordered('Section'):
+            for i in range(4):
+                self.flow.add_task(
+                    RecordTask(
+                        name='Parallel {}'.format(i),
+                        delay=0.1,
+                        inject={'value': i},
+                    )
+                )
+
+    def test_run(self):
+        """Test running tasks in an unordered section in parallel"""
+        self.flow.add_task(RecordTask(name='Last', inject={'value': 5}))
+        self.assertEqual(self.flow.run(verbose=False), True)
+        self.assertEqual(CALLS[0], ('execute', 'First'))
+        self.assertEqual(CALLS[-1], ('execute', 'Last'))
+        tasks = list(self.flow.iter_tasks())
+        self.assertEqual(len(tasks), 6)
+        self.assertTrue(all(t.parallel for t in tasks[1:5]))
+        threads = set(t.thread for t in tasks[1:5])
+        self.assertGreater(len(threads), 1)
+
+    def test_run_serial(self):
+        """Test running an unordered section with one worker"""
+        self.flow.max_workers = 1
+        self.assertEqual(self.flow.run(verbose=False), True)
+        tasks = list(self.flow.iter_tasks())
+        self.assertEqual(len(set(t.thread for t in tasks)), 1)
+
+    def test_revert(self):
+        """Test reverting all tasks if a task fails after a section"""
+        self.flow.add_task(
+            RecordTask(name='Last', force_fail=True, inject={'value': 5})
+        )
+        self.assertEqual(self.flow.run(verbose=False), False)
+        reverted = [c[1] for c in CALLS if c[0] == 'revert']
+        self.assertEqual(len(reverted), 6)
+        self.assertEqual(reverted[-1], 'First')
+
+    @patch('tasks.irods_tasks.session_pool')
+    def test_irods_session(self, mock_pool):
+        """Test using a separate iRODS session in parallel iRODS tasks"""
+        shared_irods = MagicMock()
+        thread_irods = MagicMock()
+        mock_pool.get_clone.return_value = thread_irods
+        with self.flow.unordered('iRODS section'):
+            self.flow.add_task(
+                IrodsRecordTask(name='iRODS task', irods=shared_irods)
+            )
+        self.assertEqual(self.flow.run(verbose=False), True)
+        task = list(self.flow.iter_tasks())[-1]
+        self.assertEqual(task.execute_data['irods'], thread_irods)
+        self.assertEqual(task.irods, shared_irods)
+        mock_pool.get_clone.assert_called_once_with(shared_irods)
+        mock_pool.release.assert_called_once_with(thread_irods)
+
+
+class TestBaseLinearFlowCollCache(TestCase):
+    """Tests for the collection cache in BaseLinearFlow"""
+
+    def setUp(self):
+        self.irods = MagicMock()
+        self.existing = {'/omicsZone', '/omicsZone/projects'}
+        self.irods.collections.exists.side_effect = (
+            lambda path: path in self.existing
+        )
+        self.irods.collections.create.side_effect = self.existing.add
+        self.flow = get_flow()
+        self.root = '/omicsZone/projects/' + self.flow.project_uuid
+
+    def test_run(self):
+        """Test checking each collection once in a flow"""
+        paths = [self.root + '/coll{}/sub'.format(i) for i in range(3)]
+        for path in paths:
+            self.flow.add_task(
+                CreateCollectionTask(
+                    name='Create {}'.format(path),
+                    irods=self.irods,
+                    inject={'path': path},
+                )
+            )
+        self.flow.add_task(
+            BatchCreateCollectionsTask(
+                name='Create collections',
+                irods=self.irods,
+                inject={'paths': paths},
+            )
+        )
+        self.assertEqual(self.flow.run(verbose=False), True)
+        checked = [
+            c[0][0] for c in self.irods.collections.exists.call_args_list
+        ]
+        self.assertEqual(len(checked), len(set(checked)))
+        self.assertEqual(len(checked), 9)
+        self.assertEqual(self.irods.collections.create.call_count, 7)
+
+    def test_revert(self):
+        """Test invalidating removed collections on revert"""
+        path = self.root + '/coll'
+        self.flow.add_task(
+            CreateCollectionTask(
+                name='Create collection',
+                irods=self.irods,
+                inject={'path': path},
+            )
+        )
+        self.flow.add_task(
+            RecordTask(name='Fail', force_fail=True, inject={'value': 0})
+        )
+        self.assertEqual(self.flow.run(verbose=False), False)
+        self.irods.collections.remove.assert_called()
+        self.assertEqual(
+            self.flow.coll_cache.exists(self.irods, '/omicsZone'), True
+        )
+        self.existing.clear()
+        self.assertEqual(self.flow.coll_cache.exists(self.irods, path), False)
+        self.assertEqual(
+            self.flow.coll_cache.exists(self.irods, self.root), False
+        )
+
+
+class TestBaseLinearFlowJournal(TestCase):
+    """Tests for batch task journals in BaseLinearFlow"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = patch('flows.base_flow.JOURNAL_DIR', tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.irods = MagicMock()
+        self.irods.collections.exists.return_value = False
+        self.timeline_uuid = str(uuid.uuid4())
+        self.flow = get_flow(self.timeline_uuid)
+        self.task = BatchCreateCollectionsTask(
+            name='Create collections',
+            irods=self.irods,
+            inject={'paths': ['/omicsZone/projects/coll']},
+        )
+
+    def test_add_task(self):
+        """Test setting journal path and flow information for tasks"""
+        self.flow.add_task(self.task)
+        self.assertEqual(
+            os.path.dirname(self.task.journal_path), self.flow.journal_dir
+        )
+        self.assertEqual(
+            os.path.basename(self.flow.journal_dir), self.timeline_uuid
+        )
+        self.assertEqual(
+            self.task.journal_info,
+            {
+                'flow_name': 'test_flow',
+                'project_uuid': self.flow.project_uuid,
+                'timeline_uuid': self.timeline_uuid,
+            },
+        )
+
+    def test_run(self):
+        """Test writing journal and removing it once the flow is finished"""
+        self.flow.add_task(self.task)
+        self.assertEqual(self.flow.run(verbose=False), True)
+        self.assertEqual(self.irods.collections.create.call_count, 3)
+        self.assertFalse(os.path.exists(self.flow.journal_dir))
+
+    def test_remove_journals(self):
+        """Test keeping journals of tasks not reverted with the flow"""
+        self.flow.add_task(self.task)
+        self.assertEqual(self.flow.run(verbose=False), True)
+        self.task._open_journal({'paths': []})
+        self.task._close_journal(STATUS_DONE)
+        self.flow._remove_journals(states.REVERTED)
+        self.assertTrue(os.path.exists(self.task.journal_path))
+        self.flow._remove_journals(states.SUCCESS)
+        self.assertFalse(os.path.exists(self.flow.journal_dir))
+
+    def test_run_interrupt(self):
+        """Test keeping journal if the flow is interrupted"""
+        self.flow.add_task(self.task)
+        self.flow.add_task(
+            RecordTask(name='Crash', interrupt=True, inject={'value': 0})
+        )
+        with self.assertRaises(KeyboardInterrupt):
+            self.flow.run(verbose=False)
+        journal = read_journal(self.task.journal_path)
+        self.assertEqual(journal['header']['name'], 'Create collections')
+        self.assertEqual(len(journal['records']), 3)
+        self.assertEqual(journal['status'], STATUS_DONE)
+
+
+class TestBaseLinearFlowPersistence(TestCase):
+    """Tests for BaseLinearFlow persistence and resuming"""
+
+    def setUp(self):
+        CALLS.clear()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        db_url = 'sqlite:///' + os.path.join(self.tmp_dir.name, 'tf.db')
+        patcher = patch.object(persistence_api, 'PERSISTENCE_URL', db_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        persistence_api._backend = None
+        self.addCleanup(setattr, persistence_api, '_backend', None)
+        self.backend = persistence_api.get_backend()
+        self.timeline_uuid = str(uuid.uuid4())
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _get_flow(self, interrupt=False):
+        flow = get_flow(self.timeline_uuid)
+        flow.add_task(RecordTask(name='Task 1', inject={'value': 1}))
+        flow.add_task(
+            RecordTask(name='Task 2', interrupt=interrupt, inject={'value': 2})
+        )
+        return flow
+
+    def _interrupt(self):
+        with self.assertRaises(KeyboardInterrupt):
+            self._get_flow(interrupt=True).run(verbose=False)
+        CALLS.clear()
+        return persistence_api.get_flow_detail(self.backend, self.timeline_uuid)
+
+    def test_run(self):
+        """Test running a flow with persistence"""
+        self.assertEqual(self._get_flow().run(verbose=False), True)
+        self.assertIsNone(
+            persistence_api.get_flow_detail(self.backend, self.timeline_uuid)
+        )
+
+    def test_get_backend_dir(self):
+        """Test creating the directory of an SQLite database"""
+        db_dir = os.path.join(self.tmp_dir.name, 'data')
+        with patch.object(
+            persistence_api,
+            'PERSISTENCE_URL',
+            'sqlite:///' + os.path.join(db_dir, 'tf.db'),
+        ):
+            persistence_api._backend = None
+            persistence_api.get_backend()
+        self.assertTrue(os.path.isdir(db_dir))
+
+    def test_run_interrupted(self):
+        """Test flow detail is kept for an interrupted flow"""
+        flow_detail = self._interrupt()
+        self.assertIsNotNone(flow_detail)
+        self.assertEqual(flow_detail.state, states.RUNNING)
+        self.assertEqual(len(flow_detail.meta['tasks']), 2)
+        atom_detail = next(ad for ad in flow_detail if ad.name == 'Task 1')
+        self.assertEqual(
+            atom_detail.meta['state'],
+            {'data_modified': True, 'execute_data': {'value': 1}},
+        )
+
+    def test_resume(self):
+        """Test continuing an interrupted flow"""
+        flow_detail = self._interrupt()
+        flow = ResumedFlow(None, None, flow_detail)
+        flow.build()
+        self.assertEqual(flow.run(verbose=False), True)
+        self.assertEqual(CALLS, [('execute', 'Task 2')])
+        self.assertIsNone(
+            persistence_api.get_flow_detail(self.backend, self.timeline_uuid)
+        )
+
+    def test_resume_rerun(self):
+        """Test continuing an interrupted flow by running it again"""
+        self._interrupt()
+        self.assertEqual(self._get_flow().run(verbose=False), True)
+        self.assertEqual(CALLS, [('execute', 'Task 2')])
+
+    def test_resume_revert(self):
+        """Test reverting an interrupted flow"""
+        flow_detail = self._interrupt()
+        flow = ResumedFlow(None, None, flow_detail, revert=True)
+        flow.build()
+        self.assertEqual(flow.run(verbose=False), False)
+        self.assertEqual(CALLS, [('revert', 'Task 1', 1)])
+        self.assertIsNone(
+            persistence_api.get_flow_detail(self.backend, self.timeline_uuid)
+        )
+
+    @patch('tasks.irods_tasks.query_subcoll_paths', return_value=[])
+    @patch('tasks.irods_tasks.get_subcoll_obj_data')
+    @patch('tasks.irods_tasks.get_subcoll_obj_access', return_value={})
+    @patch('apis.irods_utils.session_pool')
+    def test_resume_revert_batch(
+        self, mock_pool, mock_access, mock_data, mock_colls
+    ):
+        """Test reverting a flow interrupted in a batch move"""
+        irods = MagicMock(zone='omicsZone')
+        mock_pool.get_clone.return_value = irods
+        src_root = '/omicsZone/projects/zone'
+        dest_root = '/omicsZone/projects/sample_data'
+        src_paths = ['{}/obj{}'.format(src_root, i) for i in range(10)]
+        progress = MagicMock()
+        progress.update.side_effect = [None] * 3 + [KeyboardInterrupt]
+        journal_dir = os.path.join(self.tmp_dir.name, 'journal')
+
+        with patch('flows.base_flow.JOURNAL_DIR', journal_dir):
+            flow = get_flow(self.timeline_uuid)
+            flow.irods = irods
+            flow.add_task(RecordTask(name='Task 1', inject={'value': 1}))
+            flow.add_task(
+                BatchMoveDataObjectsTask(
+                    name='Move data objects',
+                    irods=irods,
+                    progress=progress,
+                    inject={
+                        'src_root': src_root,
+                        'dest_root': dest_root,
+                        'src_paths': src_paths,
+                        'access_name': 'read',
+                        'user_name': 'group',
+                        'concurrency': 1,
+                    },
+                )
+            )
+            with self.assertRaises(KeyboardInterrupt):
+                flow.run(verbose=False)
+            moved = [
+                c[1]['src_path'] for c in irods.data_objects.move.call_args_list
+            ]
+            self.assertEqual(len(moved), 4)
+            CALLS.clear()
+            irods.data_objects.move.reset_mock()
+            mock_data.return_value = {p: {} for p in src_paths[4:]}
+
+            flow_detail = persistence_api.get_flow_detail(
+                self.backend, self.timeline_uuid
+            )
+            flow = ResumedFlow(irods, None, flow_detail, revert=True)
+            flow.build()
+            self.assertEqual(flow.run(verbose=False), False)
+
+        reverted = [
+            c[1]['src_path'].replace(dest_root, src_root)
+            for c in irods.data_objects.move.call_args_list
+        ]
+        self.assertEqual(sorted(reverted), sorted(moved))
+        self.assertEqual(CALLS, [('revert', 'Task 1', 1)])
+        self.assertFalse(os.path.exists(flow.journal_dir))
+        self.assertIsNone(
+            persistence_api.get_flow_detail(self.backend, self.timeline_uuid)
+        )
+
+    def test_resume_data_ref(self):
+        """Test saving large inject values once outside of flow meta"""
+        paths = ['/omicsZone/projects/obj{}'.format(i) for i in range(200)]
+        flow = get_flow(self.timeline_uuid)
+        flow.add_task(RecordTask(name='Task 1', inject={'value': paths}))
+        flow.add_task(
+            RecordTask(name='Task 2', interrupt=True, inject={'value': 2})
+        )
+        with self.assertRaises(KeyboardInterrupt):
+            flow.run(verbose=False)
+        CALLS.clear()
+        flow_detail = persistence_api.get_flow_detail(
+            self.backend, self.timeline_uuid
+        )
+        inject = flow_detail.meta['tasks'][0]['kwargs']['inject']
+        self.assertNotEqual(inject['value'], paths)
+        self.assertEqual(
+            flow_detail.meta['tasks'][1]['kwargs']['inject'], {'value': 2}
+        )
+        self.assertEqual(
+            list(
+                persistence_api.get_flow_data(
+                    self.backend, self.timeline_uuid
+                ).values()
+            ),
+            [paths],
+        )
+        flow = ResumedFlow(None, None, flow_detail, revert=True)
+        flow.build()
+        self.assertEqual(flow.run(verbose=False), False)
+        self.assertEqual(CALLS, [('revert', 'Task 1', paths)])
+
+    def test_resume_progress(self):
+        """Test restoring progress reporters of tasks"""
+        sizes = {'/omicsZone/projects/obj{}'.format(i): i for i in range(200)}
+        progress = ProgressReporter(
+            sodar_api=MagicMock(),
+            zone_uuid=str(uuid.uuid4()),
+            status='MOVING',
+            status_info='Moving',
+            total=200,
+            sizes=sizes,
+            flow_name='test_flow',
+        )
+        flow = get_flow(self.timeline_uuid)
+        flow.add_task(
+            IrodsRecordTask(name='Task 1', irods=None, progress=progress)
+        )
+        flow.add_task(
+            RecordTask(name='Task 2', interrupt=True, inject={'value': 2})
+        )
+        with self.assertRaises(KeyboardInterrupt):
+            flow.run(verbose=False)
+        flow_detail = persistence_api.get_flow_detail(
+            self.backend, self.timeline_uuid
+        )
+        sodar_api = MagicMock()
+        flow = ResumedFlow(None, sodar_api, flow_detail)
+        flow.build()
+        restored = next(flow.iter_tasks()).progress
+        self.assertIsInstance(restored, ProgressReporter)
+        self.assertEqual(restored.sodar_api, sodar_api)
+        self.assertEqual(restored.get_config(), progress.get_config())
+        self.assertEqual(flow.run(verbose=False), True)
+
+    def test_resume_unordered(self):
+        """Test continuing an interrupted flow with an unordered section"""
+        flow = get_flow(self.timeline_uuid)
+        with flow.unordered('Section'):
+            flow.add_task(RecordTask(name='Task 1', inject={'value': 1}))
+            flow.add_task(RecordTask(name='Task 2', inject={'value': 2}))
+        flow.add_task(
+            RecordTask(name='Task 3', interrupt=True, inject={'value': 3})
+        )
+        with self.assertRaises(KeyboardInterrupt):
+            flow.run(verbose=False)
+        CALLS.clear()
+        flow_detail = persistence_api.get_flow_detail(
+            self.backend, self.timeline_uuid
+        )
+        self.assertEqual(len(flow_detail.meta['tasks']), 2)
+        flow = ResumedFlow(None, None, flow_detail, revert=True)
+        flow.build()
+        self.assertEqual(flow.run(verbose=False), False)
+        self.assertEqual(
+            sorted(CALLS), [('revert', 'Task 1', 1), ('revert', 'Task 2', 2)]
+        )
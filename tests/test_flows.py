@@ -0,0 +1,45 @@
+"""Tests for the flow registry"""
+
+import os
+from unittest import TestCase
+
+import flows
+from flows.base_flow import BaseLinearFlow
+
+
+class TestFlowRegistry(TestCase):
+    """Tests for the flow registry"""
+
+    def test_flow_names(self):
+        """Test all flow modules are registered"""
+        path = os.path.dirname(os.path.abspath(flows.__file__))
+        modules = sorted(
+            f[:-3]
+            for f in os.listdir(path)
+            if f.endswith('.py') and f not in ['__init__.py', 'base_flow.py']
+        )
+        self.assertEqual(sorted(flows.FLOW_NAMES), modules)
+
+    def test_get_flow(self):
+        """Test get_flow()"""
+        for name in flows.FLOW_NAMES:
+            flow_cls = flows.get_flow(name)
+            self.assertTrue(issubclass(flow_cls, BaseLinearFlow))
+            self.assertEqual(flows.get_flow(name), flow_cls)  # Cached
+
+    def test_get_flow_not_found(self):
+        """Test get_flow() with unsupported flow names"""
+        self.assertIsNone(flows.get_flow('not_a_flow'))
+        self.assertIsNone(flows.get_flow('base_flow'))
+
+    def test_get_flow_info(self):
+        """Test get_flow_info()"""
+        self.assertEqual(
+            flows.get_flow_info('landing_zone_create'),
+            {'supported_modes': ['sync', 'async'], 'require_lock': False},
+        )
+        self.assertEqual(
+            flows.get_flow_info('project_create'),
+            {'supported_modes': ['sync'], 'require_lock': True},
+        )
+        self.assertIsNone(flows.get_flow_info('not_a_flow'))
@@ -0,0 +1,384 @@
+"""Tests for iRODS utilities"""
+
+import io
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from apis.irods_utils import (
+    ChecksumFileReadException,
+    CollectionCache,
+    IrodsSessionPool,
+    QUERY_IN_SIZE,
+    get_existing_coll_paths,
+    get_subcoll_data,
+    get_subcoll_obj_access,
+    get_subcoll_obj_data,
+    get_subcoll_obj_paths,
+    get_subcoll_paths,
+    get_subtree_moves,
+    get_unpaired_md5_paths,
+    read_checksum_files,
+    run_parallel,
+    split_md5_paths,
+)
+
+from .test_tasks_irods import IRODSTestBase, TEST_COLL
+
+
+SUBCOLL_PATH = TEST_COLL + '/sub_coll'
+SUBCOLL_PATH2 = SUBCOLL_PATH + '/sub_coll2'
+OBJ_PATH = TEST_COLL + '/obj'
+OBJ_PATH2 = SUBCOLL_PATH2 + '/obj2'
+
+
+class TestGetSubcollData(IRODSTestBase):
+    """Tests for get_subcoll_data()"""
+
+    def setUp(self):
+        super().setUp()
+        self.irods.collections.create(SUBCOLL_PATH2)
+        self.irods.data_objects.create(OBJ_PATH)
+        self.irods.data_objects.create(OBJ_PATH2)
+
+    def test_get(self):
+        """Test listing collection contents"""
+        coll = self._get_test_coll()
+        data = get_subcoll_data(self.irods, TEST_COLL)
+        self.assertEqual(
+            sorted(data['data_objects'].keys()),
+            sorted(get_subcoll_obj_paths(coll)),
+        )
+        self.assertEqual(sorted(data['colls']), sorted(get_subcoll_paths(coll)))
+        obj_data = data['data_objects'][OBJ_PATH2]
+        self.assertEqual(obj_data['size'], 0)
+        self.assertEqual(len(obj_data['replicas']), 1)
+
+    def test_get_obj_data(self):
+        """Test retrieving data object replica data"""
+        checksum = self.irods.data_objects.chksum(OBJ_PATH2)
+        obj_data = get_subcoll_obj_data(self.irods, TEST_COLL)
+        self.assertEqual(sorted(obj_data.keys()), sorted([OBJ_PATH, OBJ_PATH2]))
+        replica = obj_data[OBJ_PATH2]['replicas'][0]
+        self.assertEqual(replica['checksum'], checksum)
+        self.assertEqual(replica['replica_status'], '1')
+
+    def test_get_obj_access(self):
+        """Test retrieving data object access"""
+        obj_access = get_subcoll_obj_access(self.irods, TEST_COLL)
+        self.assertEqual(
+            sorted(obj_access.keys()), sorted([OBJ_PATH, OBJ_PATH2])
+        )
+        self.assertEqual(obj_access[OBJ_PATH2][self.irods.username], 'own')
+
+    def test_get_obj_access_user(self):
+        """Test retrieving data object access for a single user"""
+        self.assertEqual(
+            get_subcoll_obj_access(self.irods, TEST_COLL, 'public'), {}
+        )
+
+    def test_get_empty(self):
+        """Test listing an empty collection"""
+        data = get_subcoll_data(self.irods, SUBCOLL_PATH2 + '_empty')
+        self.assertEqual(data, {'data_objects': {}, 'colls': []})
+
+
+class TestMD5Pairing(TestCase):
+    """Tests for split_md5_paths() and get_unpaired_md5_paths()"""
+
+    def test_split(self):
+        """Test splitting paths"""
+        paths = [OBJ_PATH, OBJ_PATH + '.md5', OBJ_PATH2 + '.MD5', OBJ_PATH]
+        file_paths, md5_paths = split_md5_paths(paths)
+        self.assertEqual(file_paths, [OBJ_PATH])
+        self.assertEqual(
+            sorted(md5_paths), sorted([OBJ_PATH + '.md5', OBJ_PATH2 + '.MD5'])
+        )
+
+    def test_unpaired(self):
+        """Test getting unpaired paths"""
+        file_paths = [OBJ_PATH, OBJ_PATH2]
+        md5_paths = [OBJ_PATH + '.md5', TEST_COLL + '/obj3.md5']
+        self.assertEqual(
+            get_unpaired_md5_paths(file_paths, md5_paths),
+            [OBJ_PATH2 + '.md5', TEST_COLL + '/obj3'],
+        )
+
+    def test_unpaired_none(self):
+        """Test getting unpaired paths with complete pairs"""
+        self.assertEqual(
+            get_unpaired_md5_paths([OBJ_PATH], [OBJ_PATH + '.md5']), []
+        )
+
+
+class TestGetSubtreeMoves(TestCase):
+    """Tests for get_subtree_moves()"""
+
+    def setUp(self):
+        self.src_root = '/testZone/zone'
+        self.dest_root = '/testZone/sample_data'
+        self.src_colls = [
+            self.src_root + '/a',
+            self.src_root + '/a/b',
+            self.src_root + '/c',
+        ]
+        self.src_paths = [
+            self.src_root + '/obj',
+            self.src_root + '/a/obj',
+            self.src_root + '/a/b/obj',
+            self.src_root + '/c/obj',
+        ]
+
+    def _get_moves(self, dest_colls):
+        return get_subtree_moves(
+            self.src_root,
+            self.dest_root,
+            self.src_colls,
+            self.src_paths,
+            dest_colls,
+        )
+
+    def test_get(self):
+        """Test moving collections not in destination as a whole"""
+        colls, paths = self._get_moves([self.dest_root])
+        self.assertEqual(colls, [self.src_root + '/a', self.src_root + '/c'])
+        self.assertEqual(paths, [self.src_root + '/obj'])
+
+    def test_get_merge(self):
+        """Test moving objects one by one into existing collections"""
+        colls, paths = self._get_moves([self.dest_root, self.dest_root + '/a'])
+        self.assertEqual(colls, [self.src_root + '/a/b', self.src_root + '/c'])
+        self.assertEqual(
+            paths, [self.src_root + '/obj', self.src_root + '/a/obj']
+        )
+
+    def test_get_no_dest_root(self):
+        """Test moving all objects one by one without destination root"""
+        colls, paths = self._get_moves([])
+        self.assertEqual(colls, [])
+        self.assertEqual(paths, self.src_paths)
+
+    def test_get_empty_coll(self):
+        """Test not moving collections with empty subcollections as a whole"""
+        self.src_colls.append(self.src_root + '/a/empty')
+        colls, paths = self._get_moves([self.dest_root])
+        self.assertEqual(colls, [self.src_root + '/c'])
+        self.assertEqual(paths, self.src_paths[:3])
+
+
+@patch('apis.irods_utils.session_pool', new=MagicMock())
+class TestRunParallel(TestCase):
+    """Tests for run_parallel()"""
+
+    def test_run(self):
+        """Test running items in parallel"""
+        result = run_parallel(None, lambda s, i: i * 2, range(100), 4)
+        self.assertEqual(sorted(result), [(i, i * 2) for i in range(100)])
+
+    def test_run_serial(self):
+        """Test running items serially with the given session"""
+        irods = MagicMock()
+        result = list(run_parallel(irods, lambda s, i: s, range(3), 1))
+        self.assertEqual(result, [(i, irods) for i in range(3)])
+
+    def test_run_fail(self):
+        """Test stopping on exception"""
+        started = []
+
+        def _func(session, item):
+            started.append(item)
+            if item == 10:
+                raise ValueError('Failed')
+            return item
+
+        result = []
+        with self.assertRaises(ValueError):
+            for item, _ in run_parallel(None, _func, range(1000), 2):
+                result.append(item)
+        self.assertNotIn(10, result)
+        self.assertLess(len(started), 20)
+        self.assertEqual(sorted(result), sorted(i for i in started if i != 10))
+
+
+class TestReadChecksumFiles(TestCase):
+    """Tests for read_checksum_files()"""
+
+    @staticmethod
+    def _open(path, mode):
+        if 'missing' in path:
+            raise FileNotFoundError(path)
+        return io.BytesIO(b'd41d8cd98f00b204e9800998ecf8427e  obj\n')
+
+    def setUp(self):
+        self.irods = MagicMock()
+        self.irods.data_objects.open.side_effect = self._open
+        self.pool_patch = patch('apis.irods_utils.session_pool')
+        pool = self.pool_patch.start()
+        pool.get_clone.return_value = self.irods
+
+    def tearDown(self):
+        self.pool_patch.stop()
+
+    def test_read(self):
+        """Test reading checksum files"""
+        paths = [OBJ_PATH, OBJ_PATH2]
+        result = dict(read_checksum_files(self.irods, paths, 2))
+        self.assertEqual(
+            result,
+            {p: 'd41d8cd98f00b204e9800998ecf8427e' for p in paths},
+        )
+
+    def test_read_missing(self):
+        """Test reading a missing checksum file"""
+        paths = [OBJ_PATH, TEST_COLL + '/missing']
+        with self.assertRaises(ChecksumFileReadException) as cm:
+            list(read_checksum_files(self.irods, paths, 2))
+        self.assertEqual(cm.exception.path, TEST_COLL + '/missing.md5')
+
+
+class TestIrodsSessionPool(TestCase):
+    """Tests for IrodsSessionPool"""
+
+    @staticmethod
+    def _init_irods(test_mode=False, irods_kwargs=None):
+        irods = MagicMock()
+        irods.do_configure = dict(irods_kwargs)
+        return irods
+
+    def setUp(self):
+        self.init_patch = patch(
+            'apis.irods_utils.init_irods', side_effect=self._init_irods
+        )
+        self.init_irods = self.init_patch.start()
+        self.check_patch = patch('apis.irods_utils.check_irods')
+        self.check_irods = self.check_patch.start()
+        self.pool = IrodsSessionPool(size=2, idle_timeout=60)
+
+    def tearDown(self):
+        self.init_patch.stop()
+        self.check_patch.stop()
+
+    def test_get(self):
+        """Test borrowing a new session"""
+        irods = self.pool.get()
+        self.assertIsNotNone(irods)
+        self.assertEqual(
+            self.pool.get_stats(), {'hits': 0, 'misses': 1, 'idle': 0}
+        )
+
+    def test_get_released(self):
+        """Test borrowing a released session"""
+        irods = self.pool.get()
+        self.pool.release(irods)
+        self.assertEqual(self.pool.get_stats()['idle'], 1)
+        self.assertEqual(self.pool.get(), irods)
+        self.assertEqual(
+            self.pool.get_stats(), {'hits': 1, 'misses': 1, 'idle': 0}
+        )
+
+    def test_get_test_mode(self):
+        """Test borrowing sessions with different configurations"""
+        irods = self.pool.get()
+        self.pool.release(irods)
+        self.assertNotEqual(self.pool.get(test_mode=True), irods)
+
+    def test_get_clone(self):
+        """Test borrowing a session similar to an existing session"""
+        irods = self.pool.get()
+        self.pool.release(irods)
+        self.assertEqual(self.pool.get_clone(irods), irods)
+
+    def test_get_failed_check(self):
+        """Test borrowing with a failing connection check"""
+        irods = self.pool.get()
+        self.pool.release(irods)
+        self.check_irods.side_effect = Exception('Connection lost')
+        self.assertNotEqual(self.pool.get(), irods)
+        irods.cleanup.assert_called_once()
+        self.assertEqual(self.pool.get_stats()['misses'], 2)
+
+    def test_release_full(self):
+        """Test releasing sessions into a full pool"""
+        sessions = [self.pool.get() for _ in range(3)]
+        for irods in sessions:
+            self.pool.release(irods)
+        self.assertEqual(self.pool.get_stats()['idle'], 2)
+        sessions[2].cleanup.assert_called_once()
+
+    def test_evict(self):
+        """Test evicting idle sessions"""
+        self.pool.idle_timeout = -1
+        irods = self.pool.get()
+        self.pool.release(irods)
+        self.assertEqual(self.pool.get_stats()['idle'], 0)
+        irods.cleanup.assert_called_once()
+
+    def test_fork(self):
+        """Test dropping inherited sessions after fork"""
+        irods = self.pool.get()
+        self.pool.release(irods)
+        self.pool._pid = -1  # Simulate running in a forked process
+        self.assertNotEqual(self.pool.get(), irods)
+        irods.cleanup.assert_not_called()
+
+
+class TestCollectionCache(TestCase):
+    """Tests for CollectionCache"""
+
+    def setUp(self):
+        self.irods = MagicMock()
+        self.cache = CollectionCache()
+
+    def test_exists(self):
+        """Test checking an existing collection only once"""
+        self.irods.collections.exists.return_value = True
+        self.assertEqual(self.cache.exists(self.irods, TEST_COLL), True)
+        self.assertEqual(self.cache.exists(self.irods, TEST_COLL), True)
+        self.irods.collections.exists.assert_called_once_with(TEST_COLL)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_exists_missing(self):
+        """Test not caching a missing collection"""
+        self.irods.collections.exists.return_value = False
+        self.assertEqual(self.cache.exists(self.irods, TEST_COLL), False)
+        self.assertEqual(self.cache.exists(self.irods, TEST_COLL), False)
+        self.assertEqual(self.irods.collections.exists.call_count, 2)
+
+    def test_add(self):
+        """Test adding a created collection"""
+        self.cache.add(TEST_COLL)
+        self.assertEqual(self.cache.exists(self.irods, TEST_COLL), True)
+        self.irods.collections.exists.assert_not_called()
+
+    def test_remove(self):
+        """Test removing a collection and its subcollections"""
+        self.cache.add(TEST_COLL)
+        self.cache.add(SUBCOLL_PATH)
+        self.cache.add(TEST_COLL + '_other')
+        self.cache.remove(TEST_COLL)
+        self.irods.collections.exists.return_value = False
+        self.assertEqual(self.cache.exists(self.irods, TEST_COLL), False)
+        self.assertEqual(self.cache.exists(self.irods, SUBCOLL_PATH), False)
+        self.assertEqual(
+            self.cache.exists(self.irods, TEST_COLL + '_other'), True
+        )
+
+
+class TestGetExistingCollPaths(TestCase):
+    """Tests for get_existing_coll_paths()"""
+
+    def test_get(self):
+        """Test querying collections in batches"""
+        from irods.models import Collection
+
+        irods = MagicMock()
+        paths = [
+            '{}/coll{}'.format(TEST_COLL, i) for i in range(QUERY_IN_SIZE + 1)
+        ]
+        irods.query.return_value.filter.side_effect = [
+            [{Collection.name: paths[0]}],
+            [{Collection.name: paths[-1]}],
+        ]
+        self.assertEqual(
+            get_existing_coll_paths(irods, paths), {paths[0], paths[-1]}
+        )
+        self.assertEqual(irods.query.call_count, 2)
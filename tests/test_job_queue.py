@@ -0,0 +1,179 @@
+"""Tests for the async flow job queue and runner"""
+
+from concurrent.futures.process import BrokenProcessPool
+from unittest import TestCase
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import fakeredis
+
+from apis.job_queue import JobQueue
+from runner import Runner
+
+
+RUNNER_ID = 'runner1'
+RUNNER_ID2 = 'runner2'
+JOB_DATA = {
+    'form_data': {'flow_name': 'landing_zone_move'},
+    'sodar_url': 'http://0.0.0.0:8000',
+    'force_fail': False,
+    'test_mode': True,
+}
+
+
+class JobQueueTestBase(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.queue = JobQueue(
+            redis_client=self.redis, heartbeat_ttl=30, max_attempts=2
+        )
+
+
+class TestJobQueue(JobQueueTestBase):
+    """Tests for JobQueue"""
+
+    def test_enqueue(self):
+        """Test adding jobs"""
+        self.queue.enqueue(JOB_DATA)
+        self.queue.enqueue(JOB_DATA)
+        self.assertEqual(self.queue.get_depth(), 2)
+
+    def test_pop(self):
+        """Test receiving jobs in order"""
+        job_id = self.queue.enqueue(JOB_DATA)
+        job_id2 = self.queue.enqueue(JOB_DATA)
+        job = self.queue.pop(RUNNER_ID)
+        self.assertEqual(job['job_id'], job_id)
+        self.assertEqual(job['data'], JOB_DATA)
+        self.assertEqual(job['attempts'], 0)
+        self.assertEqual(self.queue.pop(RUNNER_ID)['job_id'], job_id2)
+        self.assertIsNone(self.queue.pop(RUNNER_ID, timeout=0.1))
+
+    def test_ack(self):
+        """Test acknowledging a job"""
+        self.queue.enqueue(JOB_DATA)
+        job = self.queue.pop(RUNNER_ID)
+        self.queue.ack(RUNNER_ID, job)
+        self.assertEqual(self.queue.get_depth(), 0)
+        self.assertEqual(self.queue.recover(), 0)
+
+    def test_recover(self):
+        """Test requeuing jobs of a dead runner"""
+        job_id = self.queue.enqueue(JOB_DATA)
+        self.queue.enqueue(JOB_DATA)
+        self.queue.heartbeat(RUNNER_ID)
+        self.queue.pop(RUNNER_ID)
+        self.assertEqual(self.queue.recover(), 0)  # Runner alive
+        self.redis.delete(self.queue._get_heartbeat_key(RUNNER_ID))
+        self.assertEqual(self.queue.recover(), 1)
+        self.assertEqual(self.queue.get_depth(), 2)
+        job = self.queue.pop(RUNNER_ID2)  # Requeued job is received first
+        self.assertEqual(job['job_id'], job_id)
+        self.assertEqual(job['attempts'], 1)
+
+    def test_retry_max_attempts(self):
+        """Test dropping a job after max attempts"""
+        self.queue.enqueue(JOB_DATA)
+        self.queue.retry(RUNNER_ID, self.queue.pop(RUNNER_ID))
+        self.assertEqual(self.queue.get_depth(), 1)
+        self.queue.retry(RUNNER_ID, self.queue.pop(RUNNER_ID))
+        self.assertEqual(self.queue.get_depth(), 0)
+        self.assertEqual(self.queue.recover(), 0)
+
+    def test_get_stats(self):
+        """Test get_stats()"""
+        self.queue.enqueue(JOB_DATA)
+        self.queue.heartbeat(RUNNER_ID)
+        self.assertEqual(
+            self.queue.get_stats(),
+            {
+                'pending': 1,
+                'runners': 1,
+                'workers': 0,
+                'running': 0,
+                'completed': 0,
+                'failed': 0,
+                'queue_wait_avg': 0.0,
+                'run_time_avg': 0.0,
+            },
+        )
+
+    def test_get_stats_runners(self):
+        """Test get_stats() with worker pool statistics of runners"""
+        self.queue.heartbeat(
+            RUNNER_ID,
+            {
+                'workers': 4,
+                'running': 1,
+                'completed': 1,
+                'failed': 0,
+                'queue_wait_avg': 1.0,
+                'run_time_avg': 4.0,
+            },
+        )
+        self.queue.heartbeat(
+            RUNNER_ID2,
+            {
+                'workers': 4,
+                'running': 2,
+                'completed': 3,
+                'failed': 1,
+                'queue_wait_avg': 3.0,
+                'run_time_avg': 8.0,
+            },
+        )
+        stats = self.queue.get_stats()
+        self.assertEqual(stats['runners'], 2)
+        self.assertEqual(stats['workers'], 8)
+        self.assertEqual(stats['running'], 3)
+        self.assertEqual(stats['completed'], 4)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['queue_wait_avg'], 2.5)
+        self.assertEqual(stats['run_time_avg'], 7.0)
+
+
+class TestRunner(JobQueueTestBase):
+    """Tests for Runner"""
+
+    def setUp(self):
+        super().setUp()
+        self.pool = MagicMock()
+        self.pool.has_capacity.return_value = True
+        self.pool.get_stats.return_value = {'workers': 1, 'running': 0}
+        self.runner = Runner(queue=self.queue, pool=self.pool)
+
+    def _get_callback(self):
+        return self.pool.submit.call_args[1]['callback']
+
+    def test_run_once(self):
+        """Test starting and acknowledging a job"""
+        self.queue.enqueue(JOB_DATA)
+        self.assertEqual(self.runner.run_once(timeout=0.1), True)
+        args = self.pool.submit.call_args[0]
+        self.assertEqual(args[2:], tuple(JOB_DATA.values()))
+        self._get_callback()(None)
+        self.assertEqual(self.queue.get_depth(), 0)
+        self.assertEqual(self.queue.recover(), 0)
+
+    def test_run_once_no_capacity(self):
+        """Test not starting a job without a free worker"""
+        self.pool.has_capacity.return_value = False
+        self.queue.enqueue(JOB_DATA)
+        self.assertEqual(self.runner.run_once(timeout=0.1), False)
+        self.assertEqual(self.queue.get_depth(), 1)
+
+    def test_drain(self):
+        """Test sending heartbeats while waiting for running jobs"""
+        type(self.pool).pending = PropertyMock(side_effect=[2, 1, 0])
+        with patch.object(self.queue, 'heartbeat') as mock_heartbeat:
+            self.runner.drain(interval=0)
+        self.assertEqual(mock_heartbeat.call_count, 2)
+        mock_heartbeat.assert_called_with(
+            self.runner.runner_id, {'workers': 1, 'running': 0}
+        )
+
+    def test_run_once_worker_crash(self):
+        """Test requeuing a job if the worker process crashed"""
+        self.queue.enqueue(JOB_DATA)
+        self.runner.run_once(timeout=0.1)
+        self._get_callback()(BrokenProcessPool())
+        self.assertEqual(self.queue.get_depth(), 1)
@@ -0,0 +1,228 @@
+"""Tests for the project lock API"""
+
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+
+from apis import lock_api
+from apis.lock_api import LockAcquireException, LockMetrics, LockQueue
+
+
+LOCK_ID = 'e4b3c1a2-0d7e-4f0b-9a51-3f5b8e2c6d10'
+
+
+class FakeLock:
+    """Lock with the blocking semantics of a Tooz lock"""
+
+    def __init__(self):
+        self.name = '_tooz_{}_lock'.format(LOCK_ID)
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking=True):
+        if isinstance(blocking, bool):
+            return self._lock.acquire(blocking)
+        return self._lock.acquire(timeout=blocking)
+
+    def release(self):
+        self._lock.release()
+        return True
+
+
+class LockTestBase(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.queue = LockQueue(redis_client=self.redis, waiter_ttl=10)
+
+
+class TestLockQueue(LockTestBase):
+    """Tests for LockQueue"""
+
+    def test_get_position(self):
+        """Test queue positions in order of joining"""
+        waiter_id = self.queue.join(LOCK_ID)
+        waiter_id2 = self.queue.join(LOCK_ID)
+        self.assertEqual(self.queue.get_position(LOCK_ID, waiter_id), 0)
+        self.assertEqual(self.queue.get_position(LOCK_ID, waiter_id2), 1)
+        self.assertEqual(self.queue.get_length(LOCK_ID), 2)
+
+    def test_leave(self):
+        """Test moving up in the queue when a waiter leaves"""
+        waiter_id = self.queue.join(LOCK_ID)
+        waiter_id2 = self.queue.join(LOCK_ID)
+        self.queue.leave(LOCK_ID, waiter_id)
+        self.assertEqual(self.queue.get_position(LOCK_ID, waiter_id2), 0)
+        self.assertEqual(self.queue.get_length(LOCK_ID), 1)
+
+    def test_get_position_expired(self):
+        """Test removing expired waiters from the queue"""
+        waiter_id = self.queue.join(LOCK_ID)
+        waiter_id2 = self.queue.join(LOCK_ID)
+        self.redis.delete(self.queue._get_waiter_key(waiter_id))
+        self.assertEqual(self.queue.get_position(LOCK_ID, waiter_id2), 0)
+        self.assertEqual(self.queue.get_length(LOCK_ID), 1)
+
+    def test_get_position_rejoin(self):
+        """Test rejoining the queue after expiring"""
+        waiter_id = self.queue.join(LOCK_ID)
+        waiter_id2 = self.queue.join(LOCK_ID)
+        self.redis.delete(self.queue._get_waiter_key(waiter_id))
+        self.assertEqual(self.queue.get_position(LOCK_ID, waiter_id), 1)
+        self.assertEqual(self.queue.get_position(LOCK_ID, waiter_id2), 0)
+
+
+class TestWaitAcquire(LockTestBase):
+    """Tests for wait_acquire()"""
+
+    def setUp(self):
+        super().setUp()
+        self.lock = FakeLock()
+
+    def test_acquire(self):
+        """Test acquiring a free lock"""
+        positions = []
+        self.assertEqual(
+            lock_api.wait_acquire(
+                self.lock, LOCK_ID, 1, self.queue, positions.append
+            ),
+            True,
+        )
+        self.assertEqual(positions, [0])
+        self.assertEqual(self.queue.get_length(LOCK_ID), 0)
+
+    def test_acquire_timeout(self):
+        """Test timing out while waiting in line"""
+        self.lock.acquire()
+        self.queue.join(LOCK_ID)  # Waiter ahead of us
+        with self.assertRaises(LockAcquireException) as cm:
+            lock_api.wait_acquire(self.lock, LOCK_ID, 0.3, self.queue)
+        self.assertEqual(cm.exception.position, 1)
+        self.assertEqual(self.queue.get_length(LOCK_ID), 1)
+
+    def test_acquire_fifo(self):
+        """Test acquiring lock in order of arrival"""
+        self.lock.acquire()
+        order = []
+
+        def wait(name):
+            lock_api.wait_acquire(self.lock, LOCK_ID, 5, self.queue)
+            order.append(name)
+            time.sleep(0.05)
+            self.lock.release()
+
+        threads = []
+        for i in range(3):
+            thread = threading.Thread(target=wait, args=(i,))
+            thread.start()
+            threads.append(thread)
+            while self.queue.get_length(LOCK_ID) < i + 1:
+                time.sleep(0.01)
+        self.lock.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [0, 1, 2])
+
+
+class TestLockMetrics(LockTestBase):
+    """Tests for lock metrics"""
+
+    def setUp(self):
+        super().setUp()
+        self.lock = FakeLock()
+        self.metrics = LockMetrics(redis_client=self.redis)
+
+    def test_acquire_release(self):
+        """Test recording wait and hold time"""
+        lock_api.acquire(
+            self.lock, flow_name='landing_zone_move', metrics=self.metrics
+        )
+        time.sleep(0.1)
+        lock_api.release(
+            self.lock, flow_name='landing_zone_move', metrics=self.metrics
+        )
+        stats = self.metrics.get_stats()
+        flow_stats = stats['flows']['landing_zone_move']
+        self.assertEqual(flow_stats['acquired'], 1)
+        self.assertEqual(flow_stats['failed'], 0)
+        self.assertEqual(flow_stats['retries'], 0)
+        self.assertEqual(flow_stats['released'], 1)
+        self.assertGreaterEqual(flow_stats['hold_time_max'], 0.1)
+        self.assertEqual(
+            flow_stats['hold_time_avg'], flow_stats['hold_time_max']
+        )
+        self.assertEqual(stats['projects'][0]['project_uuid'], LOCK_ID)
+
+    def test_acquire_fail(self):
+        """Test recording retries and failures"""
+        self.lock.acquire()
+        with self.assertRaises(LockAcquireException):
+            lock_api.acquire(
+                self.lock,
+                retry_count=2,
+                retry_interval=0.05,
+                flow_name='data_delete',
+                metrics=self.metrics,
+            )
+        flow_stats = self.metrics.get_stats()['flows']['data_delete']
+        self.assertEqual(flow_stats['acquired'], 0)
+        self.assertEqual(flow_stats['failed'], 1)
+        self.assertEqual(flow_stats['retries'], 2)
+        self.assertGreaterEqual(flow_stats['wait_time_max'], 0.1)
+
+    def test_wait_acquire(self):
+        """Test recording wait time when waiting in line"""
+        self.lock.acquire()
+        threading.Timer(0.2, self.lock.release).start()
+        lock_api.wait_acquire(
+            self.lock,
+            LOCK_ID,
+            5,
+            self.queue,
+            flow_name='data_delete',
+            metrics=self.metrics,
+        )
+        flow_stats = self.metrics.get_stats()['flows']['data_delete']
+        self.assertEqual(flow_stats['acquired'], 1)
+        self.assertGreaterEqual(flow_stats['wait_time'], 0.2)
+
+    def test_no_flow_name(self):
+        """Test not recording metrics without flow name"""
+        lock_api.acquire(self.lock, metrics=self.metrics)
+        lock_api.release(self.lock, metrics=self.metrics)
+        self.assertEqual(
+            self.metrics.get_stats(), {'flows': {}, 'projects': []}
+        )
+
+
+@patch('tooz.coordination.get_coordinator')
+class TestGetCoordinator(TestCase):
+    """Tests for get_coordinator()"""
+
+    def setUp(self):
+        lock_api._reset_coordinator()
+        self.addCleanup(lock_api._reset_coordinator)
+
+    def test_get(self, mock_get):
+        """Test reusing the coordinator of the process"""
+        coordinator = lock_api.get_coordinator()
+        self.assertEqual(lock_api.get_coordinator(), coordinator)
+        mock_get.assert_called_once()
+        coordinator.start.assert_called_once_with(start_heart=True)
+
+    def test_get_stopped(self, mock_get):
+        """Test recreating a stopped coordinator"""
+        mock_get.side_effect = [MagicMock(), MagicMock()]
+        coordinator = lock_api.get_coordinator()
+        lock_api.stop_coordinator()
+        coordinator.stop.assert_called_once()
+        self.assertNotEqual(lock_api.get_coordinator(), coordinator)
+
+    def test_get_fork(self, mock_get):
+        """Test recreating the coordinator after fork"""
+        mock_get.side_effect = [MagicMock(), MagicMock()]
+        coordinator = lock_api.get_coordinator()
+        lock_api._reset_coordinator()  # Called in child process after fork
+        self.assertNotEqual(lock_api.get_coordinator(), coordinator)
+        coordinator.stop.assert_not_called()
@@ -0,0 +1,129 @@
+"""Tests for the on-disk journal of batch tasks"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from apis.revert_journal import (
+    RevertJournal,
+    STATUS_DONE,
+    list_journals,
+    read_journal,
+)
+
+
+COLL_PATH = '/testZone/projects/00/00000000-0000-0000-0000-000000000000'
+HEADER = {'name': 'Move data objects', 'args': {'src_root': COLL_PATH}}
+
+
+class TestRevertJournal(TestCase):
+    """Tests for RevertJournal"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'flow', 'task.jsonl')
+
+    def _read_lines(self):
+        with open(self.path) as f:
+            return f.readlines()
+
+    def test_write(self):
+        """Test writing and reading records and status"""
+        journal = RevertJournal(self.path)
+        journal.open(HEADER)
+        journal.append('move', COLL_PATH + '/file1', 'null')
+        journal.append('move_coll', COLL_PATH + '/sample1')
+        journal.close(STATUS_DONE)
+        self.assertEqual(
+            read_journal(self.path),
+            {
+                'header': HEADER,
+                'records': [
+                    ['move', COLL_PATH + '/file1', 'null'],
+                    ['move_coll', COLL_PATH + '/sample1'],
+                ],
+                'status': STATUS_DONE,
+            },
+        )
+
+    def test_batch(self):
+        """Test writing records in batches"""
+        journal = RevertJournal(self.path, flush_count=3, fsync_interval=60)
+        journal.open(HEADER)
+        self.assertEqual(len(self._read_lines()), 1)  # Header is synced
+        for i in range(4):
+            journal.append('move', '{}/file{}'.format(COLL_PATH, i))
+        self.assertEqual(len(self._read_lines()), 4)
+        journal.flush()
+        self.assertEqual(len(self._read_lines()), 5)
+        journal.close()
+        self.assertIsNone(read_journal(self.path)['status'])
+
+    def test_continue(self):
+        """Test continuing an existing journal"""
+        journal = RevertJournal(self.path)
+        journal.open(HEADER)
+        journal.append('move', COLL_PATH + '/file1')
+        journal.close()
+        journal = RevertJournal(self.path)
+        journal.open()
+        journal.append('move', COLL_PATH + '/file2')
+        journal.close()
+        data = read_journal(self.path)
+        self.assertEqual(data['header'], HEADER)
+        self.assertEqual(len(data['records']), 2)
+
+    def test_read_partial(self):
+        """Test ignoring a partially written last line"""
+        journal = RevertJournal(self.path)
+        journal.open(HEADER)
+        journal.append('move', COLL_PATH + '/file1')
+        journal.close()
+        with open(self.path, 'a') as f:
+            f.write('["move","{}/fi'.format(COLL_PATH))
+        self.assertEqual(
+            read_journal(self.path)['records'],
+            [['move', COLL_PATH + '/file1']],
+        )
+
+    def test_continue_partial(self):
+        """Test continuing a journal with a partially written last line"""
+        journal = RevertJournal(self.path)
+        journal.open(HEADER)
+        journal.append('move', COLL_PATH + '/file1')
+        journal.close()
+        with open(self.path, 'a') as f:
+            f.write('["move","{}/fi'.format(COLL_PATH))
+        journal = RevertJournal(self.path)
+        journal.open()
+        journal.append('move', COLL_PATH + '/file2')
+        journal.close(STATUS_DONE)
+        self.assertEqual(len(self._read_lines()), 4)
+        data = read_journal(self.path)
+        self.assertEqual(
+            data['records'],
+            [['move', COLL_PATH + '/file1'], ['move', COLL_PATH + '/file2']],
+        )
+        self.assertEqual(data['status'], STATUS_DONE)
+
+    def test_read_partial_middle(self):
+        """Test reading records after a partially written line"""
+        journal = RevertJournal(self.path)
+        journal.open(HEADER)
+        journal.close()
+        with open(self.path, 'a') as f:
+            f.write('["move","{}/fi\n'.format(COLL_PATH))
+            f.write('["move","{}/file2"]\n'.format(COLL_PATH))
+        self.assertEqual(
+            read_journal(self.path)['records'],
+            [['move', COLL_PATH + '/file2']],
+        )
+
+    def test_list(self):
+        """Test listing journals in flow subdirectories"""
+        journal = RevertJournal(self.path)
+        journal.open(HEADER)
+        journal.close()
+        self.assertEqual(list_journals(self.tmp_dir.name), [self.path])
+        self.assertEqual(list_journals(self.path + '_none'), [])
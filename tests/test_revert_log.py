@@ -0,0 +1,59 @@
+"""Tests for the compact revert log of batch tasks"""
+
+import json
+from unittest import TestCase
+
+from apis.revert_log import RevertLog
+from tasks.base_task import BaseTask
+
+
+COLL_PATH = '/testZone/projects/00/00000000-0000-0000-0000-000000000000'
+RECORDS = [
+    (COLL_PATH + '/sample1/file1.fastq', 'null'),
+    (COLL_PATH + '/sample1/file1.fastq.md5', None),
+    (COLL_PATH + '/sample2/file2.fastq', 'read'),
+    (COLL_PATH + '/sample1/file3_ä.fastq', 'own'),
+    (COLL_PATH + '/sample2', 'write'),
+]
+
+
+class TestRevertLog(TestCase):
+    """Tests for RevertLog"""
+
+    def setUp(self):
+        self.log = RevertLog(RECORDS)
+
+    def test_iter(self):
+        """Test iterating records in order"""
+        self.assertEqual(len(self.log), len(RECORDS))
+        self.assertEqual(list(self.log), RECORDS)
+        self.assertEqual(list(reversed(self.log)), RECORDS[::-1])
+        self.assertEqual(self.log[-1], RECORDS[-1])
+        self.assertEqual(self.log.get_paths(), [r[0] for r in RECORDS])
+
+    def test_colls(self):
+        """Test storing parent collections once"""
+        self.assertEqual(len(self.log._colls), 3)
+
+    def test_append_invalid_access(self):
+        """Test appending with unknown access"""
+        with self.assertRaises(KeyError):
+            self.log.append(COLL_PATH + '/file', 'read object')
+
+    def test_to_dict(self):
+        """Test restoring from serialized log"""
+        data = json.loads(json.dumps(self.log.to_dict()))
+        log = RevertLog.from_dict(data)
+        self.assertEqual(log, self.log)
+        log.append(COLL_PATH + '/sample1/file4.fastq', 'null')
+        self.assertEqual(len(log._colls), 3)
+
+    def test_task_state(self):
+        """Test persisting revert log in task state"""
+        task = BaseTask(name='Test task')
+        task.execute_data = {'moved_objects': self.log, 'moved_colls': []}
+        state = json.loads(json.dumps(task.get_state()))
+        task = BaseTask(name='Test task')
+        task.set_state(state)
+        self.assertEqual(task.execute_data['moved_objects'], self.log)
+        self.assertEqual(task.execute_data['moved_colls'], [])
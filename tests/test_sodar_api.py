@@ -0,0 +1,243 @@
+"""Tests for the SODAR API"""
+
+import pickle
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from apis import sodar_api
+from apis.sodar_api import (
+    ProgressReporter,
+    SODARAPI,
+    SODARRequestException,
+    format_size,
+    get_session,
+)
+
+
+SODAR_URL = 'http://0.0.0.0:8000'
+ZONE_STATUS_URL = 'landingzones/taskflow/status/set'
+ZONE_UUID = '00000000-0000-0000-0000-000000000001'
+ZONE_UUID2 = '00000000-0000-0000-0000-000000000002'
+
+
+class TestGetSession(TestCase):
+    """Tests for get_session()"""
+
+    def test_get(self):
+        """Test getting the same session in the same process"""
+        self.assertEqual(get_session(), get_session())
+
+    def test_get_fork(self):
+        """Test getting a new session after fork"""
+        session = get_session()
+        sodar_api._session_pid = -1  # Simulate running in a forked process
+        self.assertNotEqual(get_session(), session)
+
+
+class TestSODARAPI(TestCase):
+    """Tests for SODARAPI"""
+
+    def setUp(self):
+        self.sodar_api = SODARAPI(SODAR_URL, timeout=5)
+
+    @patch('requests.Session.post')
+    def test_send_request(self, mock_post):
+        """Test sending a request"""
+        mock_post.return_value.status_code = 200
+        self.sodar_api.send_request(ZONE_STATUS_URL, {'status': 'MOVING'})
+        mock_post.assert_called_once()
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args[0], SODAR_URL + '/' + ZONE_STATUS_URL)
+        self.assertEqual(kwargs['timeout'], 5)
+        self.assertEqual(kwargs['data']['status'], 'MOVING')
+
+    @patch('requests.Session.post')
+    def test_send_request_error(self, mock_post):
+        """Test sending a request with an error response"""
+        mock_post.return_value.status_code = 500
+        with self.assertRaises(SODARRequestException):
+            self.sodar_api.send_request(ZONE_STATUS_URL, {})
+
+
+@patch('apis.sodar_api.SODARAPI.send_request')
+class TestStatusOutbox(TestCase):
+    """Tests for StatusOutbox"""
+
+    def setUp(self):
+        self.sodar_api = SODARAPI(SODAR_URL, status_window=0.2)
+
+    def _get_sent(self, mock_send):
+        return [
+            (c[0][0], c[0][1]['zone_uuid'], c[0][1]['status'])
+            for c in mock_send.call_args_list
+        ]
+
+    def test_coalesce(self, mock_send):
+        """Test coalescing updates for the same zone"""
+        self.sodar_api.set_zone_status(ZONE_UUID, 'PREPARING', 'Preparing')
+        self.sodar_api.set_zone_status(ZONE_UUID, 'VALIDATING', 'Validating')
+        self.sodar_api.flush_status()
+        self.assertEqual(
+            self._get_sent(mock_send),
+            [(ZONE_STATUS_URL, ZONE_UUID, 'VALIDATING')],
+        )
+
+    def test_order(self, mock_send):
+        """Test ordering of updates for multiple zones"""
+        self.sodar_api.set_zone_status(ZONE_UUID, 'PREPARING', 'Preparing')
+        self.sodar_api.set_zone_status(ZONE_UUID2, 'PREPARING', 'Preparing')
+        self.sodar_api.set_zone_status(ZONE_UUID, 'MOVING', 'Moving')
+        self.sodar_api.flush_status()
+        self.assertEqual(
+            self._get_sent(mock_send),
+            [
+                (ZONE_STATUS_URL, ZONE_UUID, 'MOVING'),
+                (ZONE_STATUS_URL, ZONE_UUID2, 'PREPARING'),
+            ],
+        )
+
+    def test_flush_batches(self, mock_send):
+        """Test updates queued after a flush are sent separately"""
+        self.sodar_api.set_zone_status(ZONE_UUID, 'VALIDATING', 'Validating')
+        self.sodar_api.flush_status()
+        self.sodar_api.set_zone_status(ZONE_UUID, 'FAILED', 'Failed')
+        self.sodar_api.flush_status()
+        self.assertEqual(
+            self._get_sent(mock_send),
+            [
+                (ZONE_STATUS_URL, ZONE_UUID, 'VALIDATING'),
+                (ZONE_STATUS_URL, ZONE_UUID, 'FAILED'),
+            ],
+        )
+
+    def test_flush_empty(self, mock_send):
+        """Test flushing without queued updates"""
+        self.sodar_api.flush_status()
+        mock_send.assert_not_called()
+
+    def test_send_error(self, mock_send):
+        """Test error in sending an update"""
+        mock_send.side_effect = SODARRequestException('Error')
+        self.sodar_api.set_zone_status(ZONE_UUID, 'FAILED', 'Failed')
+        with self.assertRaises(SODARRequestException):
+            self.sodar_api.flush_status()
+        self.assertEqual(mock_send.call_count, 1)
+        self.assertEqual(len(self.sodar_api.status_outbox.errors), 0)
+        self.sodar_api.flush_status()  # Errors are raised once
+
+    def test_send_error_replaced(self, mock_send):
+        """Test error cleared by a later update sent for the same zone"""
+        mock_send.side_effect = [SODARRequestException('Error'), None]
+        outbox = self.sodar_api.status_outbox
+        self.sodar_api.set_zone_status(ZONE_UUID, 'MOVING', 'Moving')
+        while mock_send.call_count < 1 or outbox._sending:
+            time.sleep(0.01)
+        self.assertEqual(len(outbox.errors), 1)
+        self.sodar_api.set_zone_status(ZONE_UUID, 'ACTIVE', 'Active')
+        self.sodar_api.flush_status()
+        self.assertEqual(mock_send.call_count, 2)
+
+    def test_check(self, mock_send):
+        """Test raising send errors on check without flushing"""
+        mock_send.side_effect = SODARRequestException('Error')
+        outbox = self.sodar_api.status_outbox
+        self.sodar_api.check_status()  # No-op before the first update
+        self.sodar_api.set_zone_status(ZONE_UUID, 'MOVING', 'Moving')
+        self.sodar_api.check_status()  # Not sent yet
+        while mock_send.call_count < 1 or outbox._sending:
+            time.sleep(0.01)
+        with self.assertRaises(SODARRequestException):
+            self.sodar_api.check_status()
+        self.sodar_api.flush_status()  # Errors are raised once
+
+    def test_thread_exit(self, mock_send):
+        """Test sender threads exiting once updates have been sent"""
+        thread_count = threading.active_count()
+        apis = [SODARAPI(SODAR_URL, status_window=0.01) for _ in range(20)]
+        threads = []
+        for api in apis:
+            api.set_zone_status(ZONE_UUID, 'ACTIVE', 'Active')
+            threads.append(api.status_outbox._thread)
+            api.flush_status()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(threading.active_count(), thread_count)
+        self.assertEqual(mock_send.call_count, 20)
+        # Thread is restarted by the next update
+        apis[0].set_zone_status(ZONE_UUID, 'MOVING', 'Moving')
+        apis[0].flush_status()
+        self.assertEqual(mock_send.call_count, 21)
+
+    def test_no_window(self, mock_send):
+        """Test sending immediately with the window disabled"""
+        sodar_api = SODARAPI(SODAR_URL, status_window=0)
+        sodar_api.set_zone_status(ZONE_UUID, 'ACTIVE', 'Active')
+        mock_send.assert_called_once()
+
+    def test_pickle(self, mock_send):
+        """Test pickling SODARAPI with a running outbox"""
+        self.sodar_api.set_zone_status(ZONE_UUID, 'ACTIVE', 'Active')
+        self.sodar_api.flush_status()
+        sodar_api = pickle.loads(pickle.dumps(self.sodar_api))
+        self.assertIsNone(sodar_api.status_outbox._pid)
+        self.assertEqual(sodar_api.status_outbox.window, 0.2)
+
+
+class TestProgressReporter(TestCase):
+    """Tests for ProgressReporter"""
+
+    def setUp(self):
+        self.sodar_api = MagicMock()
+        self.paths = ['/zone/file{}'.format(i) for i in range(10)]
+        self.progress = ProgressReporter(
+            sodar_api=self.sodar_api,
+            zone_uuid=ZONE_UUID,
+            status='MOVING',
+            status_info='Moving',
+            total=len(self.paths),
+            sizes={p: 1024 for p in self.paths},
+            interval_count=4,
+            interval_time=60,
+        )
+
+    def test_update_count(self):
+        """Test reporting every N files"""
+        for path in self.paths:
+            self.progress.update(path)
+        self.assertEqual(self.sodar_api.set_zone_status.call_count, 2)
+        kwargs = self.sodar_api.set_zone_status.call_args[1]
+        self.assertEqual(kwargs['zone_uuid'], ZONE_UUID)
+        self.assertEqual(kwargs['status'], 'MOVING')
+        self.assertTrue(
+            kwargs['status_info'].startswith(
+                'Moving (8/10 files, 8.0 KB/10.0 KB'
+            )
+        )
+
+    def test_update_time(self):
+        """Test reporting every T seconds"""
+        self.progress.interval_count = 1000
+        self.progress.interval_time = 0
+        self.progress.update(self.paths[0])
+        self.assertEqual(self.sodar_api.set_zone_status.call_count, 1)
+
+    def test_start(self):
+        """Test resetting counters"""
+        self.progress.update(self.paths[0])
+        self.progress.start()
+        self.assertEqual(self.progress.count, 0)
+        self.assertEqual(self.progress.bytes, 0)
+
+    def test_report_error(self):
+        """Test error in reporting is not raised"""
+        self.sodar_api.set_zone_status.side_effect = SODARRequestException()
+        self.progress.report()
+
+    def test_format_size(self):
+        """Test format_size()"""
+        self.assertEqual(format_size(512), '512 B')
+        self.assertEqual(format_size(1536), '1.5 KB')
+        self.assertEqual(format_size(3 * 1024**3), '3.0 GB')
+        self.assertEqual(format_size(2 * 1024**5), '2048.0 TB')
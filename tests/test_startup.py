@@ -0,0 +1,46 @@
+"""Tests for sodar_taskflow startup imports"""
+
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+
+# Modules which should only be imported when running flows
+DEFERRED_MODULES = [
+    'irods',
+    'networkx',
+    'redis',
+    'requests',
+    'taskflow',
+    'tasks',
+    'tooz',
+]
+
+
+class TestStartupImports(TestCase):
+    """Tests for deferred imports on startup"""
+
+    def _get_modules(self, preload):
+        env = dict(os.environ, TASKFLOW_PRELOAD=preload)
+        out = subprocess.run(
+            [
+                sys.executable,
+                '-c',
+                'import sys, sodar_taskflow; print(" ".join(sys.modules))',
+            ],
+            stdout=subprocess.PIPE,
+            check=True,
+            env=env,
+        ).stdout
+        return set(m.split('.')[0] for m in out.decode().split())
+
+    def test_import(self):
+        """Test importing sodar_taskflow without flow dependencies"""
+        modules = self._get_modules('0')
+        self.assertEqual(modules & set(DEFERRED_MODULES), set())
+
+    def test_import_preload(self):
+        """Test importing sodar_taskflow with preload"""
+        modules = self._get_modules('1')
+        self.assertEqual(modules & set(DEFERRED_MODULES), set(DEFERRED_MODULES))
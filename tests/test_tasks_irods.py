@@ -2,6 +2,10 @@
 
 # TODO: Add tests for batch tasks
 
+from concurrent.futures import wait
+import os
+import tempfile
+import threading
 import uuid
 
 # from irods.access import iRODSAccess
@@ -20,8 +24,10 @@ from irods.meta import iRODSMeta
 from irods.user import iRODSUser, iRODSUserGroup
 
 from unittest import TestCase
+from unittest.mock import MagicMock, patch
 
 from apis.irods_utils import init_irods, cleanup_irods_data
+from apis.revert_journal import read_journal
 from config import settings
 from flows.base_flow import BaseLinearFlow
 from tasks.irods_tasks import *  # noqa
@@ -1767,7 +1773,71 @@ class TestMoveDataObjectTask(IRODSTestBase):
         self.assertEqual(new_obj.checksum, new_obj2.checksum)
 
 
-# TODO: Test Checksum verifying
+class TestBatchValidateChecksumsTask(IRODSTestBase):
+    def setUp(self):
+        super().setUp()
+        self.src_coll = self.irods.collections.create(BATCH_SRC_PATH)
+        self.paths = [BATCH_OBJ_PATH, BATCH_OBJ2_PATH]
+        for path in self.paths:
+            with self.irods.data_objects.open(path, 'w') as obj_file:
+                obj_file.write(path.encode('utf-8'))
+            checksum = self.irods.data_objects.chksum(path)
+            with self.irods.data_objects.open(path + '.md5', 'w') as md5_file:
+                md5_file.write('{}  {}'.format(checksum, path).encode('utf-8'))
+
+    def _add_validate_task(self, concurrency):
+        self._add_task(
+            cls=BatchValidateChecksumsTask,
+            name='Validate checksums',
+            inject={
+                'paths': self.paths,
+                'zone_path': BATCH_SRC_PATH,
+                'concurrency': concurrency,
+            },
+        )
+
+    def test_execute(self):
+        """Test validating checksums"""
+        self._add_validate_task(concurrency=1)
+        self.assertEqual(self._run_flow(), True)
+
+    def test_execute_parallel(self):
+        """Test validating checksums with parallel workers"""
+        self._add_validate_task(concurrency=2)
+        self.assertEqual(self._run_flow(), True)
+
+    def test_execute_progress(self):
+        """Test validating checksums with progress reporting"""
+        progress = MagicMock()
+        self.flow.add_task(
+            BatchValidateChecksumsTask(
+                name='Validate checksums',
+                irods=self.irods,
+                verbose=False,
+                progress=progress,
+                inject={'paths': self.paths, 'zone_path': BATCH_SRC_PATH},
+            )
+        )
+        self.assertEqual(self._run_flow(), True)
+        progress.start.assert_called_once()
+        self.assertEqual(progress.update.call_count, len(self.paths))
+
+    def test_execute_mismatch(self):
+        """Test validating checksums with a mismatching checksum file"""
+        with self.irods.data_objects.open(
+            BATCH_OBJ2_PATH + '.md5', 'w'
+        ) as md5_file:
+            md5_file.write(b'0' * 32)
+        self._add_validate_task(concurrency=2)
+        with self.assertRaises(Exception):
+            self._run_flow()
+
+    def test_execute_missing(self):
+        """Test validating checksums with a missing checksum file"""
+        self.irods.data_objects.unlink(BATCH_OBJ_PATH + '.md5', force=True)
+        self._add_validate_task(concurrency=2)
+        with self.assertRaises(Exception):
+            self._run_flow()
 
 
 class TestBatchCreateCollectionsTask(IRODSTestBase):
@@ -1991,6 +2061,84 @@ class TestBatchCreateCollectionsTask(IRODSTestBase):
         )
 
 
+class TestCreateCollectionTreeTask(IRODSTestBase):
+    def setUp(self):
+        super().setUp()
+        self.paths = [
+            TEST_COLL_NEW + '/subcoll1/subcoll1a',
+            TEST_COLL_NEW + '/subcoll1/subcoll1b',
+            TEST_COLL_NEW + '/subcoll2',
+        ]
+
+    def test_execute(self):
+        """Test collection tree creation"""
+        task = CreateCollectionTreeTask(
+            name='Create collections',
+            irods=self.irods,
+            verbose=False,
+            inject={'paths': self.paths},
+        )
+        self.flow.add_task(task)
+
+        result = self._run_flow()
+
+        self.assertEqual(result, True)
+        for path in self.paths:
+            self.assertIsInstance(
+                self.irods.collections.get(path), iRODSCollection
+            )
+        self.assertEqual(
+            task.execute_data['created_colls'],
+            [
+                TEST_COLL_NEW,
+                TEST_COLL_NEW + '/subcoll1',
+                TEST_COLL_NEW + '/subcoll2',
+            ]
+            + self.paths[:2],
+        )
+
+    def test_execute_existing(self):
+        """Test collection tree creation with existing collections"""
+        self.irods.collections.create(TEST_COLL_NEW + '/subcoll1')
+        task = CreateCollectionTreeTask(
+            name='Create collections',
+            irods=self.irods,
+            verbose=False,
+            inject={'paths': self.paths},
+        )
+        self.flow.add_task(task)
+
+        result = self._run_flow()
+
+        self.assertEqual(result, True)
+        self.assertEqual(
+            task.execute_data['created_colls'],
+            [TEST_COLL_NEW + '/subcoll2'] + self.paths[:2],
+        )
+
+    def test_revert(self):
+        """Test collection tree creation reverting"""
+        self.irods.collections.create(TEST_COLL_NEW + '/subcoll1')
+        self._add_task(
+            cls=CreateCollectionTreeTask,
+            name='Create collections',
+            inject={'paths': self.paths},
+            force_fail=True,
+        )  # FAIL
+
+        result = self._run_flow()
+
+        self.assertNotEqual(result, True)
+        self.assertIsInstance(
+            self.irods.collections.get(TEST_COLL_NEW + '/subcoll1'),
+            iRODSCollection,
+        )
+        for path in self.paths:
+            self.assertRaises(
+                CollectionDoesNotExist, self.irods.collections.get, path
+            )
+
+
 class TestBatchMoveDataObjectsTask(IRODSTestBase):
     def setUp(self):
         super().setUp()
@@ -2136,6 +2284,180 @@ class TestBatchMoveDataObjectsTask(IRODSTestBase):
         )
         self.assertIsNone(obj_access)
 
+    def test_execute_concurrency(self):
+        """Test moving data objects in parallel"""
+        self._add_task(
+            cls=BatchMoveDataObjectsTask,
+            name='Move data objects',
+            inject={
+                'src_root': BATCH_SRC_PATH,
+                'dest_root': BATCH_DEST_PATH,
+                'src_paths': [BATCH_OBJ_PATH, BATCH_OBJ2_PATH],
+                'access_name': TEST_ACCESS_READ_IN,
+                'user_name': DEFAULT_USER_GROUP,
+                'concurrency': 2,
+            },
+        )
+
+        result = self._run_flow()
+
+        self.assertEqual(result, True)
+        for obj_name in ['batch_obj', 'batch_obj2']:
+            obj_access = self._get_user_access(
+                target=self.irods.data_objects.get(
+                    '{}/{}'.format(BATCH_DEST_PATH, obj_name)
+                ),
+                user_name=DEFAULT_USER_GROUP,
+            )
+            self.assertEqual(obj_access.access_name, TEST_ACCESS_READ_OUT)
+
+    def test_execute_existing_access(self):
+        """Test moving data objects with existing access"""
+        acl = iRODSAccess(
+            access_name=TEST_ACCESS_READ_IN,
+            path=BATCH_OBJ_PATH,
+            user_name=DEFAULT_USER_GROUP,
+            user_zone=self.irods.zone,
+        )
+        self.irods.permissions.set(acl, recursive=False)
+        task = BatchMoveDataObjectsTask(
+            name='Move data objects',
+            irods=self.irods,
+            verbose=False,
+            inject={
+                'src_root': BATCH_SRC_PATH,
+                'dest_root': BATCH_DEST_PATH,
+                'src_paths': [BATCH_OBJ_PATH, BATCH_OBJ2_PATH],
+                'access_name': TEST_ACCESS_READ_IN,
+                'user_name': DEFAULT_USER_GROUP,
+            },
+        )
+        self.flow.add_task(task)
+
+        result = self._run_flow()
+
+        self.assertEqual(result, True)
+        self.assertEqual(
+            list(task.execute_data['moved_objects']),
+            [(BATCH_OBJ_PATH, None), (BATCH_OBJ2_PATH, TEST_ACCESS_NULL)],
+        )
+        for obj_name in ['batch_obj', 'batch_obj2']:
+            obj_access = self._get_user_access(
+                target=self.irods.data_objects.get(
+                    '{}/{}'.format(BATCH_DEST_PATH, obj_name)
+                ),
+                user_name=DEFAULT_USER_GROUP,
+            )
+            self.assertEqual(obj_access.access_name, TEST_ACCESS_READ_OUT)
+
+    def test_revert_existing_access(self):
+        """Test reverting the moving of data objects with existing access"""
+        acl = iRODSAccess(
+            access_name=TEST_ACCESS_READ_IN,
+            path=BATCH_OBJ_PATH,
+            user_name=DEFAULT_USER_GROUP,
+            user_zone=self.irods.zone,
+        )
+        self.irods.permissions.set(acl, recursive=False)
+        self._add_task(
+            cls=BatchMoveDataObjectsTask,
+            name='Move data objects',
+            inject={
+                'src_root': BATCH_SRC_PATH,
+                'dest_root': BATCH_DEST_PATH,
+                'src_paths': [BATCH_OBJ_PATH, BATCH_OBJ2_PATH],
+                'access_name': TEST_ACCESS_READ_IN,
+                'user_name': DEFAULT_USER_GROUP,
+            },
+            force_fail=True,
+        )  # FAILS
+
+        result = self._run_flow()
+
+        self.assertNotEqual(result, True)
+        obj_access = self._get_user_access(
+            target=self.irods.data_objects.get(BATCH_OBJ_PATH),
+            user_name=DEFAULT_USER_GROUP,
+        )
+        self.assertEqual(obj_access.access_name, TEST_ACCESS_READ_OUT)
+        obj_access = self._get_user_access(
+            target=self.irods.data_objects.get(BATCH_OBJ2_PATH),
+            user_name=DEFAULT_USER_GROUP,
+        )
+        self.assertIsNone(obj_access)
+
+    def test_execute_coll(self):
+        """Test moving a collection as a whole"""
+        sub_coll_path = BATCH_SRC_PATH + '/sub_coll'
+        sub_obj_path = sub_coll_path + '/sub_obj'
+        self.irods.collections.create(sub_coll_path)
+        self.irods.data_objects.create(sub_obj_path)
+        task = BatchMoveDataObjectsTask(
+            name='Move data objects',
+            irods=self.irods,
+            verbose=False,
+            inject={
+                'src_root': BATCH_SRC_PATH,
+                'dest_root': BATCH_DEST_PATH,
+                'src_paths': [BATCH_OBJ_PATH, BATCH_OBJ2_PATH, sub_obj_path],
+                'access_name': TEST_ACCESS_READ_IN,
+                'user_name': DEFAULT_USER_GROUP,
+                'src_colls': [sub_coll_path],
+            },
+        )
+        self.flow.add_task(task)
+
+        result = self._run_flow()
+
+        self.assertEqual(result, True)
+        self.assertEqual(task.execute_data['moved_colls'], [sub_coll_path])
+        self.assertEqual(len(task.execute_data['moved_objects']), 2)
+        self.assertFalse(self.irods.collections.exists(sub_coll_path))
+        obj_access = self._get_user_access(
+            target=self.irods.data_objects.get(
+                BATCH_DEST_PATH + '/sub_coll/sub_obj'
+            ),
+            user_name=DEFAULT_USER_GROUP,
+        )
+        self.assertEqual(obj_access.access_name, TEST_ACCESS_READ_OUT)
+
+    def test_revert_coll(self):
+        """Test reverting the moving of a collection as a whole"""
+        sub_coll_path = BATCH_SRC_PATH + '/sub_coll'
+        sub_obj_path = sub_coll_path + '/sub_obj'
+        self.irods.collections.create(sub_coll_path)
+        self.irods.data_objects.create(sub_obj_path)
+        self._add_task(
+            cls=BatchMoveDataObjectsTask,
+            name='Move data objects',
+            inject={
+                'src_root': BATCH_SRC_PATH,
+                'dest_root': BATCH_DEST_PATH,
+                'src_paths': [BATCH_OBJ_PATH, BATCH_OBJ2_PATH, sub_obj_path],
+                'access_name': TEST_ACCESS_READ_IN,
+                'user_name': DEFAULT_USER_GROUP,
+                'src_colls': [sub_coll_path],
+            },
+            force_fail=True,
+        )  # FAILS
+
+        result = self._run_flow()
+
+        self.assertNotEqual(result, True)
+        self.assertFalse(
+            self.irods.collections.exists(BATCH_DEST_PATH + '/sub_coll')
+        )
+        obj_access = self._get_user_access(
+            target=self.irods.data_objects.get(sub_obj_path),
+            user_name=DEFAULT_USER_GROUP,
+        )
+        self.assertIsNone(obj_access)
+        coll_access = self._get_user_access(
+            target=self.irods.collections.get(sub_coll_path),
+            user_name=DEFAULT_USER_GROUP,
+        )
+        self.assertIsNone(coll_access)
+
     def test_overwrite_failure(self):
         """Test moving data objects when a similarly named file exists"""
         new_obj_path = BATCH_DEST_PATH + '/batch_obj2'
@@ -2180,3 +2502,347 @@ class TestBatchMoveDataObjectsTask(IRODSTestBase):
 
         existing_obj = self.irods.data_objects.get(new_obj_path)
         self.assertEqual(new_obj.checksum, existing_obj.checksum)
+
+
+@patch('apis.irods_utils.session_pool')
+class TestBatchMoveDataObjectsTaskParallel(TestCase):
+    """Tests for parallel moves in BatchMoveDataObjectsTask without iRODS"""
+
+    def setUp(self):
+        self.irods = MagicMock(zone='testZone')
+        self.src_paths = [
+            '{}/obj{}'.format(BATCH_SRC_PATH, i) for i in range(50)
+        ]
+        self.fail_path = self.src_paths[20]
+        # Moves of wait_paths wait until the failure has been noticed
+        self.wait_paths = set()
+        self.fail_event = threading.Event()
+        self.session_moves = []
+
+    def _get_clone(self, irods):
+        session = MagicMock(zone='testZone')
+
+        def _move(src_path, dest_path):
+            if src_path == self.fail_path:
+                raise Exception('Move failed')
+            if src_path in self.wait_paths:
+                self.assertTrue(self.fail_event.wait(timeout=30))
+            self.session_moves.append(src_path)
+
+        session.data_objects.move.side_effect = _move
+        return session
+
+    def _get_task(self):
+        return BatchMoveDataObjectsTask(
+            name='Move data objects', irods=self.irods, verbose=False
+        )
+
+    def _wait(self, futures, **kwargs):
+        """Wait for futures, releasing waiting moves once a move has failed"""
+        done, not_done = wait(futures, **kwargs)
+        if any(f.exception() for f in done):
+            self.fail_event.set()
+        return done, not_done
+
+    @patch('tasks.irods_tasks.get_subcoll_obj_access', return_value={})
+    def test_execute_fail(self, mock_access, mock_pool):
+        """Test recording exactly the moved objects on failure"""
+        mock_pool.get_clone.side_effect = self._get_clone
+        self.wait_paths = set(self.src_paths[21:])
+        task = self._get_task()
+        with patch('apis.irods_utils.wait', side_effect=self._wait):
+            with self.assertRaises(Exception):
+                task.execute(
+                    BATCH_SRC_PATH,
+                    BATCH_DEST_PATH,
+                    self.src_paths,
+                    TEST_ACCESS_READ_IN,
+                    DEFAULT_USER_GROUP,
+                    concurrency=4,
+                )
+        self.assertTrue(self.fail_event.is_set())
+        moved = [p for p, _ in task.execute_data['moved_objects']]
+        self.assertEqual(sorted(moved), sorted(self.session_moves))
+        self.assertNotIn(self.fail_path, moved)
+        # Moves started before the failure are completed, no more are started
+        self.assertTrue(set(self.src_paths[:20]).issubset(moved))
+        self.assertLessEqual(len(moved), 20 + 4 * 2)
+        self.assertEqual(
+            mock_pool.release.call_count, mock_pool.get_clone.call_count
+        )
+
+        task.revert(
+            BATCH_SRC_PATH,
+            BATCH_DEST_PATH,
+            TEST_ACCESS_READ_IN,
+            DEFAULT_USER_GROUP,
+        )
+        reverted = [
+            c[1]['src_path'].replace(BATCH_DEST_PATH, BATCH_SRC_PATH)
+            for c in self.irods.data_objects.move.call_args_list
+        ]
+        self.assertEqual(sorted(reverted), sorted(moved))
+
+    @patch(
+        'tasks.irods_tasks.get_subcoll_obj_access',
+        return_value={
+            BATCH_SRC_PATH + '/obj0': {DEFAULT_USER_GROUP: 'read object'}
+        },
+    )
+    def test_execute_access(self, mock_access, mock_pool):
+        """Test setting access only for objects which need it"""
+        mock_pool.get_clone.side_effect = self._get_clone
+        self.fail_path = None
+        task = self._get_task()
+        task.execute(
+            BATCH_SRC_PATH,
+            BATCH_DEST_PATH,
+            self.src_paths[:3],
+            TEST_ACCESS_READ_IN,
+            DEFAULT_USER_GROUP,
+            concurrency=2,
+        )
+        self.assertEqual(
+            sorted(task.execute_data['moved_objects']),
+            [
+                (self.src_paths[0], None),
+                (self.src_paths[1], TEST_ACCESS_NULL),
+                (self.src_paths[2], TEST_ACCESS_NULL),
+            ],
+        )
+        mock_access.assert_called_once_with(
+            self.irods, BATCH_SRC_PATH, DEFAULT_USER_GROUP
+        )
+
+    @patch('tasks.irods_tasks.get_subcoll_coll_access', return_value={})
+    @patch('tasks.irods_tasks.get_subcoll_obj_access', return_value={})
+    def test_execute_coll(self, mock_obj_access, mock_coll_access, mock_pool):
+        """Test moving collections as a whole along with their objects"""
+        mock_pool.get_clone.side_effect = self._get_clone
+        self.fail_path = None
+        sub_coll_path = BATCH_SRC_PATH + '/sub_coll'
+        sub_paths = [sub_coll_path + '/obj', sub_coll_path + '/sub/obj']
+        task = self._get_task()
+        task.progress = MagicMock()
+        task.execute(
+            BATCH_SRC_PATH,
+            BATCH_DEST_PATH,
+            self.src_paths[:2] + sub_paths,
+            TEST_ACCESS_READ_IN,
+            DEFAULT_USER_GROUP,
+            src_colls=[sub_coll_path],
+            concurrency=2,
+        )
+        self.assertEqual(task.execute_data['moved_colls'], [sub_coll_path])
+        self.assertEqual(
+            sorted(p for p, _ in task.execute_data['moved_objects']),
+            self.src_paths[:2],
+        )
+        self.assertEqual(
+            list(task.execute_data['moved_colls_access']),
+            [
+                (sub_coll_path, TEST_ACCESS_NULL),
+                (sub_paths[0], TEST_ACCESS_NULL),
+                (sub_coll_path + '/sub', TEST_ACCESS_NULL),
+                (sub_paths[1], TEST_ACCESS_NULL),
+            ],
+        )
+        self.assertEqual(sorted(self.session_moves), self.src_paths[:2])
+        self.assertEqual(task.progress.update.call_count, 4)
+
+        task.revert(
+            BATCH_SRC_PATH,
+            BATCH_DEST_PATH,
+            TEST_ACCESS_READ_IN,
+            DEFAULT_USER_GROUP,
+        )
+        self.irods.collections.move.assert_called_once_with(
+            src_path=BATCH_DEST_PATH + '/sub_coll', dest_path=BATCH_SRC_PATH
+        )
+        self.assertEqual(self.irods.data_objects.move.call_count, 2)
+
+    def _get_journal_path(self):
+        journal_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(journal_dir.cleanup)
+        return os.path.join(journal_dir.name, 'task.jsonl')
+
+    def _get_journal_task(self, journal_path):
+        task = self._get_task()
+        task.journal_path = journal_path
+        task.journal_info = {'project_uuid': PROJECT_UUID}
+        return task
+
+    @patch('tasks.irods_tasks.query_subcoll_paths', return_value=[])
+    @patch('tasks.irods_tasks.get_subcoll_obj_data')
+    @patch('tasks.irods_tasks.get_subcoll_obj_access', return_value={})
+    def test_execute_journal(
+        self, mock_access, mock_data, mock_colls, mock_pool
+    ):
+        """Test journaling moves and continuing from the journal"""
+        mock_pool.get_clone.side_effect = self._get_clone
+        journal_path = self._get_journal_path()
+        task = self._get_journal_task(journal_path)
+        with self.assertRaises(Exception):
+            task.execute(
+                BATCH_SRC_PATH,
+                BATCH_DEST_PATH,
+                self.src_paths,
+                TEST_ACCESS_READ_IN,
+                DEFAULT_USER_GROUP,
+                concurrency=4,
+            )
+        journal = read_journal(journal_path)
+        self.assertEqual(journal['header']['args']['src_paths'], self.src_paths)
+        self.assertEqual(journal['header']['project_uuid'], PROJECT_UUID)
+        self.assertEqual(
+            sorted(r[1] for r in journal['records']),
+            sorted(self.session_moves),
+        )
+        self.assertIsNone(journal['status'])
+
+        # Continue in a new task, objects not in the source have been moved
+        moved = list(self.session_moves)
+        mock_data.return_value = {
+            p: {} for p in self.src_paths if p not in moved
+        }
+        self.fail_path = None
+        self.session_moves = []
+        task = self._get_journal_task(journal_path)
+        task.execute(**journal['header']['args'])
+        self.assertEqual(
+            sorted(self.session_moves),
+            sorted(p for p in self.src_paths if p not in moved),
+        )
+        self.assertEqual(
+            sorted(task.execute_data['moved_objects'].get_paths()),
+            sorted(self.src_paths),
+        )
+        self.assertEqual(read_journal(journal_path)['status'], 'done')
+
+        task.revert(**journal['header']['args'])
+        self.assertEqual(read_journal(journal_path)['status'], 'reverted')
+        self.assertFalse(task.restore_journal())
+
+    @patch('tasks.irods_tasks.query_subcoll_paths')
+    @patch('tasks.irods_tasks.get_subcoll_obj_data')
+    @patch('tasks.irods_tasks.get_subcoll_coll_access', return_value={})
+    @patch(
+        'tasks.irods_tasks.get_subcoll_obj_access',
+        return_value={
+            BATCH_SRC_PATH + '/obj0': {DEFAULT_USER_GROUP: 'read object'}
+        },
+    )
+    def test_restore_journal(
+        self, mock_obj_access, mock_coll_access, mock_data, mock_colls, _
+    ):
+        """Test restoring undo state from the journal and source listing"""
+        journal_path = self._get_journal_path()
+        sub_coll_path = BATCH_SRC_PATH + '/sub_coll'
+        sub_paths = [sub_coll_path + '/obj']
+        task = self._get_journal_task(journal_path)
+        task._open_journal(
+            {
+                'src_root': BATCH_SRC_PATH,
+                'dest_root': BATCH_DEST_PATH,
+                'src_paths': self.src_paths[:3] + sub_paths,
+                'access_name': TEST_ACCESS_READ_IN,
+                'user_name': DEFAULT_USER_GROUP,
+                'src_colls': [sub_coll_path],
+            },
+            {'access': {self.src_paths[0]: 'read object'}},
+        )
+        task._journal_append('move_coll', sub_coll_path)
+        task._journal_append('coll_access', sub_coll_path, TEST_ACCESS_NULL)
+        task._journal_append('move', self.src_paths[1], TEST_ACCESS_NULL)
+        task._close_journal()
+        # Object 0 was moved after the last journal write, 2 was not moved
+        mock_data.return_value = {self.src_paths[2]: {}}
+        mock_colls.return_value = []
+
+        task = self._get_journal_task(journal_path)
+        self.assertTrue(task.restore_journal())
+        self.assertTrue(task.data_modified)
+        self.assertEqual(task.execute_data['moved_colls'], [sub_coll_path])
+        self.assertEqual(
+            list(task.execute_data['moved_colls_access']),
+            [(sub_coll_path, TEST_ACCESS_NULL)],
+        )
+        self.assertEqual(
+            list(task.execute_data['moved_objects']),
+            [(self.src_paths[0], None), (self.src_paths[1], TEST_ACCESS_NULL)],
+        )
+
+        # Collection not moved if still found in the source
+        mock_colls.return_value = [sub_coll_path]
+        task = self._get_journal_task(journal_path)
+        task.restore_journal()
+        self.assertEqual(task.execute_data['moved_colls'], [])
+        self.assertEqual(len(task.execute_data['moved_colls_access']), 0)
+
+
+@patch('tasks.irods_tasks.get_existing_coll_paths')
+class TestCreateCollectionTreeTaskQuery(TestCase):
+    """Tests for collection queries in CreateCollectionTreeTask without iRODS"""
+
+    def setUp(self):
+        self.irods = MagicMock()
+        self.flow = BaseLinearFlow(
+            irods=self.irods,
+            sodar_api=None,
+            project_uuid=str(uuid.uuid4()),
+            flow_name='test_flow',
+            flow_data={},
+            targets=['irods'],
+        )
+        self.paths = [TEST_COLL_NEW + '/a/b', TEST_COLL_NEW + '/c']
+
+    def _run_task(self):
+        self.flow.add_task(
+            CreateCollectionTreeTask(
+                name='Create collections',
+                irods=self.irods,
+                inject={'paths': self.paths},
+            )
+        )
+        return self.flow.run(verbose=False)
+
+    def test_execute(self, mock_existing):
+        """Test querying all collections at once and creating missing ones"""
+        mock_existing.return_value = set(
+            '/'.join(ROOT_COLL.split('/')[:i])
+            for i in range(2, len(ROOT_COLL.split('/')) + 1)
+        )
+        self.assertEqual(self._run_task(), True)
+        mock_existing.assert_called_once()
+        created = [
+            c[0][0] for c in self.irods.collections.create.call_args_list
+        ]
+        self.assertEqual(
+            created,
+            [
+                TEST_COLL_NEW,
+                TEST_COLL_NEW + '/a',
+                TEST_COLL_NEW + '/c',
+                TEST_COLL_NEW + '/a/b',
+            ],
+        )
+        self.irods.collections.exists.assert_not_called()
+
+    def test_execute_cached(self, mock_existing):
+        """Test not querying collections known to exist in the flow"""
+        mock_existing.return_value = set()
+        for i in range(2, len(ROOT_COLL.split('/')) + 1):
+            self.flow.coll_cache.add('/'.join(ROOT_COLL.split('/')[:i]))
+        self.assertEqual(self._run_task(), True)
+        self.assertEqual(
+            sorted(mock_existing.call_args[0][1]),
+            sorted(
+                [
+                    TEST_COLL_NEW,
+                    TEST_COLL_NEW + '/a',
+                    TEST_COLL_NEW + '/c',
+                    TEST_COLL_NEW + '/a/b',
+                ]
+            ),
+        )
+        self.assertEqual(self.irods.collections.create.call_count, 4)
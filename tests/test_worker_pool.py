@@ -0,0 +1,56 @@
+"""Tests for the async flow worker pool"""
+
+import time
+from unittest import TestCase
+
+from apis.worker_pool import FlowWorkerPool
+
+
+def sleep_job(seconds):
+    time.sleep(seconds)
+
+
+def fail_job():
+    raise Exception('Job failed')
+
+
+class TestFlowWorkerPool(TestCase):
+    """Tests for FlowWorkerPool"""
+
+    def setUp(self):
+        self.pool = FlowWorkerPool(workers=1)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def _wait(self, timeout=30):
+        end = time.monotonic() + timeout
+        while self.pool.get_stats()['running'] and time.monotonic() < end:
+            time.sleep(0.05)
+
+    def test_submit(self):
+        """Test running a job"""
+        self.pool.submit('test', sleep_job, 0.1)
+        self._wait()
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['failed'], 0)
+        self.assertGreaterEqual(stats['run_time_avg'], 0.1)
+
+    def test_submit_fail(self):
+        """Test running a job which raises an exception"""
+        self.pool.submit('test', fail_job)
+        self._wait()
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['completed'], 0)
+        self.assertEqual(stats['failed'], 1)
+
+    def test_submit_queued(self):
+        """Test queuing a job while the worker is busy"""
+        self.pool.submit('test', sleep_job, 1)
+        self.assertFalse(self.pool.has_capacity())
+        self.pool.submit('test', sleep_job, 0)
+        self.assertEqual(self.pool.get_stats()['queued'], 1)
+        self._wait()
+        self.assertEqual(self.pool.get_stats()['completed'], 2)
+        self.assertGreater(self.pool.get_stats()['queue_wait_avg'], 0)
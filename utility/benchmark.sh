@@ -0,0 +1,6 @@
+#!/usr/bin/env bash
+# Usage: benchmark.sh <benchmark_module> [args]
+SCRIPT_PATH=$(dirname "$(readlink -f "$0")")
+export SODAR_TASKFLOW_SETTINGS=${SODAR_TASKFLOW_SETTINGS:-${SCRIPT_PATH}/../config/test.py}
+cd ${SCRIPT_PATH}/..
+python -m benchmarks.$1 "${@:2}"
@@ -1,4 +1,6 @@
 #!/usr/bin/env bash
 SCRIPT_PATH=$(dirname "$(readlink -f "$0")")
 export SODAR_TASKFLOW_SETTINGS=${SCRIPT_PATH}/../config/production.py
-gunicorn sodar_taskflow:app --bind 0.0.0.0:5005 --workers 8 --worker-connections 1000 --pythonpath ${SCRIPT_PATH}/..
+# Worker timeout must leave room for TASKFLOW_LOCK_WAIT_SYNC and the sync flow
+GUNICORN_TIMEOUT=${GUNICORN_TIMEOUT-600}
+gunicorn sodar_taskflow:app --preload --bind 0.0.0.0:5005 --workers 8 --worker-connections 1000 --timeout ${GUNICORN_TIMEOUT} --pythonpath ${SCRIPT_PATH}/..
@@ -0,0 +1,5 @@
+#!/usr/bin/env bash
+SCRIPT_PATH=$(dirname "$(readlink -f "$0")")
+export SODAR_TASKFLOW_SETTINGS=${SODAR_TASKFLOW_SETTINGS:-${SCRIPT_PATH}/../config/dev.py}
+cd ${SCRIPT_PATH}/..
+python -u runner.py